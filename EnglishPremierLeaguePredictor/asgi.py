@@ -9,8 +9,13 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'EnglishPremierLeaguePredictor.settings')
 
 application = get_asgi_application()
+if settings.DEBUG:
+    # serve static files like runserver does, so uvicorn works as a drop-in for development
+    application = ASGIStaticFilesHandler(application)
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -42,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'main_app.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -74,12 +76,141 @@ WSGI_APPLICATION = 'EnglishPremierLeaguePredictor.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DATABASE_ENGINE=sqlite (default, single node) or postgres. SQLite connections get the
+# SQLITE_PRAGMAS below from main_app/database.py on connect; compare the profiles with
+# `manage.py benchmark_writes`.
+
+DATABASE_ENGINE = os.environ.get('DATABASE_ENGINE', 'sqlite')
+
+if DATABASE_ENGINE == 'postgres':
+    # needs psycopg: pip install "psycopg[binary,pool]"
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'premierpredictor'),
+            'USER': os.environ.get('POSTGRES_USER', 'postgres'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+    DATABASE_POOL_MAX = int(os.environ.get('DATABASE_POOL_MAX', 0))
+    if DATABASE_POOL_MAX:
+        # psycopg_pool; pooled connections need CONN_MAX_AGE = 0
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS'] = {
+            'pool': {
+                'min_size': int(os.environ.get('DATABASE_POOL_MIN', 2)),
+                'max_size': DATABASE_POOL_MAX,
+                'timeout': int(os.environ.get('DATABASE_POOL_TIMEOUT', 10)),
+            },
+        }
+    else:
+        # persistent per-thread connections instead of one connect per request
+        DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DATABASE_CONN_MAX_AGE', 60))
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+        }
     }
+
+# SQLITE_MODE=tuned (default) or default (plain Django/SQLite behaviour)
+SQLITE_MODE = os.environ.get('SQLITE_MODE', 'tuned')
+SQLITE_TUNED_PRAGMAS = {
+    # readers no longer block the writer (and vice versa); fsync only at checkpoints
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    # queue for the write lock instead of failing with "database is locked"
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -20000,  # KiB
+    'temp_store': 'MEMORY',
+}
+SQLITE_TUNED_OPTIONS = {
+    # take the write lock at BEGIN, so read-then-write transactions wait on busy_timeout
+    # instead of failing on the lock upgrade
+    'transaction_mode': 'IMMEDIATE',
 }
+SQLITE_PRAGMAS = {}
+if DATABASE_ENGINE != 'postgres' and SQLITE_MODE == 'tuned':
+    SQLITE_PRAGMAS = SQLITE_TUNED_PRAGMAS
+    DATABASES['default']['OPTIONS'] = dict(SQLITE_TUNED_OPTIONS)
+
+
+# Cache
+# Rendered list fragments and API ETags hang off per-model version keys (main_app/caching.py)
+# that every writing process bumps: web workers, run_jobs and the management commands. The
+# cache therefore has to be shared between processes.
+# CACHE_BACKEND=file (default; one host, CACHE_DIR), redis (several hosts, REDIS_URL) or
+# locmem (a single process only: bumps from any other process never reach it).
+
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'file')
+
+if CACHE_BACKEND == 'redis':
+    # needs redis-py: pip install redis
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL', 'redis://localhost:6379/0'),
+        }
+    }
+elif CACHE_BACKEND == 'locmem':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'premierpredictor',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR', os.path.join(tempfile.gettempdir(), 'premierpredictor-cache')),
+            # culling may drop a version key too; caching.py reseeds those from the clock
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+
+FRAGMENT_CACHE_TIMEOUT = 60 * 60
+
+# Request profiling (main_app/profiling.py): Server-Timing headers, per-view stats at
+# /profiling/stats/, warnings for repeated SQL and for views over their query budget.
+# Every query is wrapped and timed, so it is on only for development.
+PROFILE_REQUESTS = DEBUG
+PROFILE_DUPLICATE_THRESHOLD = 5
+# Max queries per GET of a URL name, including session/auth lookups; logged when exceeded, raised
+# as QueryBudgetExceeded when QUERY_BUDGETS_STRICT is on (e.g. override_settings in tests).
+QUERY_BUDGETS = {
+    'home': 3,
+    'team-index': 4,
+    'team-detail': 4,
+    'team-delete': 6,
+    'match-index': 5,
+    'match-detail': 7,
+    'match-search': 3,
+    'prediction-index': 5,
+    'prediction-detail': 3,
+    'prediction-create': 4,
+    'prediction-update': 5,
+    'prediction-gameweek': 5,
+    'leaderboard': 3,
+    'league-table': 3,
+    'season-index': 3,
+    'season-detail': 6,
+    'api-list': 4,
+    'api-detail': 4,
+}
+QUERY_BUDGETS_STRICT = False
+
+# Score and rate finished matches in the run_jobs worker instead of inside the saving request.
+# Off by default: with it on, nothing is scored until `python manage.py run_jobs` is running.
+SETTLE_IN_BACKGROUND = os.environ.get("SETTLE_IN_BACKGROUND", "").lower() in ("1", "true", "yes")
+
+# Account the Elo baseline (main_app/ratings.py) predicts as: reserved at signup, never able to log in
+BASELINE_USERNAME = os.environ.get('BASELINE_USERNAME', 'baseline')
 
 
 # Password validation
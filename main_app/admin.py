@@ -1,7 +1,25 @@
 from django.contrib import admin
-from .models import Team, Match, Prediction
+from .forms import TeamForm
+from .models import (
+    ArchivedMatch, ArchivedPrediction, Job, Team, Match, MatchConsensus, Prediction, RatingModel, Season, Standing,
+    TeamRating, TeamStanding,
+)
 # Register your models here.
 
-admin.site.register(Team)
 admin.site.register(Match)
 admin.site.register(Prediction)
+admin.site.register(Standing)
+admin.site.register(TeamStanding)
+admin.site.register(MatchConsensus)
+admin.site.register(Job)
+admin.site.register(RatingModel)
+admin.site.register(TeamRating)
+admin.site.register(Season)
+admin.site.register(ArchivedMatch)
+admin.site.register(ArchivedPrediction)
+
+
+@admin.register(Team)
+class TeamAdmin(admin.ModelAdmin):
+    # the same upload checks as the site's team form
+    form = TeamForm
@@ -0,0 +1,224 @@
+"""
+Read-only JSON API over teams, matches and predictions.
+
+- Cursor pagination on each resource's (order field, id) key, like the HTML lists.
+- ?fields=a,b projection, translated to values() so only those columns are selected
+  (Computed fields such as logo URLs are built from their own selected columns).
+- Strong ETags and Last-Modified built from the per-model versions in caching.py, checked
+  *before* any query runs, so a client polling an unchanged list gets a 304 for the cost
+  of a couple of cache reads.
+"""
+import base64
+import hashlib
+import json
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import Http404, JsonResponse
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import condition, require_safe
+
+from .models import Match, Prediction, Team
+from . import caching
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class Computed:
+    """An output field built from one or more selected columns, e.g. a URL from a storage name."""
+    def __init__(self, lookups, build):
+        self.lookups = lookups
+        self.build = build
+
+
+class Resource:
+    def __init__(self, name, queryset, fields, depends_on, order_field=None, filters=None):
+        self.name = name
+        self.queryset = queryset
+        self.fields = fields  # output name -> ORM lookup or Computed
+        self.depends_on = depends_on
+        self.order_field = order_field  # None: newest id first
+        self.filters = filters or {}  # query param -> ORM lookup
+
+
+RESOURCES = {
+    "teams": Resource(
+        "teams", Team.objects.all(),
+        {
+            "id": "id", "name": "name", "short_code": "short_code", "founded_year": "founded_year",
+            "logo": Computed(("logo", "logo_thumbs"), lambda row: Team.logo_url_for(row["logo"], row["logo_thumbs"], "card")),
+            "logo_detail": Computed(
+                ("logo", "logo_thumbs"), lambda row: Team.logo_url_for(row["logo"], row["logo_thumbs"], "detail")
+            ),
+        },
+        depends_on=("team",),
+    ),
+    "matches": Resource(
+        "matches", Match.objects.all(),
+        {
+            "id": "id", "home_team": "home_team_id", "home_team_name": "home_team__name",
+            "away_team": "away_team_id", "away_team_name": "away_team__name", "kickoff_at": "kickoff_at",
+            "venue": "venue", "status": "status", "home_score": "home_score", "away_score": "away_score",
+        },
+        depends_on=("match", "team"),
+        order_field="kickoff_at",
+        filters={"status": "status", "home_team": "home_team_id", "away_team": "away_team_id"},
+    ),
+    "predictions": Resource(
+        "predictions", Prediction.objects.all(),
+        {
+            "id": "id", "match": "match_id", "user": "user__username", "pick": "pick",
+            "p_home": "p_home", "p_draw": "p_draw", "p_away": "p_away",
+            "created_at": "created_at", "points": "points",
+        },
+        depends_on=("prediction", "match", "user"),
+        order_field="created_at",
+        filters={"match": "match_id", "user": "user__username", "pick": "pick"},
+    ),
+}
+
+
+class BadRequest(Exception):
+    pass
+
+
+def _error(status, message):
+    return JsonResponse({"error": message}, status=status)
+
+
+def api_view(func):
+    """Session-authenticated, GET/HEAD only, JSON errors instead of redirects."""
+    @wraps(func)
+    def wrapper(request, resource, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return _error(401, "Authentication required.")
+        if resource not in RESOURCES:
+            return _error(404, "Unknown resource.")
+        try:
+            response = func(request, RESOURCES[resource], *args, **kwargs)
+        except BadRequest as exc:
+            return _error(400, str(exc))
+        except Http404 as exc:
+            return _error(404, str(exc) or "Not found.")
+        response["Cache-Control"] = "private, no-cache"
+        response["Vary"] = "Cookie"
+        return response
+    return require_safe(wrapper)
+
+
+def _etag(request, resource, pk=None):
+    versions = caching.get_versions(resource.depends_on)
+    query = sorted(request.GET.lists())
+    raw = json.dumps([resource.name, pk, versions, query], sort_keys=True)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _last_modified(request, resource, pk=None):
+    # HTTP dates have one-second resolution; the ETag covers anything finer
+    return datetime.fromtimestamp(int(caching.last_changed(resource.depends_on)), tz=dt_timezone.utc)
+
+
+def _projection(request, resource):
+    requested = request.GET.get("fields")
+    if not requested:
+        return dict(resource.fields)
+    names = [n.strip() for n in requested.split(",") if n.strip()]
+    unknown = [n for n in names if n not in resource.fields]
+    if unknown:
+        raise BadRequest(f"Unknown field(s): {', '.join(unknown)}.")
+    return {n: resource.fields[n] for n in names}
+
+
+def _lookups(projection):
+    lookups = []
+    for field in projection.values():
+        lookups.extend(field.lookups if isinstance(field, Computed) else [field])
+    return lookups
+
+
+def _render(row, projection):
+    return {
+        name: field.build(row) if isinstance(field, Computed) else row[field]
+        for name, field in projection.items()
+    }
+
+
+def _encode_cursor(value, pk):
+    raw = json.dumps([value, pk], cls=DjangoJSONEncoder)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(token, resource):
+    try:
+        value, pk = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        if resource.order_field:
+            value = parse_datetime(value)
+            if value is None:
+                raise ValueError
+        return value, int(pk)
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise BadRequest("Invalid cursor.")
+
+
+def _page_size(request):
+    try:
+        return max(1, min(int(request.GET.get("limit", PAGE_SIZE)), MAX_PAGE_SIZE))
+    except ValueError:
+        raise BadRequest("limit must be an integer.")
+
+
+def _list(request, resource):
+    projection = _projection(request, resource)
+    qs = resource.queryset
+    for param, lookup in resource.filters.items():
+        if param in request.GET:
+            try:
+                qs = qs.filter(**{lookup: request.GET[param]})
+            except (TypeError, ValueError, ValidationError):
+                raise BadRequest(f"Invalid {param}.")
+
+    order = resource.order_field
+    if order:
+        qs = qs.order_by(f"-{order}", "-id")
+    else:
+        qs = qs.order_by("-id")
+    if request.GET.get("after"):
+        value, pk = _decode_cursor(request.GET["after"], resource)
+        if order:
+            qs = qs.filter(Q(**{f"{order}__lt": value}) | Q(**{order: value, "id__lt": pk}))
+        else:
+            qs = qs.filter(id__lt=pk)
+
+    size = _page_size(request)
+    # always select the cursor columns, even when the client did not ask for them
+    lookups = list(dict.fromkeys(_lookups(projection) + ["id"] + ([order] if order else [])))
+    rows = list(qs.values(*lookups)[:size + 1])
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        last = rows[-1]
+        next_cursor = _encode_cursor(last[order] if order else last["id"], last["id"])
+    results = [_render(row, projection) for row in rows]
+    return JsonResponse({"results": results, "next": next_cursor})
+
+
+@api_view
+@condition(etag_func=lambda request, resource: _etag(request, resource),
+           last_modified_func=lambda request, resource: _last_modified(request, resource))
+def resource_list(request, resource):
+    return _list(request, resource)
+
+
+@api_view
+@condition(etag_func=lambda request, resource, pk: _etag(request, resource, pk),
+           last_modified_func=lambda request, resource, pk: _last_modified(request, resource, pk))
+def resource_detail(request, resource, pk):
+    projection = _projection(request, resource)
+    row = resource.queryset.filter(pk=pk).values(*dict.fromkeys(_lookups(projection))).first()
+    if row is None:
+        raise Http404("Not found.")
+    return JsonResponse(_render(row, projection))
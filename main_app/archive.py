@@ -0,0 +1,81 @@
+"""
+Moving closed seasons out of the live tables.
+
+archive_season() copies a season's matches into ArchivedMatch, together with their final
+crowd split from MatchConsensus. It copies their predictions into ArchivedPrediction, then
+deletes the live rows. The work runs in batches of match ids; each batch is one transaction
+of INSERT ... SELECT and DELETE statements, so a run that stops half way can be run again.
+
+Nothing is recomputed. The deletes bypass the model signals on purpose:
+- Standing keeps every archived score. scoring.compute_standings() folds the archive back in
+  on a full rebuild.
+- TeamStanding keeps the season's table; league.rebuild() skips archived seasons.
+- ratings.fit() replays archived results before live ones.
+
+ArchivedPrediction stores the pick and probabilities as the same small integers as Prediction,
+so predictions are copied column for column.
+"""
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import ArchivedMatch, ArchivedPrediction, Match, MatchConsensus, Prediction, Season
+from . import caching, search
+
+OPEN_STATUSES = ("SCHEDULED", "LIVE")
+BATCH_SIZE = 200
+
+
+def open_matches(year):
+    """Matches of the season still to be played; a season with any cannot be archived."""
+    return Match.objects.filter(season=year, status__in=OPEN_STATUSES).count()
+
+
+def candidates():
+    """Past seasons that are still live, oldest first."""
+    return list(
+        Season.objects.filter(archived_at__isnull=True, year__lt=Season.current_year()).order_by("year")
+        .values_list("year", flat=True)
+    )
+
+
+def _statements():
+    qn = connection.ops.quote_name
+    match, consensus = qn(Match._meta.db_table), qn(MatchConsensus._meta.db_table)
+    prediction = qn(Prediction._meta.db_table)
+    return [
+        f"INSERT INTO {qn(ArchivedMatch._meta.db_table)} (id, season, gameweek, kickoff_at, home_team_id, away_team_id, "
+        f"pair_low, pair_high, venue, status, home_score, away_score, home_picks, draw_picks, away_picks) "
+        f"SELECT m.id, m.season, m.gameweek, m.kickoff_at, m.home_team_id, m.away_team_id, m.pair_low, m.pair_high, "
+        f"m.venue, m.status, m.home_score, m.away_score, COALESCE(c.home, 0), COALESCE(c.draw, 0), COALESCE(c.away, 0) "
+        f"FROM {match} m LEFT JOIN {consensus} c ON c.match_id = m.id WHERE m.id IN ({{ids}})",
+        f"INSERT INTO {qn(ArchivedPrediction._meta.db_table)} (id, match_id, user_id, pick, p_home, p_draw, p_away, "
+        f"created_at, points, brier, log_loss) "
+        f"SELECT id, match_id, user_id, pick, p_home, p_draw, p_away, created_at, points, brier, log_loss "
+        f"FROM {prediction} WHERE match_id IN ({{ids}})",
+        f"DELETE FROM {prediction} WHERE match_id IN ({{ids}})",
+        f"DELETE FROM {consensus} WHERE match_id IN ({{ids}})",
+        f"DELETE FROM {match} WHERE id IN ({{ids}})",
+    ]
+
+
+def archive_season(year, batch_size=BATCH_SIZE, log=None):
+    """Move a finished season into the archive tables; returns the Season row with the archived counts."""
+    log = log or (lambda message: None)
+    match_ids = list(Match.objects.filter(season=year).order_by("id").values_list("id", flat=True))
+    statements = _statements()
+    for start in range(0, len(match_ids), batch_size):
+        batch = match_ids[start:start + batch_size]
+        placeholders = ", ".join(["%s"] * len(batch))
+        with transaction.atomic(), connection.cursor() as cursor:
+            search.remove_matches(batch)
+            for sql in statements:
+                cursor.execute(sql.format(ids=placeholders), batch)
+        log(f"  {start + len(batch)} / {len(match_ids)} matches moved")
+    season, _ = Season.objects.get_or_create(year=year)
+    season.archived_at = timezone.now()
+    season.archived_matches = ArchivedMatch.objects.filter(season=year).count()
+    season.archived_predictions = ArchivedPrediction.objects.filter(match__season=year).count()
+    season.save()
+    caching.bump("match")
+    caching.bump("prediction")
+    return season
@@ -0,0 +1,175 @@
+"""
+Vectorized bulk rescoring with NumPy.
+
+scoring.py handles the incremental, per-match path. This module is for rescoring whole
+seasons at once (score corrections, rule changes): predictions are streamed out of the
+database in id-ordered chunks as columnar arrays, scored in one shot per chunk, and only
+rows whose score actually changed are written back in one executemany per chunk. Standing deltas are
+summed per user with NumPy and applied once per chunk, so memory stays bounded by the chunk
+size no matter how many predictions there are.
+"""
+import numpy as np
+from django.db import transaction
+from django.db.models import ExpressionWrapper, F, SmallIntegerField
+
+from .models import Match, PickField, Prediction, ProbabilityField
+from . import scoring
+
+CHUNK_SIZE = 5000
+CALIBRATION_BINS = 10
+
+PICK_CODES = PickField.CODES  # the stored codes, in scoring.OUTCOMES order
+# pick and probabilities come out as their stored integers, skipping the per-value field conversion
+_RAW = [ExpressionWrapper(F(f), output_field=SmallIntegerField()) for f in ("pick", "p_home", "p_draw", "p_away")]
+_COLUMNS = ("id", "user_id", "match_id", *_RAW, "points", "brier", "log_loss")
+
+
+def _floats(values):
+    return np.array([np.nan if v is None else v for v in values], dtype=float)
+
+
+def load_outcomes(match_ids=None):
+    """Sorted match ids and their outcome codes (0/1/2 = HOME/DRAW/AWAY, -1 = not settled)."""
+    qs = Match.objects.order_by("pk")
+    if match_ids is not None:
+        qs = qs.filter(pk__in=match_ids)
+    rows = list(qs.values_list("pk", "status", "home_score", "away_score"))
+    ids = np.array([r[0] for r in rows], dtype=np.int64)
+    codes = np.array([PICK_CODES.get(scoring.outcome_for(*r[1:]), -1) for r in rows], dtype=np.int8)
+    return ids, codes
+
+
+def lookup_outcomes(match_ids, outcome_ids, outcome_codes):
+    if not len(outcome_ids):
+        return np.full(len(match_ids), -1, dtype=np.int8)
+    pos = np.searchsorted(outcome_ids, match_ids).clip(0, len(outcome_ids) - 1)
+    return np.where(outcome_ids[pos] == match_ids, outcome_codes[pos], -1).astype(np.int8)
+
+
+def iter_chunks(queryset, chunk_size=CHUNK_SIZE):
+    """Yield predictions as dicts of column arrays, chunk_size rows at a time (keyset on id)."""
+    last_id = 0
+    while True:
+        rows = list(queryset.filter(pk__gt=last_id).order_by("pk").values_list(*_COLUMNS)[:chunk_size])
+        if not rows:
+            return
+        cols = list(zip(*rows))
+        last_id = cols[0][-1]
+        yield {
+            "id": np.array(cols[0], dtype=np.int64),
+            "user_id": np.array([-1 if u is None else u for u in cols[1]], dtype=np.int64),
+            "match_id": np.array(cols[2], dtype=np.int64),
+            "pick": np.array(cols[3], dtype=np.int8),
+            "probs": np.column_stack([_floats(cols[4]), _floats(cols[5]), _floats(cols[6])]) / ProbabilityField.SCALE,
+            "points": _floats(cols[7]),
+            "brier": _floats(cols[8]),
+            "log_loss": _floats(cols[9]),
+        }
+
+
+def score_arrays(picks, probs, outcomes):
+    """
+    Vectorized scoring.score(): returns (points, brier, log_loss) float arrays with NaN where
+    a value does not apply (match unsettled, or no probabilities given).
+    """
+    n = len(picks)
+    settled = outcomes >= 0
+    actual = outcomes.clip(0).astype(np.intp)
+    points = np.where(settled, np.where(picks == outcomes, scoring.POINTS_CORRECT, 0), np.nan)
+
+    has_probs = settled & ~np.isnan(probs).all(axis=1)
+    filled = np.nan_to_num(probs, nan=0.0)
+    onehot = np.eye(3)[actual]
+    brier = ((filled - onehot) ** 2).sum(axis=1)
+    p_actual = filled[np.arange(n), actual]
+    log_loss = -np.log(np.clip(p_actual, scoring.EPS, 1.0))
+    return points, np.where(has_probs, brier, np.nan), np.where(has_probs, log_loss, np.nan)
+
+
+def contributions(points, brier, log_loss):
+    """Per-row Standing contribution matrix (n x 6) in scoring.STANDING_FIELDS order."""
+    scored = ~np.isnan(points)
+    has_probs = ~np.isnan(brier)
+    return np.column_stack([
+        np.nan_to_num(points),
+        scored,
+        scored & (np.nan_to_num(points) > 0),
+        has_probs,
+        np.nan_to_num(brier),
+        np.nan_to_num(log_loss),
+    ]).astype(float)
+
+
+def user_deltas(user_ids, delta_rows):
+    """Sum contribution deltas per user -> {user_id: [6 deltas]} (anonymous rows dropped)."""
+    keep = user_ids >= 0
+    users, inverse = np.unique(user_ids[keep], return_inverse=True)
+    sums = np.zeros((len(users), delta_rows.shape[1]))
+    np.add.at(sums, inverse, delta_rows[keep])
+    return {
+        user_id: [int(round(v)) for v in row[:4]] + [float(v) for v in row[4:]]
+        for user_id, row in zip(users.tolist(), sums)
+    }
+
+
+class Calibration:
+    """Reliability-diagram accumulator: predicted probability vs observed frequency per bin."""
+
+    def __init__(self, bins=CALIBRATION_BINS):
+        self.bins = bins
+        self.count = np.zeros(bins, dtype=np.int64)
+        self.predicted = np.zeros(bins)
+        self.observed = np.zeros(bins)
+
+    def add(self, probs, outcomes):
+        rows = (outcomes >= 0) & ~np.isnan(probs).all(axis=1)
+        if not rows.any():
+            return
+        p = np.nan_to_num(probs[rows], nan=0.0).ravel()
+        hit = (np.eye(3)[outcomes[rows].astype(np.intp)]).ravel()
+        idx = np.minimum((p * self.bins).astype(np.intp), self.bins - 1).clip(0)
+        self.count += np.bincount(idx, minlength=self.bins)
+        self.predicted += np.bincount(idx, weights=p, minlength=self.bins)
+        self.observed += np.bincount(idx, weights=hit, minlength=self.bins)
+
+    def table(self):
+        """[(bin_lower, bin_upper, count, mean_predicted, observed_rate), ...] for non-empty bins."""
+        rows = []
+        for i in np.nonzero(self.count)[0]:
+            n = int(self.count[i])
+            rows.append((i / self.bins, (i + 1) / self.bins, n, self.predicted[i] / n, self.observed[i] / n))
+        return rows
+
+
+def _changed(old, new):
+    return ~np.isclose(old, new, rtol=0.0, atol=1e-12, equal_nan=True)
+
+
+def rescore(queryset=None, chunk_size=CHUNK_SIZE, calibration=None, write=True, match_ids=None):
+    """
+    Rescore every prediction in `queryset` (default: all) chunk by chunk. Pass `match_ids`
+    when the queryset only covers those matches, so only their outcomes are loaded.
+    Yields (rows_seen, rows_changed) after each chunk so callers can report progress.
+    """
+    queryset = Prediction.objects.all() if queryset is None else queryset
+    outcome_ids, outcome_codes = load_outcomes(match_ids)
+    for chunk in iter_chunks(queryset, chunk_size):
+        outcomes = lookup_outcomes(chunk["match_id"], outcome_ids, outcome_codes)
+        points, brier, log_loss = score_arrays(chunk["pick"], chunk["probs"], outcomes)
+        if calibration is not None:
+            calibration.add(chunk["probs"], outcomes)
+
+        changed = _changed(chunk["points"], points) | _changed(chunk["brier"], brier) | _changed(chunk["log_loss"], log_loss)
+        if write and changed.any():
+            delta_rows = (
+                contributions(points[changed], brier[changed], log_loss[changed])
+                - contributions(chunk["points"][changed], chunk["brier"][changed], chunk["log_loss"][changed])
+            )
+            rows = [
+                (None if np.isnan(pt) else int(pt), None if np.isnan(b) else float(b), None if np.isnan(ll) else float(ll), pk)
+                for pt, b, ll, pk in zip(points[changed], brier[changed], log_loss[changed], chunk["id"][changed].tolist())
+            ]
+            with transaction.atomic():
+                scoring.write_scores(rows)
+                scoring.apply_deltas(user_deltas(chunk["user_id"][changed], delta_rows))
+        yield len(chunk["id"]), int(changed.sum())
@@ -0,0 +1,535 @@
+"""
+Benchmark suite over synthetic leagues (synthetic.py), driven by the benchmark command.
+
+Each scale gets its own throwaway test database, is filled with generate(), and then every
+operation in OPERATIONS is timed `repeat` times with a cold cache. Per operation the result
+records min/median/p95/mean/max milliseconds and the query count of the last run, so JSON
+results from two commits can be diffed with compare(). The "search" scale (about 100k
+matches, no predictions) is for the match_search target: p95 under 20 ms per prefix lookup.
+
+write_throughput() and kickoff_burst() are separate (benchmark_writes command). The first
+has threads submitting predictions at once, to compare database profiles by committed writes
+per second and lock errors. The second has threads editing predictions on one match through
+its kickoff, while the scheduler starts the match.
+
+storage_layout() (benchmark_storage command, SQLite) sizes the predictions table and its
+indexes and times the hot prediction reads, at up to tens of millions of rows, before and
+after the compact pick/probability layout.
+"""
+import itertools
+import logging
+import statistics
+import threading
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import OperationalError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Count, F
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Match, Prediction, Team, TeamRating
+from . import batch_scoring, database, kickoffs, ratings, scoring, search, synthetic
+from .profiling import QueryRecorder
+
+SCALES = {
+    "small": {"teams": 10, "seasons": 1, "users": 50, "coverage": 0.5},
+    "medium": {"teams": 20, "seasons": 2, "users": 300, "coverage": 0.3},
+    "large": {"teams": 20, "seasons": 5, "users": 1500, "coverage": 0.3},
+    "search": {"teams": 100, "seasons": 10, "users": 10, "coverage": 0.0},
+}
+# one per match_search run, in turn: single letters up to whole names, several words, no hits,
+# and "park", a word in every synthetic venue (the slow case, see search.py)
+SEARCH_QUERIES = ("a", "as", "ash", "ashford", "city", "united", "ashford city", "west ro", "zzz", "park")
+
+
+class Fixture:
+    """Objects the operations work on, picked once per scale."""
+
+    def __init__(self):
+        self.user = User.objects.create_user("benchmark", password=synthetic.PASSWORD)
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.busiest = Match.objects.annotate(n=Count("predictions")).order_by("-n", "pk").first()
+        self.finished = Match.objects.filter(status="FT").order_by("-kickoff_at").first()
+        upcoming = list(Match.objects.filter(status="SCHEDULED").order_by("kickoff_at")[:2])
+        self.open_match = upcoming[0]
+        # an open prediction to edit and one on a finished match, locked since kickoff
+        self.open_prediction = Prediction.objects.create(match=upcoming[1], user=self.user, pick="HOME")
+        self.locked_prediction = Prediction.objects.create(match=self.finished, user=self.user, pick="HOME")
+        # a finished round (not self.finished) that kickoff_tick puts back to SCHEDULED and starts again
+        self.round = list(Match.objects.filter(status="FT").order_by("-kickoff_at").values_list("id", flat=True)[1:11])
+        self.team = Team.objects.order_by("pk").first()
+        Team.objects.filter(pk=self.team.pk).update(created_by=self.user)
+        self.search_queries = itertools.cycle(SEARCH_QUERIES)
+
+
+def _get(fixture, url):
+    response = fixture.client.get(url)
+    assert response.status_code == 200, f"GET {url} returned {response.status_code}"
+
+
+def match_list(fx):
+    _get(fx, reverse("match-index"))
+
+
+def match_detail(fx):
+    _get(fx, reverse("match-detail", args=[fx.busiest.pk]))
+
+
+def prediction_create(fx):
+    response = fx.client.post(reverse("prediction-create"), {"match": fx.open_match.pk, "pick": "HOME"})
+    assert response.status_code == 302, f"prediction create returned {response.status_code}"
+
+
+def prediction_create_setup(fx):
+    Prediction.objects.filter(user=fx.user, match=fx.open_match).delete()
+
+
+def prediction_update(fx):
+    prediction = fx.open_prediction
+    prediction.pick = "AWAY" if prediction.pick == "HOME" else "HOME"
+    url = reverse("prediction-update", args=[prediction.pk])
+    response = fx.client.post(url, {"match": prediction.match_id, "pick": prediction.pick})
+    assert response.status_code == 302, f"prediction update returned {response.status_code}"
+
+
+def prediction_update_locked(fx):
+    prediction = fx.locked_prediction
+    url = reverse("prediction-update", args=[prediction.pk])
+    response = fx.client.post(url, {"match": prediction.match_id, "pick": "AWAY"})
+    assert response.status_code == 403, f"locked prediction update returned {response.status_code}"
+
+
+def kickoff_tick(fx):
+    started = kickoffs.start_due()
+    assert len(started) == len(fx.round), f"kickoff tick started {len(started)} matches"
+
+
+def kickoff_tick_setup(fx):
+    Match.objects.filter(pk__in=fx.round).update(status="SCHEDULED")
+
+
+def team_delete_protected(fx):
+    response = fx.client.post(reverse("team-delete", args=[fx.team.pk]))
+    assert response.status_code == 200, f"team delete returned {response.status_code}"
+
+
+def settle_match(fx):
+    scoring.settle_match(fx.finished)
+
+
+def settle_match_setup(fx):
+    # flip the result (without signals) so every run has predictions to move
+    match = fx.finished
+    match.home_score, match.away_score = match.away_score + 1, match.home_score
+    Match.objects.filter(pk=match.pk).update(home_score=match.home_score, away_score=match.away_score)
+
+
+def rescore_all(fx):
+    for _ in batch_scoring.rescore():
+        pass
+
+
+def ratings_fit(fx):
+    ratings.fit()
+
+
+def ratings_predict(fx):
+    ratings.predict_upcoming()
+
+
+def ratings_predict_setup(fx):
+    # move half the teams so the run has baseline predictions to rewrite
+    TeamRating.objects.annotate(odd=F("team_id") % 2).filter(odd=1).update(rating=F("rating") + 25)
+
+
+def leaderboard(fx):
+    _get(fx, reverse("leaderboard"))
+
+
+def league_table(fx):
+    _get(fx, reverse("league-table"))
+
+
+def api_matches(fx):
+    _get(fx, reverse("api-list", args=["matches"]))
+
+
+def match_search(fx):
+    # the match list's first page for one query, as MatchList runs it (without rendering)
+    matches = Match.objects.select_related("home_team", "away_team", "created_by", "consensus").order_by("-kickoff_at", "-id")
+    list(search.filter_matches(matches, next(fx.search_queries))[:26])
+
+
+# name -> (operation, per-run setup or None); setups are not timed
+OPERATIONS = {
+    "match_list": (match_list, None),
+    "match_detail": (match_detail, None),
+    "prediction_create": (prediction_create, prediction_create_setup),
+    "prediction_update": (prediction_update, None),
+    "prediction_update_locked": (prediction_update_locked, None),
+    "team_delete_protected": (team_delete_protected, None),
+    "leaderboard": (leaderboard, None),
+    "league_table": (league_table, None),
+    "api_matches": (api_matches, None),
+    "match_search": (match_search, None),
+    "settle_match": (settle_match, settle_match_setup),
+    "rescore_all": (rescore_all, None),
+    "ratings_fit": (ratings_fit, None),
+    "ratings_predict": (ratings_predict, ratings_predict_setup),
+    # leaves its round LIVE, so it runs last
+    "kickoff_tick": (kickoff_tick, kickoff_tick_setup),
+}
+
+
+def measure(fn, fixture, repeat, setup=None):
+    timings, recorder = [], None
+    for _ in range(repeat):
+        if setup:
+            setup(fixture)
+        cache.clear()
+        recorder = QueryRecorder()
+        with recorder:
+            started = time.perf_counter()
+            fn(fixture)
+            timings.append((time.perf_counter() - started) * 1000)
+    return {
+        "runs": repeat,
+        "min_ms": round(min(timings), 3),
+        "median_ms": round(statistics.median(timings), 3),
+        "p95_ms": _percentile_ms([t / 1000 for t in timings], 95),
+        "mean_ms": round(statistics.fmean(timings), 3),
+        "max_ms": round(max(timings), 3),
+        "queries": recorder.count,
+    }
+
+
+def run_scale(params, repeat=5, operations=None, log=None):
+    """Generate one scale into the (empty) current database and time the operations."""
+    log = log or (lambda message: None)
+    started = time.perf_counter()
+    counts = synthetic.generate(**params, log=log)
+    result = {"params": params, "rows": counts, "generate_s": round(time.perf_counter() - started, 3), "operations": {}}
+    fixture = Fixture()
+    for name in operations or OPERATIONS:
+        fn, setup = OPERATIONS[name]
+        result["operations"][name] = measure(fn, fixture, repeat, setup)
+        log(f"  {name}: {result['operations'][name]['median_ms']} ms median")
+    return result
+
+
+def compare(old, new, threshold=1.25):
+    """[(scale, operation, old median, new median, ratio, regressed)] for operations in both runs."""
+    rows = []
+    for scale, data in new.get("scales", {}).items():
+        before = old.get("scales", {}).get(scale, {}).get("operations", {})
+        for name, stats in data["operations"].items():
+            if name not in before:
+                continue
+            a, b = before[name]["median_ms"], stats["median_ms"]
+            ratio = b / a if a else float("inf")
+            rows.append((scale, name, a, b, ratio, ratio > threshold))
+    return rows
+
+
+def _submit_predictions(user, match_ids, outcome):
+    done = errors = 0
+    try:
+        for match_id in match_ids:
+            try:
+                # the prediction form's read-then-write: check the match is open, then insert
+                with transaction.atomic():
+                    match = Match.objects.open_for(user).get(pk=match_id)
+                    Prediction.objects.create(match=match, user=user, pick="HOME")
+                done += 1
+            except OperationalError:
+                errors += 1
+    finally:
+        connection.close()
+        outcome.append((done, errors))
+
+
+def write_throughput(threads=8, writes=50, log=None):
+    """
+    `threads` users submitting `writes` predictions each, all at once, on the current
+    (empty) database. Returns committed writes per second and the count of lock errors.
+    """
+    log = log or (lambda message: None)
+    home, away = Team.objects.create(name="Write Home"), Team.objects.create(name="Write Away")
+    kickoff = timezone.now() + timedelta(days=1)
+    match_ids = [m.pk for m in Match.objects.bulk_create(
+        Match(home_team=home, away_team=away, kickoff_at=kickoff + timedelta(minutes=i)) for i in range(writes)
+    )]
+    users = User.objects.bulk_create(User(username=f"writer{i:03d}") for i in range(threads))
+    setup = database.describe(connection)
+    connection.close()
+
+    outcome = []
+    workers = [threading.Thread(target=_submit_predictions, args=(user, match_ids, outcome)) for user in users]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    done, errors = sum(d for d, _ in outcome), sum(e for _, e in outcome)
+    log(f"  {done} writes, {errors} lock errors in {elapsed:.2f}s")
+    return {
+        "database": setup,
+        "threads": threads,
+        "attempted": threads * writes,
+        "committed": done,
+        "lock_errors": errors,
+        "seconds": round(elapsed, 3),
+        "writes_per_s": round(done / elapsed, 1) if elapsed else None,
+    }
+
+
+def _percentile_ms(seconds, q):
+    if not seconds:
+        return None
+    if len(seconds) == 1:
+        return round(seconds[0] * 1000, 3)
+    return round(statistics.quantiles(seconds, n=100, method="inclusive")[q - 1] * 1000, 3)
+
+
+def _edit_through_kickoff(user, prediction, barrier, until, outcome):
+    client = Client(raise_request_exception=False)
+    client.force_login(user)
+    url = reverse("prediction-update", args=[prediction.pk])
+    picks = itertools.cycle(["AWAY", "HOME"])
+    attempts = []
+    try:
+        barrier.wait()
+        while time.time() < until:
+            started = time.time()
+            response = client.post(url, {"match": prediction.match_id, "pick": next(picks)})
+            attempts.append((started, time.time() - started, response.status_code))
+    finally:
+        connection.close()
+        outcome.extend(attempts)
+
+
+def _start_at(kickoff, barrier, outcome):
+    try:
+        barrier.wait()
+        time.sleep(max(0.0, kickoff - time.time()))
+        started = time.perf_counter()
+        outcome["started"] = len(kickoffs.start_due())
+        outcome["tick_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    finally:
+        connection.close()
+
+
+def kickoff_burst(threads=8, lead=3.0, after=1.0, log=None):
+    """
+    `threads` users editing their prediction on one match as fast as they can, from `lead`
+    seconds before its kickoff to `after` seconds past it, while a scheduler thread starts
+    the match on time. Before kickoff: committed edits per second and latency. After:
+    the 403 rejections, which should be cheap, and any edit accepted late (should be 0).
+    """
+    log = log or (lambda message: None)
+    home, away = Team.objects.create(name="Deadline Home"), Team.objects.create(name="Deadline Away")
+    users = User.objects.bulk_create(User(username=f"deadline{i:03d}") for i in range(threads))
+    kickoff = time.time() + lead + 1.0  # the extra second covers logins and thread start-up
+    match = Match.objects.create(
+        home_team=home, away_team=away, kickoff_at=timezone.now() + timedelta(seconds=kickoff - time.time())
+    )
+    predictions = [Prediction.objects.create(match=match, user=user, pick="HOME") for user in users]
+    setup = database.describe(connection)
+    connection.close()
+
+    outcome, tick = [], {}
+    barrier = threading.Barrier(threads + 1)
+    workers = [
+        threading.Thread(target=_edit_through_kickoff, args=(user, prediction, barrier, kickoff + after, outcome))
+        for user, prediction in zip(users, predictions)
+    ]
+    workers.append(threading.Thread(target=_start_at, args=(kickoff, barrier, tick)))
+    # every late edit is a 403 that django.request would log as a warning
+    request_log = logging.getLogger("django.request")
+    level = request_log.level
+    request_log.setLevel(logging.ERROR)
+    try:
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    finally:
+        request_log.setLevel(level)
+
+    before = [a for a in outcome if a[0] < kickoff]
+    late = [a for a in outcome if a[0] >= kickoff]
+    accepted = [a for a in before if a[2] == 302]
+    window = kickoff - min((a[0] for a in before), default=kickoff)
+    rejected = [a for a in late if a[2] == 403]
+    result = {
+        "database": setup,
+        "threads": threads,
+        "before_kickoff": {
+            "attempted": len(before),
+            "committed": len(accepted),
+            "errors": sum(a[2] >= 500 for a in before),
+            "writes_per_s": round(len(accepted) / window, 1) if window else None,
+            "p50_ms": _percentile_ms([a[1] for a in accepted], 50),
+            "p95_ms": _percentile_ms([a[1] for a in accepted], 95),
+        },
+        "after_kickoff": {
+            "attempted": len(late),
+            "rejected": len(rejected),
+            "accepted": sum(a[2] == 302 for a in late),
+            "errors": sum(a[2] >= 500 for a in late),
+            "p50_ms": _percentile_ms([a[1] for a in rejected], 50),
+            "p95_ms": _percentile_ms([a[1] for a in rejected], 95),
+        },
+        "scheduler": tick,
+    }
+    log(
+        f"  {len(accepted)} edits before kickoff ({result['before_kickoff']['writes_per_s']}/s), "
+        f"{len(rejected)} rejected after, {result['after_kickoff']['accepted']} accepted late"
+    )
+    return result
+
+
+# the last migration with the text pick / float probability layout
+STORAGE_BASELINE = ("main_app", "0015_season_archive")
+
+# the hot Prediction reads, as raw SQL so the same text runs against either layout
+# (name -> (sql, what the %s placeholders take: user, match or pick))
+STORAGE_QUERIES = {
+    "my_predictions": (
+        "SELECT id, match_id, pick, p_home, p_draw, p_away, created_at FROM {table} "
+        "WHERE user_id = %s ORDER BY created_at DESC, id DESC LIMIT 25", ("user",)),
+    "my_prediction_count": ("SELECT COUNT(*) FROM {table} WHERE user_id = %s", ("user",)),
+    "latest_predictions": (
+        "SELECT id, match_id, user_id, pick, created_at FROM {table} ORDER BY created_at DESC, id DESC LIMIT 25", ()),
+    "match_pick_split": ("SELECT pick, COUNT(*) FROM {table} WHERE match_id = %s GROUP BY pick", ("match",)),
+    "match_pickers": ("SELECT COUNT(*) FROM {table} WHERE match_id = %s AND pick = %s", ("match", "pick")),
+    "match_scoring_rows": (
+        "SELECT id, user_id, pick, p_home, p_draw, p_away FROM {table} WHERE match_id = %s", ("match",)),
+    "pick_distribution": ("SELECT pick, COUNT(*) FROM {table} GROUP BY pick", ()),
+}
+
+
+def _migrate(target):
+    executor = MigrationExecutor(connection)
+    if target is None:
+        target = executor.loader.graph.leaf_nodes(STORAGE_BASELINE[0])[0]
+    executor.migrate([target])
+
+
+def _fill_predictions(rows, users, chunk_size=1_000_000, log=None):
+    """`rows` predictions in the text/float layout: `users` users per match, 3/4 with probabilities."""
+    home, away = Team.objects.create(name="Storage Home"), Team.objects.create(name="Storage Away")
+    user_ids = [u.pk for u in User.objects.bulk_create(
+        (User(username=f"storage{i:06d}") for i in range(users)), batch_size=5000)]
+    start = timezone.now() - timedelta(days=365)
+    match_ids = [m.pk for m in Match.objects.bulk_create(
+        (Match(home_team=home, away_team=away, kickoff_at=start + timedelta(hours=i)) for i in range(-(-rows // users))),
+        batch_size=5000)]
+    if user_ids != list(range(user_ids[0], user_ids[0] + users)) or match_ids != list(range(match_ids[0], match_ids[0] + len(match_ids))):
+        raise RuntimeError("storage_layout needs an empty database")
+    table = connection.ops.quote_name(Prediction._meta.db_table)
+    sql = (
+        f"WITH RECURSIVE seq(i) AS (SELECT %s UNION ALL SELECT i + 1 FROM seq WHERE i < %s) "
+        f"INSERT INTO {table} (match_id, user_id, pick, p_home, p_draw, p_away, created_at, points, brier, log_loss) "
+        f"SELECT {match_ids[0]} + i / {users}, {user_ids[0]} + i %% {users}, "
+        f"CASE (i * 7 + i / {users}) %% 3 WHEN 0 THEN 'HOME' WHEN 1 THEN 'DRAW' ELSE 'AWAY' END, "
+        f"CASE WHEN i %% 4 = 3 THEN NULL ELSE h / 10000.0 END, CASE WHEN i %% 4 = 3 THEN NULL ELSE d / 10000.0 END, "
+        f"CASE WHEN i %% 4 = 3 THEN NULL ELSE (10000 - h - d) / 10000.0 END, "
+        f"datetime(%s, '+' || i || ' seconds'), CASE i %% 3 WHEN 0 THEN 3 ELSE 0 END, "
+        f"CASE WHEN i %% 4 = 3 THEN NULL ELSE (i %% 9973) / 10000.0 END, CASE WHEN i %% 4 = 3 THEN NULL ELSE (i %% 4999) / 1000.0 END "
+        f"FROM (SELECT i, h, (i * 104729) %% (9500 - h) + 250 AS d FROM (SELECT i, (i * 7919) %% 8000 + 1000 AS h FROM seq))"
+    )
+    base = start.strftime("%Y-%m-%d %H:%M:%S")
+    with connection.cursor() as cursor:
+        # a bigger page cache for the fill only; the measurements reconnect with the normal pragmas
+        cursor.execute("PRAGMA cache_size = -262144")
+        for offset in range(0, rows, chunk_size):
+            with transaction.atomic():
+                cursor.execute(sql, [offset, min(offset + chunk_size, rows) - 1, base])
+            if log:
+                log(f"  {min(offset + chunk_size, rows):,} predictions")
+    connection.close()
+    return user_ids, match_ids
+
+
+def _storage_sizes(table):
+    """{table or index name: bytes} from SQLite's dbstat."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT s.name, SUM(s.pgsize) FROM dbstat s JOIN sqlite_master m ON m.name = s.name "
+            "WHERE m.tbl_name = %s GROUP BY s.name ORDER BY s.name", [table]
+        )
+        return dict(cursor.fetchall())
+
+
+def _time_queries(table, samples, pick, repeat):
+    results = {}
+    with connection.cursor() as cursor:
+        for name, (sql, params) in STORAGE_QUERIES.items():
+            sql = sql.format(table=connection.ops.quote_name(table))
+            runs = [[{"pick": pick, **sample}[p] for p in params] for sample in samples] if params else [[]] * repeat
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, runs[0])
+            plan = "; ".join(row[-1] for row in cursor.fetchall())
+            timings = []
+            for args in runs:
+                started = time.perf_counter()
+                cursor.execute(sql, args)
+                cursor.fetchall()
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = {"median_ms": round(statistics.median(timings), 3), "runs": len(runs), "plan": plan}
+    return results
+
+
+def _storage_snapshot(samples, pick, repeat, log):
+    table = Prediction._meta.db_table
+    sizes = _storage_sizes(table)
+    queries = _time_queries(table, samples, pick, repeat)
+    log(f"  {sum(sizes.values()) / 2**20:.1f} MiB ({sizes.get(table, 0) / 2**20:.1f} MiB table)")
+    for name, stats in queries.items():
+        log(f"  {name}: {stats['median_ms']} ms ({stats['plan']})")
+    return {"bytes": sizes, "total_bytes": sum(sizes.values()), "queries": queries}
+
+
+def storage_layout(rows=10_000_000, users=25_000, samples=50, repeat=5, log=None):
+    """
+    Prediction storage before and after the compact layout (migrations 0016-0018), on the
+    current SQLite database, which must be empty: migrate it back to STORAGE_BASELINE, fill
+    it with `rows` predictions, measure table/index sizes (dbstat) and the STORAGE_QUERIES,
+    time the migration forward, then measure again.
+    """
+    log = log or (lambda message: None)
+    _migrate(STORAGE_BASELINE)
+    started = time.perf_counter()
+    user_ids, match_ids = _fill_predictions(rows, users, log=log)
+    fill_s = time.perf_counter() - started
+    step_u, step_m = max(1, len(user_ids) // samples), max(1, len(match_ids) // samples)
+    keys = [{"user": u, "match": m} for u, m in zip(user_ids[::step_u], match_ids[::step_m])]
+
+    log("  [text/float layout]")
+    before = _storage_snapshot(keys, "DRAW", repeat, log)
+    started = time.perf_counter()
+    _migrate(None)
+    migrate_s = time.perf_counter() - started
+    log(f"  migrated in {migrate_s:.1f} s")
+    connection.close()
+    log("  [compact layout]")
+    after = _storage_snapshot(keys, Prediction._meta.get_field("pick").get_prep_value("DRAW"), repeat, log)
+    return {
+        "database": database.describe(connection),
+        "rows": rows,
+        "users": len(user_ids),
+        "matches": len(match_ids),
+        "fill_s": round(fill_s, 3),
+        "migrate_s": round(migrate_s, 3),
+        "before": before,
+        "after": after,
+        "size_ratio": round(after["total_bytes"] / before["total_bytes"], 3),
+    }
@@ -0,0 +1,107 @@
+"""
+Versioned fragment caching.
+
+Every cached fragment key embeds the current version of each model it depends on
+("team", "match", "prediction", and "user" for usernames); the API also uses those versions and last-change times as
+ETag / Last-Modified validators. Saving or deleting one of those models bumps its version
+(see signals.py), so every fragment built from the old data simply stops being looked up
+and ages out of the cache; nothing has to be deleted explicitly.
+
+The versions only work if every writing process sees the same cache, so settings.CACHES
+defaults to a shared backend. Keys are scoped to the database they describe, so the test
+runner and the benchmarks (throwaway databases) never feed fragments to a live process.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+KEY_PREFIX = "pp"
+TRACKED_MODELS = ("team", "match", "prediction", "user")
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def _namespace():
+    db = connection.settings_dict
+    where = f"{db.get('HOST', '')}/{db['NAME']}"
+    return f"{KEY_PREFIX}:{hashlib.md5(where.encode()).hexdigest()[:8]}"
+
+
+def _version_key(model):
+    return f"{_namespace()}:v:{model}"
+
+
+def _fresh_version():
+    # seeded from the clock so a version lost to eviction can never collide with an old one
+    return int(time.time() * 1000)
+
+
+def get_versions(models):
+    keys = {_version_key(m): m for m in models}
+    found = cache.get_many(keys)
+    versions = {}
+    for key, model in keys.items():
+        if key not in found:
+            cache.add(key, _fresh_version(), timeout=None)
+            found[key] = cache.get(key)
+        versions[model] = found[key]
+    return versions
+
+
+def _changed_key(model):
+    return f"{_namespace()}:ts:{model}"
+
+
+def bump(model):
+    key = _version_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _fresh_version(), timeout=None)
+    cache.set(_changed_key(model), time.time(), timeout=None)
+
+
+def last_changed(models):
+    """Unix time of the latest write to any of `models` (now, if the stamp was evicted)."""
+    keys = [_changed_key(m) for m in models]
+    found = cache.get_many(keys)
+    now = time.time()
+    for key in keys:
+        if key not in found:
+            cache.add(key, now, timeout=None)
+            found[key] = cache.get(key)
+    return max(found.values())
+
+
+def fragment_key(name, versions, vary_on=()):
+    stamp = ".".join(f"{m}{versions[m]}" for m in sorted(versions))
+    vary = hashlib.md5(":".join(str(v) for v in vary_on).encode()).hexdigest()
+    return f"{_namespace()}:frag:{name}:{stamp}:{vary}"
+
+
+def get_fragment(key):
+    value = cache.get(key)
+    with _stats_lock:
+        _stats["hits" if value is not None else "misses"] += 1
+    return value
+
+
+def set_fragment(key, value):
+    cache.set(key, value, getattr(settings, "FRAGMENT_CACHE_TIMEOUT", 3600))
+
+
+def stats():
+    with _stats_lock:
+        hits, misses = _stats["hits"], _stats["misses"]
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hit_rate": hits / total if total else None}
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.update(hits=0, misses=0)
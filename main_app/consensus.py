@@ -0,0 +1,135 @@
+"""
+Per-match crowd consensus (MatchConsensus), maintained incrementally.
+
+Every prediction write turns into +1/-1 "votes" against its match's counters (total, pick
+counts, probability sums/counts); reconcile() recomputes the same numbers with one GROUP BY
+over Prediction to repair any drift.
+"""
+import math
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import MatchConsensus, Prediction
+from . import live
+
+COUNTER_FIELDS = [
+    "total", "home", "draw", "away",
+    "p_home_sum", "p_home_n", "p_draw_sum", "p_draw_n", "p_away_sum", "p_away_n",
+]
+_PICK_FIELD = {"HOME": "home", "DRAW": "draw", "AWAY": "away"}
+
+
+def vote(pick, p_home, p_draw, p_away):
+    """One prediction's contribution to its match's counters, keyed by COUNTER_FIELDS."""
+    counts = dict.fromkeys(COUNTER_FIELDS, 0)
+    counts["total"] = 1
+    if pick in _PICK_FIELD:
+        counts[_PICK_FIELD[pick]] = 1
+    for name, value in (("p_home", p_home), ("p_draw", p_draw), ("p_away", p_away)):
+        if value is not None:
+            counts[f"{name}_sum"] = value
+            counts[f"{name}_n"] = 1
+    return counts
+
+
+def apply_votes(deltas, create=True):
+    """Add {match_id: {field: delta}} onto MatchConsensus rows with one executemany of relative UPDATEs."""
+    deltas = {m: d for m, d in deltas.items() if m is not None and any(d.values())}
+    if not deltas:
+        return
+    qn = connection.ops.quote_name
+    assignments = ", ".join(f"{qn(f)} = {qn(f)} + %s" for f in COUNTER_FIELDS)
+    sql = f"UPDATE {qn(MatchConsensus._meta.db_table)} SET {assignments}, {qn('updated_at')} = %s WHERE {qn('match_id')} = %s"
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    with transaction.atomic():
+        if create:
+            MatchConsensus.objects.bulk_create(
+                [MatchConsensus(match_id=m) for m in deltas], ignore_conflicts=True
+            )
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, [(*(d[f] for f in COUNTER_FIELDS), now, m) for m, d in deltas.items()])
+    live.consensus_changed(deltas)
+
+
+def _diff(old, new):
+    deltas = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+    if old is not None and old[0] is not None:
+        for f, v in vote(*old[1:]).items():
+            deltas[old[0]][f] -= v
+    if new is not None:
+        for f, v in vote(*new[1:]).items():
+            deltas[new[0]][f] += v
+    return deltas
+
+
+def prediction_saved(prediction):
+    old = getattr(prediction, "_loaded_vote", None)
+    new = prediction.vote_key
+    if old == new:
+        return
+    apply_votes(_diff(old, new))
+    prediction._loaded_vote = new
+
+
+def apply_changes(changes):
+    """Apply [(old_vote or None, new_vote), ...] in one go, for bulk writes that skip signals."""
+    deltas = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+    for old, new in changes:
+        for match_id, d in _diff(old, new).items():
+            for f, v in d.items():
+                deltas[match_id][f] += v
+    apply_votes(deltas)
+
+
+def prediction_deleted(prediction):
+    old = getattr(prediction, "_loaded_vote", None) or prediction.vote_key
+    # never create rows here: the match itself may be going away in the same cascade
+    apply_votes(_diff(old, None), create=False)
+
+
+def recompute(match_ids=None):
+    """Fresh counters for every match with predictions: {match_id: {field: value}} in one GROUP BY."""
+    qs = Prediction.objects.all()
+    if match_ids is not None:
+        qs = qs.filter(match_id__in=match_ids)
+    rows = (
+        qs.order_by().values("match_id").annotate(
+            total=Count("id"),
+            home=Count("id", filter=Q(pick="HOME")),
+            draw=Count("id", filter=Q(pick="DRAW")),
+            away=Count("id", filter=Q(pick="AWAY")),
+            p_home_sum=Sum("p_home"), p_home_n=Count("p_home"),
+            p_draw_sum=Sum("p_draw"), p_draw_n=Count("p_draw"),
+            p_away_sum=Sum("p_away"), p_away_n=Count("p_away"),
+        )
+    )
+    return {row.pop("match_id"): {f: row[f] or 0 for f in COUNTER_FIELDS} for row in rows.iterator()}
+
+
+def reconcile(write=True):
+    """
+    Compare stored consensus rows with a full recompute.
+    Returns the list of drifted match ids; with write=True, also fixes them.
+    """
+    expected = recompute()
+    stored = {row.match_id: row for row in MatchConsensus.objects.all().iterator()}
+    drifted, to_update, to_create = [], [], []
+    for match_id in set(expected) | set(stored):
+        want = expected.get(match_id, dict.fromkeys(COUNTER_FIELDS, 0))
+        row = stored.get(match_id)
+        if row is None:
+            drifted.append(match_id)
+            to_create.append(MatchConsensus(match_id=match_id, **want))
+        elif not all(math.isclose(getattr(row, f), want[f], abs_tol=1e-9) for f in COUNTER_FIELDS):
+            drifted.append(match_id)
+            for f, v in want.items():
+                setattr(row, f, v)
+            to_update.append(row)
+    if write and drifted:
+        with transaction.atomic():
+            MatchConsensus.objects.bulk_create(to_create, batch_size=500)
+            MatchConsensus.objects.bulk_update(to_update, COUNTER_FIELDS, batch_size=500)
+    return sorted(drifted)
@@ -0,0 +1,36 @@
+"""
+Per-connection database setup for the profiles in settings.py.
+
+SQLite keeps most tuning per connection, so the SQLITE_PRAGMAS setting is applied from the
+connection_created signal (see signals.py) every time Django opens one. journal_mode=WAL is
+stored in the database file itself; setting it again is a no-op.
+"""
+from django.conf import settings
+
+
+def configure(connection):
+    if connection.vendor != "sqlite":
+        return
+    pragmas = getattr(settings, "SQLITE_PRAGMAS", {})
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+def describe(connection):
+    """The settings that matter for write concurrency, as the open connection reports them."""
+    if connection.vendor != "sqlite":
+        return {
+            "vendor": connection.vendor,
+            "conn_max_age": connection.settings_dict.get("CONN_MAX_AGE"),
+            "pool": bool(connection.settings_dict.get("OPTIONS", {}).get("pool")),
+        }
+    connection.ensure_connection()
+    report = {"vendor": "sqlite", "transaction_mode": connection.transaction_mode or "DEFERRED"}
+    with connection.cursor() as cursor:
+        for name in ("journal_mode", "synchronous", "busy_timeout", "mmap_size"):
+            cursor.execute(f"PRAGMA {name}")
+            report[name] = cursor.fetchone()[0]
+    return report
@@ -0,0 +1,99 @@
+"""
+Streaming exports of predictions and standings as CSV or NDJSON.
+
+Rows come straight from values_list(...).iterator(), so neither model instances nor the whole
+result set are ever held in memory; the same generators feed both the download views and the
+export_data management command.
+"""
+import csv
+import json
+from datetime import datetime
+
+from django.contrib.auth.models import User
+
+from .models import Prediction, Standing
+
+CHUNK_SIZE = 2000
+
+PREDICTION_COLUMNS = [
+    ("prediction_id", "id"),
+    ("match_id", "match_id"),
+    ("kickoff_at", "match__kickoff_at"),
+    ("home_team", "match__home_team__name"),
+    ("away_team", "match__away_team__name"),
+    ("status", "match__status"),
+    ("home_score", "match__home_score"),
+    ("away_score", "match__away_score"),
+    ("user", "user__username"),
+    ("pick", "pick"),
+    ("p_home", "p_home"),
+    ("p_draw", "p_draw"),
+    ("p_away", "p_away"),
+    ("created_at", "created_at"),
+    ("points", "points"),
+    ("brier", "brier"),
+    ("log_loss", "log_loss"),
+]
+
+STANDING_COLUMNS = [
+    ("user", "user__username"),
+    ("points", "points"),
+    ("scored", "scored"),
+    ("correct", "correct"),
+    ("probability_count", "probability_count"),
+    ("brier_total", "brier_total"),
+    ("log_loss_total", "log_loss_total"),
+    ("updated_at", "updated_at"),
+]
+
+CONTENT_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def filter_predictions(queryset, season=None, user=None, match=None):
+    if season:
+        queryset = queryset.filter(match__season=int(str(season).split("-")[0]))
+    if user:
+        queryset = queryset.filter(user=user) if isinstance(user, User) else queryset.filter(user__username=user)
+    if match:
+        queryset = queryset.filter(match_id=match)
+    return queryset
+
+
+def prediction_rows(queryset=None):
+    queryset = Prediction.objects.all() if queryset is None else queryset
+    fields = [f for _, f in PREDICTION_COLUMNS]
+    return queryset.order_by("id").values_list(*fields).iterator(chunk_size=CHUNK_SIZE)
+
+
+def standing_rows(queryset=None):
+    queryset = Standing.objects.all() if queryset is None else queryset
+    fields = [f for _, f in STANDING_COLUMNS]
+    return queryset.order_by("-points", "-correct", "user_id").values_list(*fields).iterator(chunk_size=CHUNK_SIZE)
+
+
+class _Echo:
+    """File-like object whose write() just hands the line back (for csv.writer)."""
+
+    def write(self, value):
+        return value
+
+
+def _cell(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def as_csv(columns, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([name for name, _ in columns])
+    for row in rows:
+        yield writer.writerow([_cell(v) for v in row])
+
+
+def as_ndjson(columns, rows):
+    names = [name for name, _ in columns]
+    for row in rows:
+        yield json.dumps(dict(zip(names, (_cell(v) for v in row)))) + "\n"
+
+
+def render(fmt, columns, rows):
+    return as_csv(columns, rows) if fmt == "csv" else as_ndjson(columns, rows)
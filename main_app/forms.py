@@ -1,28 +1,60 @@
 from django import forms
-from django.core.exceptions import ValidationError
+from django.conf import settings
+from django.contrib.auth.forms import UserCreationForm
+from django.core.files.base import ContentFile
+from django.core.validators import FileExtensionValidator
+from . import logos
 from .models import Match
-from .models import Prediction, Team
+from .models import Prediction, ProbabilityField, Season, Team, season_of
+class SignupForm(UserCreationForm):
+    def clean_username(self):
+        username = super().clean_username()
+        # the Elo baseline's account (ratings.system_user)
+        if username.lower() == settings.BASELINE_USERNAME.lower():
+            raise forms.ValidationError("That username is reserved.")
+        return username
+
+
 class TeamForm(forms.ModelForm):
+    # a plain FileField so SVGs get through; clean_logo checks the bytes and logos.py re-encodes them
+    logo = forms.FileField(
+        required=False,
+        validators=[FileExtensionValidator(["svg", "png", "jpg", "jpeg", "webp"])],
+        # FileInput so Django doesn't render the "Currently / Clear / Change" block
+        widget=forms.FileInput(attrs={"accept": ".svg,.png,.jpg,.jpeg,.webp", "class": "file-input"}),
+        label="Logo",
+    )
+
     class Meta:
         model = Team
         fields = ["name", "short_code", "founded_year", "logo"]
-        widgets = {
-            # Use FileInput so Django doesn't render the "Currently / Clear / Change" block
-            "logo": forms.FileInput(attrs={
-                "accept": ".svg,.png,.jpg,.jpeg",
-                "class": "file-input"
-            }),
-        }
         labels = {
             "name": "Name",
             "short_code": "Short code",
             "founded_year": "Founded year",
-            "logo": "Logo",
         }
+
+    def clean_logo(self):
+        logo = self.cleaned_data.get("logo")
+        if not logo or "logo" not in self.changed_data:
+            return logo
+        if logo.size > 2 * 1024 * 1024:
+            raise forms.ValidationError("Logos can be at most 2MB.")
+        # the upload is served as-is until the logo job has built its thumbnails
+        try:
+            data = logos.check_upload(logo.name, logo.read())
+        except logos.LogoError as exc:
+            raise forms.ValidationError(str(exc))
+        return ContentFile(data, name=logo.name)
+
+    def save(self, commit=True):
+        if "logo" in self.changed_data:
+            self.instance.logo_thumbs = {}  # rebuilt by the logo job
+        return super().save(commit)
 class MatchForm(forms.ModelForm):
     class Meta:
         model = Match
-        fields = ['home_team', 'away_team', 'kickoff_at', 'venue', 'status']
+        fields = ['home_team', 'away_team', 'kickoff_at', 'gameweek', 'venue', 'status']
         widgets = {
             # HTML5 picker; note the "T" between date and time
             'kickoff_at': forms.DateTimeInput(attrs={'type': 'datetime-local'}),
@@ -33,6 +65,43 @@ class MatchForm(forms.ModelForm):
         # Accept the value the datetime-local control posts (e.g. 2025-09-22T19:30)
         self.fields['kickoff_at'].input_formats = ['%Y-%m-%dT%H:%M', '%Y-%m-%d %H:%M']
 
+    def clean_kickoff_at(self):
+        kickoff = self.cleaned_data['kickoff_at']
+        if kickoff and Season.objects.filter(year=season_of(kickoff), archived_at__isnull=False).exists():
+            raise forms.ValidationError("That season has been archived; its matches can no longer change.")
+        return kickoff
+
+def season_choices():
+    years = Season.objects.filter(archived_at__isnull=True).values_list("year", flat=True)
+    return [("", "This season"), ("all", "All seasons")] + [(str(y), Season(year=y).label) for y in years]
+
+class ListFilterForm(forms.Form):
+    # GET filters shared by the match and prediction lists (all optional)
+    season = forms.ChoiceField(required=False)
+    q = forms.CharField(required=False, max_length=100, widget=forms.TextInput(attrs={"type": "search", "placeholder": "Search teams, venues"}))
+    status = forms.ChoiceField(choices=[("", "Any status")] + Match.STATUS, required=False)
+    team = forms.TypedChoiceField(coerce=int, empty_value=None, required=False)
+    date_from = forms.DateField(required=False, widget=forms.DateInput(attrs={"type": "date"}))
+    date_to = forms.DateField(required=False, widget=forms.DateInput(attrs={"type": "date"}))
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # once per form: a callable would be re-run for validation and for every render
+        self.fields["season"].choices = season_choices()
+        # plain choices, so a ?team= filter is validated against the same list the select renders
+        # instead of costing a lookup of its own (the list filters hold the team id)
+        teams = Team.objects.order_by("name").values_list("pk", "name")
+        self.fields["team"].choices = [("", "Any team")] + [(str(pk), name) for pk, name in teams]
+
+def validate_probabilities(ph, pd, pa):
+    provided = [v for v in (ph, pd, pa) if v is not None]
+    if provided:
+        if any(v < 0 or v > 1 for v in provided):
+            raise forms.ValidationError("Probabilities must be between 0 and 1.")
+        total = (ph or 0) + (pd or 0) + (pa or 0)
+        if abs(total - 1.0) > 0.05:  # 5% tolerance
+            raise forms.ValidationError("Probabilities should add up to ~1.0 (±0.05).")
+
 class PredictionForm(forms.ModelForm):
     class Meta:
         model = Prediction
@@ -66,26 +135,58 @@ class PredictionForm(forms.ModelForm):
             if choices and choices[0][0] in ("", None):  # first one is the blank
                 self.fields["pick"].choices = choices[1:]
 
+        # Only offer matches this user can still predict (teams joined so labels don't query).
+        # Already-predicted matches are excluded here, so the DB unique constraint is the only
+        # duplicate check left (the views catch its IntegrityError for races).
+        if self.user is not None and "match" in self.fields:
+            match_field = self.fields["match"]
+            match_field.queryset = Match.objects.open_for(self.user, include=self.instance.match_id)
+            match_field.error_messages["invalid_choice"] = (
+                "That match is closed for predictions or you already have a prediction for it."
+            )
+
     def clean(self):
         cleaned = super().clean()
-        ph, pd, pa = cleaned.get("p_home"), cleaned.get("p_draw"), cleaned.get("p_away")
-        match = cleaned.get("match")
-
-        #Probability validation
-        provided = [v for v in (ph, pd, pa) if v is not None]
-        if provided:
-            if any(v < 0 or v > 1 for v in provided):
-                raise forms.ValidationError("Probabilities must be between 0 and 1.")
-            total = (ph or 0) + (pd or 0) + (pa or 0)
-            if abs(total - 1.0) > 0.05:  # 5% tolerance
-                raise forms.ValidationError("Probabilities should add up to ~1.0 (±0.05).")
-
-        #Prevent duplicate predictions by same user for same match
-        if self.user and match:
-            qs = Prediction.objects.filter(user=self.user, match=match)
-            if self.instance.pk:
-                qs = qs.exclude(pk=self.instance.pk)
-            if qs.exists():
-                raise ValidationError("You already have a prediction for this match. Please edit it instead.")
+        validate_probabilities(cleaned.get("p_home"), cleaned.get("p_draw"), cleaned.get("p_away"))
+        return cleaned
+
 
+class GameweekPredictionForm(forms.Form):
+    """One row of the gameweek batch form; a blank pick means "leave this match alone"."""
+    match_id = forms.IntegerField(widget=forms.HiddenInput)
+    pick = forms.ChoiceField(choices=[("", "—")] + Prediction.PICK, required=False, widget=forms.RadioSelect)
+    p_home = forms.FloatField(required=False, widget=PredictionForm.Meta.widgets["p_home"])
+    p_draw = forms.FloatField(required=False, widget=PredictionForm.Meta.widgets["p_draw"])
+    p_away = forms.FloatField(required=False, widget=PredictionForm.Meta.widgets["p_away"])
+
+    def __init__(self, *args, match=None, **kwargs):
+        self.match = match
+        super().__init__(*args, **kwargs)
+
+    def clean(self):
+        cleaned = super().clean()
+        if cleaned.get("match_id") != self.match.pk:
+            raise forms.ValidationError("The fixture list changed while you were editing. Please reload.")
+        if not cleaned.get("pick") and any(cleaned.get(f) is not None for f in ("p_home", "p_draw", "p_away")):
+            raise forms.ValidationError("Choose a pick to go with the probabilities.")
+        validate_probabilities(cleaned.get("p_home"), cleaned.get("p_draw"), cleaned.get("p_away"))
+        # bulk writes skip pre_save: put the values on the stored grid before the view compares them
+        for f in ("p_home", "p_draw", "p_away"):
+            cleaned[f] = ProbabilityField.quantize(cleaned.get(f))
         return cleaned
+
+
+class BaseGameweekFormSet(forms.BaseFormSet):
+    def __init__(self, *args, matches=(), **kwargs):
+        self.matches = list(matches)
+        super().__init__(*args, **kwargs)
+
+    def total_form_count(self):
+        # one form per open match, whatever the posted management form claims
+        return len(self.matches)
+
+    def get_form_kwargs(self, index):
+        return {"match": self.matches[index]}
+
+
+GameweekFormSet = forms.formset_factory(GameweekPredictionForm, formset=BaseGameweekFormSet, extra=0)
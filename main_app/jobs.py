@@ -0,0 +1,169 @@
+"""
+Database-backed background jobs.
+
+Request code only calls enqueue(), from the signal handlers of the write that needs the job.
+The match views and import_fixtures save inside a transaction, so there a job exists exactly
+when that write committed; a bare Model.save() outside one commits the two separately. The run_jobs worker claims pending rows with a
+conditional UPDATE (safe with several workers), runs all claimed jobs of one kind through a
+single batch handler, and retries failures with exponential backoff until max_attempts.
+Handlers must be idempotent: a job can run again after a crash or a retry.
+"""
+import logging
+import traceback
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job, Prediction, Team
+from . import batch_scoring, caching, logos, ratings
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+RETRY_BASE_SECONDS = 10
+LOCK_TIMEOUT = timedelta(minutes=10)
+
+HANDLERS = {}
+
+
+def handler(kind):
+    """Register fn(payloads) as the batch handler for `kind`."""
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+def enqueue(kind, key, payload=None, run_after=None):
+    """
+    Make sure a job with this idempotency key is pending. Enqueueing a key that is already
+    pending is a no-op; a finished, failed or currently running job is re-armed, so work
+    requested after a run started is never lost. Returns False for the no-op case.
+    """
+    fields = {"kind": kind, "payload": payload or {}, "run_after": run_after or timezone.now()}
+    try:
+        with transaction.atomic():
+            Job.objects.create(key=key, **fields)
+    except IntegrityError:
+        # clearing locked_by makes the worker that is running it skip its own bookkeeping
+        return bool(Job.objects.filter(key=key).exclude(status="PENDING").update(
+            status="PENDING", attempts=0, locked_by="", locked_at=None, last_error="", finished_at=None, **fields
+        ))
+    return True
+
+
+def claim(limit=BATCH_SIZE, worker=None):
+    """Mark up to `limit` due jobs as RUNNING for this worker and return them."""
+    worker = worker or uuid.uuid4().hex
+    now = timezone.now()
+    # jobs left RUNNING by a worker that died are up for grabs again after LOCK_TIMEOUT; that
+    # counts as an attempt, so a job that keeps killing its worker ends up FAILED
+    stale = Job.objects.filter(status="RUNNING", locked_at__lt=now - LOCK_TIMEOUT)
+    stale.filter(attempts__gte=F("max_attempts") - 1).update(
+        status="FAILED", attempts=F("attempts") + 1, locked_by="", finished_at=now,
+        last_error="Worker lock expired; giving up.",
+    )
+    stale.update(status="PENDING", attempts=F("attempts") + 1, locked_by="", last_error="Worker lock expired.")
+    due = list(
+        Job.objects.filter(status="PENDING", run_after__lte=now).order_by("run_after", "id").values_list("id", flat=True)[:limit]
+    )
+    if not due:
+        return []
+    Job.objects.filter(id__in=due, status="PENDING").update(status="RUNNING", locked_by=worker, locked_at=now)
+    return list(Job.objects.filter(locked_by=worker, status="RUNNING"))
+
+
+def _still_ours(jobs):
+    return Job.objects.filter(id__in=[j.id for j in jobs], status="RUNNING", locked_by=jobs[0].locked_by)
+
+
+def _finish(jobs):
+    _still_ours(jobs).update(
+        status="DONE", attempts=F("attempts") + 1, locked_by="", finished_at=timezone.now(), last_error=""
+    )
+
+
+def _fail(jobs, error):
+    now = timezone.now()
+    ours = set(_still_ours(jobs).values_list("id", flat=True))
+    for job in jobs:
+        if job.id not in ours:
+            continue
+        attempts = job.attempts + 1
+        if attempts >= job.max_attempts:
+            changes = {"status": "FAILED", "finished_at": now}
+        else:
+            changes = {"status": "PENDING", "run_after": now + timedelta(seconds=RETRY_BASE_SECONDS * 2 ** (attempts - 1))}
+        Job.objects.filter(id=job.id).update(attempts=attempts, last_error=error, locked_by="", **changes)
+
+
+def run(jobs):
+    """Run claimed jobs, one handler call per kind. Returns (done, failed) counts."""
+    by_kind = defaultdict(list)
+    for job in jobs:
+        by_kind[job.kind].append(job)
+    done = failed = 0
+    for kind, batch in by_kind.items():
+        fn = HANDLERS.get(kind)
+        try:
+            if fn is None:
+                raise LookupError(f"No handler registered for job kind {kind!r}.")
+            with transaction.atomic():
+                fn([job.payload for job in batch])
+        except Exception:
+            logger.exception("Job batch %s (%d job(s)) failed", kind, len(batch))
+            _fail(batch, traceback.format_exc(limit=5))
+            failed += len(batch)
+        else:
+            _finish(batch)
+            done += len(batch)
+    return done, failed
+
+
+def run_pending(limit=BATCH_SIZE, worker=None):
+    """Claim and run one batch. Returns (done, failed)."""
+    return run(claim(limit, worker))
+
+
+# --- handlers ---
+
+def enqueue_settlement(match):
+    # one key per match: several saves before the worker gets to it collapse into one job,
+    # and the handler always scores the result as it is when the job runs
+    return enqueue("settle_match", f"settle:{match.pk}", {"match_id": match.pk})
+
+
+@handler("settle_match")
+def settle_matches(payloads):
+    """Rescore every prediction on the given matches in one vectorized pass (idempotent)."""
+    match_ids = sorted({p["match_id"] for p in payloads})
+    predictions = Prediction.objects.filter(match_id__in=match_ids)
+    changed = sum(c for _, c in batch_scoring.rescore(predictions, match_ids=match_ids))
+    if changed:
+        caching.bump("prediction")
+
+
+def enqueue_rating(match):
+    return enqueue("rate_results", f"rate:{match.pk}", {"match_id": match.pk})
+
+
+@handler("rate_results")
+def rate_results(payloads):
+    """Fold the matches' results into the ratings (or refit) and refresh the baseline predictions."""
+    ratings.results_changed(sorted({p["match_id"] for p in payloads}))
+
+
+def enqueue_logo(team):
+    return enqueue("process_logo", f"logo:{team.pk}", {"team_id": team.pk})
+
+
+@handler("process_logo")
+def process_logos(payloads):
+    """Build thumbnails / hashed copies for the given teams' logos (see logos.py)."""
+    teams = Team.objects.filter(pk__in={p["team_id"] for p in payloads}).exclude(logo="").exclude(logo=None)
+    if sum(logos.process_team(team) for team in teams):
+        caching.bump("team")
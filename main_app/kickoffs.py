@@ -0,0 +1,50 @@
+"""
+Prediction lock-in at kickoff.
+
+Predictions on a match close when it kicks off. is_locked() asks the database on every call:
+one primary-key probe for a SCHEDULED row whose kickoff is still ahead. Anything else (live,
+finished, postponed, unknown, or past its kickoff before the scheduler has started it) is
+locked. No cache sits in front of it, since no cache sees every writer in time: bulk
+imports, another process moving a kickoff, or the clock passing a kickoff between two reads.
+Match.objects.open_for() applies the same rule to the prediction forms' match choices.
+
+start_due() is the scheduler tick (the start_matches command). Every SCHEDULED match whose
+kickoff has passed becomes LIVE in one UPDATE over the same index. Like the other bulk
+writers it skips the Match signals, so it bumps the "match" version and tells live streams
+itself. A match going live has nothing else to update: it has no score, no points and no
+table row yet.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from . import caching, live
+from .models import Match
+
+
+def is_locked(match_id, now=None):
+    """True once predictions on the match are closed."""
+    return not Match.objects.filter(pk=match_id, status="SCHEDULED", kickoff_at__gt=now or timezone.now()).exists()
+
+
+def has_started(match, now=None):
+    """is_locked() for a Match the caller already has."""
+    return match.status != "SCHEDULED" or match.kickoff_at <= (now or timezone.now())
+
+
+def next_kickoff(now=None):
+    """Kickoff time of the next scheduled match, or None."""
+    upcoming = Match.objects.filter(status="SCHEDULED", kickoff_at__gt=now or timezone.now()).order_by("kickoff_at")
+    return upcoming.values_list("kickoff_at", flat=True).first()
+
+
+def start_due(now=None):
+    """Flip every SCHEDULED match whose kickoff has passed to LIVE; returns the started ids."""
+    due = Match.objects.filter(status="SCHEDULED", kickoff_at__lte=now or timezone.now())
+    with transaction.atomic():
+        started = list(due.values_list("id", flat=True))
+        if started:
+            due.filter(pk__in=started).update(status="LIVE")
+            live.status_changed(started, "LIVE")
+    if started:
+        caching.bump("match")
+    return started
@@ -0,0 +1,221 @@
+"""
+Per-team, per-season league table (TeamStanding), maintained incrementally.
+
+A finished match adds played / W-D-L / goals / points to both teams' rows for its season
+(July-June, named by start year: Match.season). When a result is set, corrected or
+removed, the signal handler takes back what the match contributed as loaded, adds what it
+contributes now with relative UPDATEs (like consensus.py), and re-reads the two teams'
+last five results for the form column. Bulk writers that skip signals call rebuild() for
+the seasons they touched. Rows of archived seasons (archive.py) are final: rebuild()
+leaves them alone.
+
+head_to_head() summarizes every finished meeting of two teams. Match.pair_low/pair_high
+hold the unordered pair, so both home/away orders are one index range (ArchivedMatch keeps
+the same columns and index); the summary is cached under the "match" version (caching.py)
+and costs no queries until a match changes.
+"""
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from . import caching
+from .models import ArchivedMatch, Match, Season, TeamStanding, season_of
+
+TABLE_FIELDS = ["played", "won", "drawn", "lost", "goals_for", "goals_against", "goal_difference", "points"]
+FORM_LENGTH = 5
+H2H_RECENT = 5
+POINTS = {"W": 3, "D": 1, "L": 0}
+
+
+def season_for(when):
+    return season_of(when)
+
+
+def _letter(goals_for, goals_against):
+    return "W" if goals_for > goals_against else "D" if goals_for == goals_against else "L"
+
+
+def _row(goals_for, goals_against):
+    letter = _letter(goals_for, goals_against)
+    return {
+        "played": 1, "won": int(letter == "W"), "drawn": int(letter == "D"), "lost": int(letter == "L"),
+        "goals_for": goals_for, "goals_against": goals_against,
+        "goal_difference": goals_for - goals_against, "points": POINTS[letter],
+    }
+
+
+def contribution(fixture, result):
+    """{(team_id, season): {field: value}} for one match; empty unless it is finished with a score."""
+    (home, away, kickoff), (status, home_score, away_score) = fixture, result
+    if status != "FT" or home_score is None or away_score is None or None in (home, away, kickoff):
+        return {}
+    season = season_for(kickoff)
+    return {(home, season): _row(home_score, away_score), (away, season): _row(away_score, home_score)}
+
+
+def apply(deltas, create=True):
+    """Add {(team_id, season): {field: delta}} onto TeamStanding rows with one executemany."""
+    deltas = {k: d for k, d in deltas.items() if any(d.values())}
+    if not deltas:
+        return
+    qn = connection.ops.quote_name
+    assignments = ", ".join(f"{qn(f)} = {qn(f)} + %s" for f in TABLE_FIELDS)
+    sql = (
+        f"UPDATE {qn(TeamStanding._meta.db_table)} SET {assignments}, {qn('updated_at')} = %s "
+        f"WHERE {qn('team_id')} = %s AND {qn('season')} = %s"
+    )
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    with transaction.atomic():
+        if create:
+            TeamStanding.objects.bulk_create(
+                [TeamStanding(team_id=t, season=s) for t, s in deltas], ignore_conflicts=True
+            )
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, [(*(d[f] for f in TABLE_FIELDS), now, t, s) for (t, s), d in deltas.items()])
+
+
+def recent_form(team_id, season):
+    rows = (
+        Match.objects.filter(Q(home_team_id=team_id) | Q(away_team_id=team_id))
+        .filter(season=season, status="FT", home_score__isnull=False, away_score__isnull=False)
+        .order_by("-kickoff_at", "-id")
+        .values_list("home_team_id", "home_score", "away_score")[:FORM_LENGTH]
+    )
+    letters = [_letter(h, a) if home == team_id else _letter(a, h) for home, h, a in rows]
+    return "".join(reversed(letters))
+
+
+def refresh_form(keys):
+    for team_id, season in keys:
+        TeamStanding.objects.filter(team_id=team_id, season=season).update(form=recent_form(team_id, season))
+
+
+def match_changed(match, deleted=False):
+    """Move the match's table contribution from its loaded state to its current one."""
+    loaded_fixture = getattr(match, "_loaded_fixture", None)
+    loaded_result = getattr(match, "_loaded_result", None)
+    old = contribution(loaded_fixture, loaded_result) if loaded_fixture and loaded_result else {}
+    new = {} if deleted else contribution(match.fixture_key, match.result_key)
+    if old == new and loaded_fixture == match.fixture_key:
+        return
+    deltas = defaultdict(lambda: dict.fromkeys(TABLE_FIELDS, 0))
+    for sign, side in ((-1, old), (1, new)):
+        for key, row in side.items():
+            for f, v in row.items():
+                deltas[key][f] += sign * v
+    with transaction.atomic():
+        # never create rows on delete: the team may be going away in the same cascade
+        apply(deltas, create=not deleted)
+        refresh_form(set(old) | set(new))
+    match._loaded_fixture = match.fixture_key
+
+
+def recompute(seasons=None):
+    """Fresh {(team_id, season): {field: value, "form": str}} from every finished match."""
+    table = defaultdict(lambda: dict.fromkeys(TABLE_FIELDS, 0))
+    results = defaultdict(list)
+    matches = Match.objects.filter(status="FT", home_score__isnull=False, away_score__isnull=False)
+    if seasons is not None:
+        matches = matches.filter(season__in=seasons)
+    rows = (
+        matches.order_by("kickoff_at", "id")
+        .values_list("home_team_id", "away_team_id", "kickoff_at", "home_score", "away_score")
+    )
+    for home, away, kickoff, home_score, away_score in rows.iterator(chunk_size=2000):
+        for key, row in contribution((home, away, kickoff), ("FT", home_score, away_score)).items():
+            for f, v in row.items():
+                table[key][f] += v
+            results[key].append(_letter(row["goals_for"], row["goals_against"]))
+    for key, row in table.items():
+        row["form"] = "".join(results[key][-FORM_LENGTH:])
+    return table
+
+
+def rebuild(seasons=None, write=True):
+    """
+    Compare stored table rows with a full recompute (optionally only some seasons).
+    Returns the drifted (team_id, season) keys; with write=True, also fixes them.
+    """
+    # archived seasons have no live matches left; their rows are final
+    archived = set(Season.objects.filter(archived_at__isnull=False).values_list("year", flat=True))
+    seasons = set(seasons) - archived if seasons is not None else None
+    expected = recompute(seasons)
+    stored_qs = TeamStanding.objects.exclude(season__in=archived)
+    if seasons is not None:
+        stored_qs = stored_qs.filter(season__in=seasons)
+    stored = {(r.team_id, r.season): r for r in stored_qs.iterator()}
+    fields = TABLE_FIELDS + ["form"]
+    empty = {**dict.fromkeys(TABLE_FIELDS, 0), "form": ""}
+    drifted, to_create, to_update = [], [], []
+    for key in set(expected) | set(stored):
+        want = expected.get(key, empty)
+        row = stored.get(key)
+        if row is None:
+            to_create.append(TeamStanding(team_id=key[0], season=key[1], **want))
+        elif any(getattr(row, f) != want[f] for f in fields):
+            for f in fields:
+                setattr(row, f, want[f])
+            to_update.append(row)
+        else:
+            continue
+        drifted.append(key)
+    if write and drifted:
+        with transaction.atomic():
+            TeamStanding.objects.bulk_create(to_create, batch_size=500)
+            TeamStanding.objects.bulk_update(to_update, fields, batch_size=500)
+    return sorted(drifted)
+
+
+def _pair_history(low, high, recent):
+    """
+    Summary of the pair's finished meetings, keyed by team id. Two indexed queries on the
+    live table, then the same on the archive (archived seasons are all older, so they only
+    top up the recent list).
+    """
+    home_win, away_win = Q(home_score__gt=F("away_score")), Q(home_score__lt=F("away_score"))
+    history = {"played": 0, "draws": 0, "wins": {low: 0, high: 0}, "goals": {low: 0, high: 0}, "recent": []}
+    for model in (Match, ArchivedMatch):
+        meetings = model.objects.filter(pair_low=low, pair_high=high, status="FT", home_score__isnull=False, away_score__isnull=False)
+        totals = meetings.aggregate(
+            played=Count("id"),
+            draws=Count("id", filter=Q(home_score=F("away_score"))),
+            low_wins=Count("id", filter=(Q(home_team_id=low) & home_win) | (Q(away_team_id=low) & away_win)),
+            high_wins=Count("id", filter=(Q(home_team_id=high) & home_win) | (Q(away_team_id=high) & away_win)),
+            low_goals=Sum("home_score", filter=Q(home_team_id=low), default=0) + Sum("away_score", filter=Q(away_team_id=low), default=0),
+            high_goals=Sum("home_score", filter=Q(home_team_id=high), default=0) + Sum("away_score", filter=Q(away_team_id=high), default=0),
+        )
+        history["played"] += totals["played"]
+        history["draws"] += totals["draws"]
+        history["wins"][low] += totals["low_wins"]
+        history["wins"][high] += totals["high_wins"]
+        history["goals"][low] += totals["low_goals"]
+        history["goals"][high] += totals["high_goals"]
+        missing = recent - len(history["recent"])
+        if missing > 0 and totals["played"]:
+            rows = meetings.order_by("-kickoff_at").values("id", "kickoff_at", "home_team_id", "home_score", "away_score")
+            history["recent"] += list(rows[:missing])
+    return history
+
+
+def head_to_head(team_id, other_id, recent=H2H_RECENT):
+    """
+    Finished meetings of two teams from team_id's side: played, wins, draws, losses,
+    goals_for, goals_against and the `recent` latest meetings (newest first).
+    """
+    low, high = min(team_id, other_id), max(team_id, other_id)
+    key = caching.fragment_key("h2h", caching.get_versions(["match"]), (low, high, recent))
+    history = caching.get_fragment(key)
+    if history is None:
+        history = _pair_history(low, high, recent)
+        caching.set_fragment(key, history)
+    return {
+        "played": history["played"],
+        "wins": history["wins"][team_id],
+        "draws": history["draws"],
+        "losses": history["wins"][other_id],
+        "goals_for": history["goals"][team_id],
+        "goals_against": history["goals"][other_id],
+        "recent": history["recent"],
+    }
@@ -0,0 +1,205 @@
+"""
+Live match updates pushed to browsers as Server-Sent Events.
+
+Each ASGI process keeps a broker of the matches its open streams watch. Every stream on a
+match gets the same pre-encoded message from an asyncio queue, so an update costs one
+publish however many fans are watching, and idle connections never touch the database.
+Updates reach the broker two ways:
+
+- A Match save or consensus update in this process publishes on commit, at once.
+- While anything is watched, one poller per process reads the state of every watched match
+  in one query each POLL_SECONDS. That picks up writes from other processes (other workers,
+  run_jobs settling, start_matches kickoffs, the admin). A state that did not change
+  publishes nothing.
+
+Needs an ASGI server (uvicorn on asgi.py, see the README): under WSGI an async stream would
+hold a worker thread for as long as the page is open, so available() is False there and the
+page falls back to its rendered state.
+"""
+import asyncio
+import json
+import threading
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+
+from .models import Match, MatchConsensus
+
+HEARTBEAT_SECONDS = 15
+POLL_SECONDS = 2
+QUEUE_SIZE = 16
+
+
+def available(request):
+    """True when the request came in over ASGI, the only way streams are served."""
+    return isinstance(request, ASGIRequest)
+
+
+def _percent(count, total):
+    return round(100 * count / total) if total else 0
+
+
+def match_state(match):
+    return {
+        "status": match.status,
+        "status_display": match.get_status_display(),
+        "home_score": match.home_score,
+        "away_score": match.away_score,
+    }
+
+
+def consensus_state(summary):
+    return {
+        "total": summary.total,
+        "home": _percent(summary.home, summary.total),
+        "draw": _percent(summary.draw, summary.total),
+        "away": _percent(summary.away, summary.total),
+    }
+
+
+def encode(state):
+    return f"event: update\ndata: {json.dumps(state)}\n\n"
+
+
+class Broker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}  # match_id -> {queue: loop}
+        self._latest = {}  # match_id -> state, only kept while someone is watching
+        self._poller = None
+
+    def watching(self, match_id):
+        return match_id in self._subscribers
+
+    def latest(self, match_id):
+        with self._lock:
+            return self._latest.get(match_id)
+
+    def subscribe(self, match_id):
+        """Register a queue for the match (before its state is read, so no change falls in between)."""
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(match_id, {})[queue] = asyncio.get_running_loop()
+            if self._poller is None or self._poller.done():
+                self._poller = asyncio.get_running_loop().create_task(self._poll())
+        return queue
+
+    def unsubscribe(self, match_id, queue):
+        with self._lock:
+            queues = self._subscribers.get(match_id, {})
+            queues.pop(queue, None)
+            if not queues:
+                self._subscribers.pop(match_id, None)
+                self._latest.pop(match_id, None)
+
+    def seed(self, match_id, state):
+        """Record a freshly read state unless an update already arrived."""
+        with self._lock:
+            if match_id in self._subscribers:
+                self._latest.setdefault(match_id, state)
+
+    def publish(self, match_id, changes):
+        """Merge `changes` into the match's state and fan the encoded message out (thread-safe)."""
+        with self._lock:
+            if match_id not in self._subscribers:
+                return
+            current = self._latest.get(match_id, {})
+            state = {**current, **changes}
+            if state == current:
+                return
+            self._latest[match_id] = state
+            targets = list(self._subscribers[match_id].items())
+        item = (encode(state), state.get("status") == "FT")
+        for queue, loop in targets:
+            loop.call_soon_threadsafe(_offer, queue, item)
+
+    async def poll_once(self):
+        with self._lock:
+            watched = list(self._subscribers)
+        if watched:
+            for match_id, state in (await sync_to_async(load_states)(watched)).items():
+                self.publish(match_id, state)
+        return bool(watched)
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(POLL_SECONDS)
+            if not await self.poll_once():
+                with self._lock:
+                    if not self._subscribers:
+                        self._poller = None
+                        return
+
+
+def _offer(queue, item):
+    # every message carries the full state, so a slow client can safely skip older ones
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(item)
+
+
+broker = Broker()
+
+
+def match_changed(match):
+    if broker.watching(match.pk):
+        state = match_state(match)
+        transaction.on_commit(lambda: broker.publish(match.pk, state))
+
+
+def status_changed(match_ids, status):
+    """Status flips written in bulk (kickoffs.start_due), which skip match_changed."""
+    watched = [m for m in match_ids if broker.watching(m)]
+    if not watched:
+        return
+    state = {"status": status, "status_display": dict(Match.STATUS)[status]}
+    transaction.on_commit(lambda: [broker.publish(m, state) for m in watched])
+
+
+def consensus_changed(match_ids):
+    watched = [m for m in match_ids if broker.watching(m)]
+    if not watched:
+        return
+
+    def publish():
+        for summary in MatchConsensus.objects.filter(match_id__in=watched):
+            broker.publish(summary.match_id, {"consensus": consensus_state(summary)})
+    transaction.on_commit(publish)
+
+
+def _state(match):
+    try:
+        summary = match.consensus
+    except MatchConsensus.DoesNotExist:
+        summary = MatchConsensus(match=match)
+    return {**match_state(match), "consensus": consensus_state(summary)}
+
+
+def load_states(match_ids):
+    """Current state of each of `match_ids` that still exists, in one query."""
+    return {m.pk: _state(m) for m in Match.objects.select_related("consensus").filter(pk__in=match_ids)}
+
+
+async def stream(match_id):
+    """The match's current state, then every change until full time (heartbeats in between)."""
+    queue = broker.subscribe(match_id)
+    try:
+        state = broker.latest(match_id)
+        if state is None:
+            state = (await sync_to_async(load_states)([match_id])).get(match_id, {})
+            broker.seed(match_id, state)
+        yield encode(broker.latest(match_id) or state)
+        if state.get("status") == "FT":
+            return
+        while True:
+            try:
+                message, final = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield message
+            if final:
+                break
+    finally:
+        broker.unsubscribe(match_id, queue)
@@ -0,0 +1,178 @@
+"""
+Team logo pipeline, run by the job worker (jobs.py) after a logo is uploaded.
+
+Raster uploads are decoded with Pillow, stripped of metadata, capped at MASTER_SIZE and
+re-encoded, then resized into one thumbnail per THUMB_SIZES entry. SVGs are sanitized
+(scripts, styles, animation, event handlers, javascript: values and external references
+removed) and used as-is at every size. TeamForm runs check_upload() on every upload first,
+so the file stored before the job gets to it is already safe to serve.
+
+Uploads arrive in uploads/teams/ (Team.logo's upload_to) under their own names and are
+deleted once processed. What the pipeline writes goes to LOGO_DIR under a name derived from
+its SHA-256 (hashed_name()), so the same bytes always get the same URL and those files can be
+served with "Cache-Control: public, max-age=31536000, immutable". Only the hashed names are
+immutable: a logo uploaded before the pipeline existed keeps its original name under LOGO_DIR
+until process_logos rewrites it.
+"""
+import hashlib
+import io
+import logging
+import os
+import xml.etree.ElementTree as ET
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+from .models import Team
+
+logger = logging.getLogger(__name__)
+
+LOGO_DIR = "images/teams"
+MASTER_SIZE = 512
+# twice the CSS box of the team cards (90px) and the detail page (140px), for HiDPI screens
+THUMB_SIZES = {"card": 180, "detail": 280}
+MAX_PIXELS = 25_000_000
+RASTER_FORMAT, RASTER_EXT = ("WEBP", "webp") if features.check("webp") else ("PNG", "png")
+
+SVG_NS = "http://www.w3.org/2000/svg"
+XLINK_NS = "http://www.w3.org/1999/xlink"
+_SVG_BANNED_TAGS = {
+    "script", "foreignObject", "iframe", "embed", "object", "audio", "video",
+    # animation can rewrite href and other attributes (to=/values=/from=) after sanitizing
+    "animate", "set", "animateMotion", "animateTransform", "animateColor", "discard",
+    # CSS can load external resources and hide or overlay page content; logos don't need it
+    "style",
+}
+ET.register_namespace("", SVG_NS)
+ET.register_namespace("xlink", XLINK_NS)
+
+
+class LogoError(ValueError):
+    pass
+
+
+def hashed_name(data, ext, suffix=""):
+    digest = hashlib.sha256(data).hexdigest()[:24]
+    return f"{LOGO_DIR}/{digest}{suffix}.{ext}"
+
+
+def _store(name, data):
+    if not default_storage.exists(name):
+        default_storage.save(name, ContentFile(data))
+    return name
+
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def sanitize_svg(data):
+    """Return the SVG with scripts, styles, animation, on* handlers, javascript: values and non-local references removed."""
+    if b"<!DOCTYPE" in data or b"<!ENTITY" in data:
+        raise LogoError("SVG files with DOCTYPE/ENTITY declarations are not accepted.")
+    try:
+        root = ET.fromstring(data)
+    except ET.ParseError as exc:
+        raise LogoError(f"Not a valid SVG: {exc}")
+    if _local(root.tag) != "svg":
+        raise LogoError("Not an SVG document.")
+    for parent in list(root.iter()):
+        for child in list(parent):
+            tag = _local(child.tag)
+            if tag in _SVG_BANNED_TAGS:
+                parent.remove(child)
+        for attr, value in list(parent.attrib.items()):
+            name = _local(attr).lower()
+            if name.startswith("on") or "javascript:" in "".join(value.split()).lower():
+                del parent.attrib[attr]
+            elif name == "href" and not value.strip().startswith("#"):
+                del parent.attrib[attr]
+            elif "url(" in value and "url(#" not in value.replace(" ", ""):
+                del parent.attrib[attr]
+    return ET.tostring(root, encoding="utf-8")
+
+
+def verify_raster(data):
+    """Raise LogoError unless `data` is a complete image Pillow can decode within MAX_PIXELS."""
+    try:
+        image = Image.open(io.BytesIO(data))
+        if image.width * image.height > MAX_PIXELS:
+            raise LogoError("Image is too large.")
+        image.verify()
+    except (UnidentifiedImageError, OSError, SyntaxError, Image.DecompressionBombError) as exc:
+        raise LogoError(f"Not a valid image: {exc}")
+
+
+def check_upload(name, data):
+    """The bytes to store for an upload: sanitized for SVGs, verified for rasters (LogoError if unusable)."""
+    if os.path.splitext(name)[1].lower() == ".svg":
+        return sanitize_svg(data)
+    verify_raster(data)
+    return data
+
+
+def _encode(image):
+    out = io.BytesIO()
+    if RASTER_FORMAT == "WEBP":
+        image.save(out, "WEBP", quality=85, method=6)
+    else:
+        image.save(out, "PNG", optimize=True)
+    return out.getvalue()
+
+
+def process_raster(data):
+    """(master name, {size key: thumbnail name}) for a raster upload."""
+    try:
+        image = Image.open(io.BytesIO(data))
+        if image.width * image.height > MAX_PIXELS:
+            raise LogoError("Image is too large.")
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as exc:
+        raise LogoError(f"Not a valid image: {exc}")
+    image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+    image.thumbnail((MASTER_SIZE, MASTER_SIZE), Image.LANCZOS)
+    master = _encode(image)
+    master_name = _store(hashed_name(master, RASTER_EXT), master)
+    thumbs = {}
+    for key, size in THUMB_SIZES.items():
+        thumb = image.copy()
+        thumb.thumbnail((size, size), Image.LANCZOS)
+        thumbs[key] = _store(hashed_name(master, RASTER_EXT, f"-{size}"), _encode(thumb))
+    return master_name, thumbs
+
+
+def process_svg(data):
+    clean = sanitize_svg(data)
+    name = _store(hashed_name(clean, "svg"), clean)
+    return name, dict.fromkeys(THUMB_SIZES, name)
+
+
+def process_team(team):
+    """
+    Run the pipeline for one team's current logo and point the team at the results.
+    Returns True if the team row changed. Unusable uploads are dropped (logged, not retried).
+    """
+    original = team.logo.name if team.logo else ""
+    if not original:
+        return False
+    try:
+        with default_storage.open(original, "rb") as fh:
+            data = fh.read()
+    except FileNotFoundError:
+        logger.warning("Logo for team %s is missing from storage: %s", team.pk, original)
+        return False
+    try:
+        if os.path.splitext(original)[1].lower() == ".svg":
+            name, thumbs = process_svg(data)
+        else:
+            name, thumbs = process_raster(data)
+    except LogoError as exc:
+        logger.warning("Dropping unusable logo for team %s (%s): %s", team.pk, original, exc)
+        name, thumbs = None, {}
+    # conditional on the logo we read, so a re-upload in the meantime is not overwritten
+    updated = Team.objects.filter(pk=team.pk, logo=original).update(logo=name, logo_thumbs=thumbs)
+    if updated and name != original and not Team.objects.filter(logo=original).exists():
+        default_storage.delete(original)
+    return bool(updated)
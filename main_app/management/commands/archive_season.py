@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main_app import archive
+from main_app.models import Match, Prediction, Season
+
+
+class Command(BaseCommand):
+    help = (
+        "Move finished seasons' matches and predictions into the read-only archive tables. "
+        "Without --season, every past season that is still live is archived."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--season", type=int, action="append", dest="seasons", help="Season start year (repeatable).")
+        parser.add_argument("--batch-size", type=int, default=archive.BATCH_SIZE, help="Matches moved per transaction.")
+        parser.add_argument("--dry-run", action="store_true", help="Report what would be moved without moving it.")
+
+    def handle(self, *args, seasons=None, batch_size=archive.BATCH_SIZE, dry_run=False, **options):
+        years = sorted(set(seasons)) if seasons else archive.candidates()
+        current = Season.current_year()
+        for year in years:
+            if year >= current:
+                raise CommandError(f"Season {year} has not finished yet.")
+            remaining = archive.open_matches(year)
+            if remaining:
+                raise CommandError(f"Season {year} still has {remaining} scheduled or live match(es).")
+        if not years:
+            self.stdout.write("No finished seasons left to archive.")
+            return
+        log = self.stdout.write if options["verbosity"] > 1 else None
+        for year in years:
+            label = Season(year=year).label
+            if dry_run:
+                matches = Match.objects.filter(season=year).count()
+                predictions = Prediction.objects.filter(match__season=year).count()
+                self.stdout.write(f"{label}: would move {matches} match(es) and {predictions} prediction(s).")
+                continue
+            season = archive.archive_season(year, batch_size=batch_size, log=log)
+            self.stdout.write(self.style.SUCCESS(
+                f"{label}: {season.archived_matches} match(es) and {season.archived_predictions} prediction(s) archived."
+            ))
@@ -0,0 +1,84 @@
+import json
+import platform
+import subprocess
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from main_app import benchmarks
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = "Time key views and operations on synthetic data at several scales; write the results as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scales", default="small,medium", help=f"Comma separated: {', '.join(benchmarks.SCALES)}.")
+        parser.add_argument("--operations", help=f"Comma separated subset of: {', '.join(benchmarks.OPERATIONS)}.")
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--output", help="Write the JSON results here (default: stdout).")
+        parser.add_argument("--compare", help="Earlier results file; fail if any median got slower than --threshold.")
+        parser.add_argument("--threshold", type=float, default=1.25, help="Allowed slowdown ratio for --compare.")
+
+    def handle(self, *args, **options):
+        scales = [s.strip() for s in options["scales"].split(",") if s.strip()]
+        operations = [o.strip() for o in options["operations"].split(",")] if options["operations"] else None
+        unknown = [s for s in scales if s not in benchmarks.SCALES]
+        unknown += [o for o in operations or () if o not in benchmarks.OPERATIONS]
+        if unknown:
+            raise CommandError(f"Unknown scale/operation: {', '.join(unknown)}")
+        log = (lambda message: self.stderr.write(message)) if options["verbosity"] > 0 else None
+
+        results = {
+            "commit": _commit(),
+            "created_at": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "repeat": options["repeat"],
+            "scales": {},
+        }
+        setup_test_environment()
+        try:
+            for scale in scales:
+                if log:
+                    log(f"[{scale}]")
+                # a fresh throwaway database per scale, never the real one
+                old_name = connection.settings_dict["NAME"]
+                connection.creation.create_test_db(verbosity=0, autoclobber=True)
+                try:
+                    results["scales"][scale] = benchmarks.run_scale(
+                        benchmarks.SCALES[scale], repeat=options["repeat"], operations=operations, log=log
+                    )
+                finally:
+                    connection.creation.destroy_test_db(old_name, verbosity=0)
+        finally:
+            teardown_test_environment()
+
+        payload = json.dumps(results, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                fh.write(payload + "\n")
+        else:
+            self.stdout.write(payload)
+
+        if options["compare"]:
+            with open(options["compare"]) as fh:
+                rows = benchmarks.compare(json.load(fh), results, options["threshold"])
+            regressed = [r for r in rows if r[5]]
+            for scale, name, before, after, ratio, slower in rows:
+                flag = "  REGRESSION" if slower else ""
+                self.stderr.write(f"{scale:>7} {name:<24} {before:>10.2f} -> {after:>10.2f} ms  x{ratio:.2f}{flag}")
+            if regressed:
+                raise CommandError(f"{len(regressed)} operation(s) slower than x{options['threshold']}.")
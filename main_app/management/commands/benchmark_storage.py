@@ -0,0 +1,51 @@
+import json
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from main_app import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Size the predictions table and time its hot reads on a throwaway SQLite database, "
+        "before and after the compact prediction layout."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10_000_000)
+        parser.add_argument("--users", type=int, default=25_000, help="Predictions per match.")
+        parser.add_argument("--samples", type=int, default=50, help="Users/matches each query is timed on.")
+        parser.add_argument("--output", help="Write the JSON results here (default: stdout).")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("benchmark_storage reads page sizes from SQLite's dbstat; run it on SQLite.")
+        log = (lambda message: self.stderr.write(message)) if options["verbosity"] > 0 else None
+        settings_dict = connection.settings_dict
+        saved_test = dict(settings_dict.get("TEST", {}))
+        # a file, not the usual in-memory test database: the on-disk size is what is being measured
+        settings_dict["TEST"]["NAME"] = os.path.join(tempfile.gettempdir(), "benchmark_storage.sqlite3")
+        old_name = settings_dict["NAME"]
+        setup_test_environment()
+        try:
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                result = benchmarks.storage_layout(
+                    options["rows"], options["users"], options["samples"], log=log
+                )
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+        finally:
+            settings_dict["TEST"] = saved_test
+            teardown_test_environment()
+
+        payload = json.dumps(result, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                fh.write(payload + "\n")
+        else:
+            self.stdout.write(payload)
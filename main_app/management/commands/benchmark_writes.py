@@ -0,0 +1,79 @@
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from main_app import benchmarks
+
+# SQLite profiles that can be compared in one process: (pragmas, connection OPTIONS)
+SQLITE_MODES = {
+    "default": ({}, {}),
+    "tuned": (settings.SQLITE_TUNED_PRAGMAS, settings.SQLITE_TUNED_OPTIONS),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure concurrent prediction writes on a throwaway database, per SQLite mode or on PostgreSQL: "
+        "new predictions (submit) or edits racing a kickoff (kickoff)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--scenario", choices=["submit", "kickoff"], default="submit")
+        parser.add_argument("--writes", type=int, default=50, help="submit: predictions submitted per thread.")
+        parser.add_argument("--lead", type=float, default=3.0, help="kickoff: seconds of edits before kickoff.")
+        parser.add_argument("--modes", default="default,tuned", help="SQLite only; comma separated: default, tuned.")
+        parser.add_argument("--output", help="Write the JSON results here (default: stdout).")
+
+    def handle(self, *args, **options):
+        log = (lambda message: self.stderr.write(message)) if options["verbosity"] > 0 else None
+        if connection.vendor == "sqlite":
+            modes = [m.strip() for m in options["modes"].split(",") if m.strip()]
+            unknown = [m for m in modes if m not in SQLITE_MODES]
+            if unknown:
+                raise CommandError(f"Unknown mode: {', '.join(unknown)}")
+        else:
+            modes = [connection.vendor]
+
+        results = {}
+        setup_test_environment()
+        try:
+            for mode in modes:
+                if log:
+                    log(f"[{mode}]")
+                results[mode] = self.run_mode(mode, options, log)
+        finally:
+            teardown_test_environment()
+
+        payload = json.dumps(results, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                fh.write(payload + "\n")
+        else:
+            self.stdout.write(payload)
+
+    def run_mode(self, mode, options, log):
+        settings_dict = connection.settings_dict
+        saved_options, saved_test = settings_dict.get("OPTIONS", {}), dict(settings_dict.get("TEST", {}))
+        pragmas = None
+        if mode in SQLITE_MODES:
+            pragmas, sqlite_options = SQLITE_MODES[mode]
+            settings_dict["OPTIONS"] = dict(sqlite_options)
+            # a file, not the usual in-memory test database: locking is what is being measured
+            settings_dict["TEST"]["NAME"] = os.path.join(tempfile.gettempdir(), f"benchmark_writes_{mode}.sqlite3")
+        old_name = settings_dict["NAME"]
+        with override_settings(SQLITE_PRAGMAS=pragmas if pragmas is not None else settings.SQLITE_PRAGMAS):
+            connection.close()
+            connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            try:
+                if options["scenario"] == "kickoff":
+                    return benchmarks.kickoff_burst(options["threads"], options["lead"], log=log)
+                return benchmarks.write_throughput(options["threads"], options["writes"], log=log)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                settings_dict["OPTIONS"], settings_dict["TEST"] = saved_options, saved_test
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main_app import exports
+from main_app.models import Prediction
+
+
+class Command(BaseCommand):
+    help = "Stream predictions or standings to a file (or stdout) as CSV or NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("what", choices=["predictions", "standings"])
+        parser.add_argument("--format", choices=sorted(exports.CONTENT_TYPES), default="csv")
+        parser.add_argument("--output", "-o", help="File to write; defaults to stdout.")
+        parser.add_argument("--season", help="e.g. 2024 or 2024-25 (predictions only).")
+        parser.add_argument("--user", help="Username (predictions only).")
+        parser.add_argument("--match", type=int, help="Match id (predictions only).")
+
+    def handle(self, *args, what, **options):
+        if what == "predictions":
+            try:
+                qs = exports.filter_predictions(
+                    Prediction.objects.all(), season=options["season"], user=options["user"], match=options["match"]
+                )
+            except ValueError:
+                raise CommandError("--season must look like 2024 or 2024-25.")
+            columns, rows = exports.PREDICTION_COLUMNS, exports.prediction_rows(qs)
+        else:
+            columns, rows = exports.STANDING_COLUMNS, exports.standing_rows()
+
+        out = open(options["output"], "w", newline="", encoding="utf-8") if options["output"] else None
+        write = out.write if out else (lambda chunk: self.stdout.write(chunk, ending=""))
+        try:
+            count = -1 if options["format"] == "csv" else 0  # don't count the CSV header
+            for chunk in exports.render(options["format"], columns, rows):
+                write(chunk)
+                count += 1
+        finally:
+            if out:
+                out.close()
+        if options["output"]:
+            self.stdout.write(self.style.SUCCESS(f"Wrote {count} {what} row(s) to {options['output']}."))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from main_app import ratings
+from main_app.models import TeamRating
+
+
+class Command(BaseCommand):
+    help = "Fit the baseline Elo model on finished matches and refresh its predictions for open fixtures."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--incremental", action="store_true", help="Only fold in results after the stored watermark.")
+        parser.add_argument("--no-predict", action="store_false", dest="predict", help="Leave the baseline predictions alone.")
+
+    def handle(self, *args, incremental=False, predict=True, **options):
+        if incremental:
+            applied = ratings.update()
+            model = ratings.get_model()
+        else:
+            model = ratings.fit()[0]
+            applied = model.matches
+        self.stdout.write(
+            f"{applied} result(s) applied; home advantage {model.home_advantage:.1f}, "
+            f"draw weight {model.draw_weight:.3f}, {model.matches} result(s) rated."
+        )
+        for row in TeamRating.objects.filter(model=model).select_related("team")[:5]:
+            self.stdout.write(f"  {row.team.name}: {row.rating:.0f} ({row.played} played)")
+        if predict:
+            self.stdout.write(self.style.SUCCESS(f"{ratings.predict_upcoming()} baseline prediction(s) written."))
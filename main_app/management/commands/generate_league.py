@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main_app import synthetic
+from main_app.models import Team
+
+
+class Command(BaseCommand):
+    help = "Fill the database with a deterministic synthetic league (teams, fixtures, users, predictions)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--teams", type=int, default=20)
+        parser.add_argument("--seasons", type=int, default=1)
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--coverage", type=float, default=0.3, help="Share of users predicting each match.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=synthetic.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if options["teams"] < 2:
+            raise CommandError("Need at least two teams.")
+        if Team.objects.filter(name__in=synthetic.team_names(options["teams"])).exists():
+            raise CommandError("Synthetic teams already exist; use a fresh database.")
+        log = self.stdout.write if options["verbosity"] > 1 else None
+        counts = synthetic.generate(
+            teams=options["teams"], seasons=options["seasons"], users=options["users"],
+            coverage=options["coverage"], seed=options["seed"], batch_size=options["batch_size"], log=log,
+        )
+        self.stdout.write(self.style.SUCCESS(", ".join(f"{n} {what}" for what, n in counts.items())))
@@ -0,0 +1,226 @@
+import csv
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from main_app import batch_scoring, caching, league, ratings, search
+from main_app.models import Match, Prediction, Season, Team, season_of
+
+UNIQUE_FIELDS = ["home_team", "away_team", "kickoff_at"]
+OPTIONAL_FIELDS = ["venue", "status", "home_score", "away_score", "gameweek"]
+STATUSES = {code for code, _ in Match.STATUS}
+
+
+def iter_csv(fh):
+    yield from csv.DictReader(fh)
+
+
+def iter_ndjson(fh):
+    for line in fh:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_json_array(fh, chunk_size=64 * 1024):
+    """Yield the objects of a top-level JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buf, pos, started = "", 0, False
+    while True:
+        chunk = fh.read(chunk_size)
+        buf = buf[pos:] + chunk
+        pos = 0
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if not started:
+                if pos == len(buf):
+                    break
+                if buf[pos] != "[":
+                    raise CommandError("JSON input must be an array of objects.")
+                started, pos = True, pos + 1
+                continue
+            if pos < len(buf) and buf[pos] == "]":
+                return
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise CommandError("Truncated or invalid JSON input.")
+                break  # need more data
+            yield obj
+            pos = end
+        if not chunk:
+            return
+
+
+READERS = {".csv": iter_csv, ".json": iter_json_array, ".ndjson": iter_ndjson, ".jsonl": iter_ndjson}
+
+
+class Command(BaseCommand):
+    help = (
+        "Import fixtures and results from a CSV, JSON array or NDJSON file. Rows are upserted on "
+        "(home_team, away_team, kickoff_at) in batches; rows with scores are settled in bulk."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=sorted(f.lstrip(".") for f in READERS))
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--create-teams", action="store_true", help="Create teams that do not exist yet.")
+        parser.add_argument("--user", help="Username recorded as created_by on new matches.")
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        suffix = f".{options['format']}" if options["format"] else path.suffix.lower()
+        if suffix not in READERS:
+            raise CommandError(f"Cannot tell the format of {path.name}; pass --format.")
+        self.created_by = None
+        if options["user"]:
+            self.created_by = User.objects.filter(username=options["user"]).first()
+            if self.created_by is None:
+                raise CommandError(f"No user named {options['user']!r}.")
+        self.create_teams = options["create_teams"]
+        # rows for archived seasons are skipped: those matches live in the archive tables now
+        self.archived = set(Season.objects.filter(archived_at__isnull=False).values_list("year", flat=True))
+        self.verbosity = options["verbosity"]
+        # one in-memory lookup for every team name and short code
+        self.teams = {}
+        for pk, name, code in Team.objects.values_list("pk", "name", "short_code"):
+            self.teams[name.casefold()] = pk
+            if code:
+                self.teams.setdefault(code.casefold(), pk)
+
+        self.seen = self.written = self.skipped = self.settled = 0
+        self.seasons = set()
+        # pending batches by the optional fields their rows carry, so a row never blanks a column it left out
+        pending = {}
+        with path.open(newline="", encoding="utf-8") as fh:
+            for row in READERS[suffix](fh):
+                self.seen += 1
+                fields = tuple(self.update_fields_for(row))
+                match = self.build(row)
+                if match is None:
+                    self.skipped += 1
+                    continue
+                key = (match.home_team_id, match.away_team_id, match.kickoff_at)
+                # an earlier row for the same match waiting with other fields goes first, so later rows still win
+                for other in [f for f, batch in pending.items() if f != fields and key in batch]:
+                    self.flush(pending.pop(other), other)
+                # later rows win; one statement cannot upsert the same key twice
+                batch = pending.setdefault(fields, {})
+                batch[key] = match
+                if len(batch) >= options["batch_size"]:
+                    self.flush(pending.pop(fields), fields)
+        for fields, batch in pending.items():
+            self.flush(batch, fields)
+
+        if self.seasons:
+            # bulk upserts skip signals: recount the league table for the seasons touched
+            league.rebuild(self.seasons)
+        if self.written:
+            search.rebuild()
+            caching.bump("match")
+            # new fixtures need baseline picks; results (late ones included) need a refit
+            ratings.fit()
+            ratings.predict_upcoming()
+        self.stdout.write(self.style.SUCCESS(
+            f"Read {self.seen} row(s): {self.written} upserted, {self.skipped} skipped, "
+            f"{self.settled} prediction score(s) updated."
+        ))
+
+    def update_fields_for(self, row):
+        fields = [f for f in OPTIONAL_FIELDS if f in row]
+        if ("home_score" in row or "away_score" in row) and "status" not in fields:
+            fields.append("status")
+        return fields
+
+    def team_id(self, name):
+        name = (name or "").strip()
+        if not name:
+            return None
+        pk = self.teams.get(name.casefold())
+        if pk is None and self.create_teams:
+            pk = Team.objects.get_or_create(name=name, defaults={"created_by": self.created_by})[0].pk
+            self.teams[name.casefold()] = pk
+        return pk
+
+    def build(self, row):
+        home, away = self.team_id(row.get("home_team")), self.team_id(row.get("away_team"))
+        try:
+            kickoff = parse_datetime(str(row.get("kickoff_at") or "").strip())
+        except ValueError:  # well-formed but impossible, e.g. 2025-02-30
+            kickoff = None
+        if home is None or away is None or home == away or kickoff is None:
+            self.stderr.write(f"Skipping row {self.seen}: unknown team or bad kickoff ({row})")
+            return None
+        if timezone.is_naive(kickoff):
+            kickoff = timezone.make_aware(kickoff)
+
+        def score(key):
+            value = row.get(key)
+            if value in (None, ""):
+                return None
+            value = int(value)
+            if value < 0:
+                raise ValueError(f"negative {key}")
+            return value
+
+        if season_of(kickoff) in self.archived:
+            self.stderr.write(f"Skipping row {self.seen}: season {season_of(kickoff)} is archived")
+            return None
+
+        try:
+            home_score, away_score = score("home_score"), score("away_score")
+        except ValueError:
+            self.stderr.write(f"Skipping row {self.seen}: bad score ({row})")
+            return None
+        try:
+            gameweek = score("gameweek")
+        except ValueError:
+            self.stderr.write(f"Skipping row {self.seen}: bad gameweek ({row})")
+            return None
+        status = (row.get("status") or "").strip().upper()
+        if not status:
+            status = "FT" if home_score is not None and away_score is not None else "SCHEDULED"
+        if status not in STATUSES:
+            self.stderr.write(f"Skipping row {self.seen}: unknown status {status!r}")
+            return None
+        return Match(
+            home_team_id=home, away_team_id=away, kickoff_at=kickoff,
+            venue=(row.get("venue") or "").strip(), status=status,
+            home_score=home_score, away_score=away_score, gameweek=gameweek, created_by=self.created_by,
+        )
+
+    def flush(self, batch, update_fields):
+        matches, update_fields = list(batch.values()), list(update_fields)
+        with transaction.atomic():
+            Match.objects.bulk_create(
+                matches,
+                update_conflicts=bool(update_fields),
+                ignore_conflicts=not update_fields,
+                unique_fields=UNIQUE_FIELDS if update_fields else None,
+                update_fields=update_fields or None,
+            )
+            self.written += len(matches)
+            Season.ensure(season_of(m.kickoff_at) for m in matches)
+            if "home_score" in update_fields or "status" in update_fields:
+                # bulk_create skips signals, so settle the touched matches in one vectorized pass
+                self.seasons.update(league.season_for(m.kickoff_at) for m in matches)
+                home_ids = {m.home_team_id for m in matches}
+                kickoffs = {m.kickoff_at for m in matches}
+                match_ids = [
+                    pk for pk, h, a, k in Match.objects.filter(home_team_id__in=home_ids, kickoff_at__in=kickoffs)
+                    .values_list("pk", "home_team_id", "away_team_id", "kickoff_at")
+                    if (h, a, k) in batch
+                ]
+                for _, changed in batch_scoring.rescore(
+                    Prediction.objects.filter(match_id__in=match_ids), match_ids=match_ids
+                ):
+                    self.settled += changed
+        if self.verbosity > 0:
+            self.stdout.write(f"  {self.seen} row(s) read, {self.written} upserted")
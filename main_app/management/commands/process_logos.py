@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from main_app import caching, jobs, logos
+from main_app.models import Team
+
+
+class Command(BaseCommand):
+    help = "Backfill hashed logo files and thumbnails for teams that do not have them yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--enqueue", action="store_true", help="Queue jobs for run_jobs instead of processing inline.")
+
+    def handle(self, *args, enqueue=False, **options):
+        teams = Team.objects.exclude(logo="").exclude(logo=None).filter(logo_thumbs={}).order_by("pk")
+        if enqueue:
+            queued = sum(jobs.enqueue_logo(team) for team in teams.iterator())
+            self.stdout.write(self.style.SUCCESS(f"Queued {queued} logo job(s)."))
+            return
+        processed = 0
+        for team in teams.iterator():
+            if logos.process_team(team):
+                processed += 1
+                if options["verbosity"] > 1:
+                    self.stdout.write(f"  {team.name}")
+        if processed:
+            caching.bump("team")
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} logo(s)."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main_app import league
+
+
+class Command(BaseCommand):
+    help = "Recount the per-season league table from finished matches and repair any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--season", type=int, action="append", dest="seasons", help="Season start year (repeatable).")
+        parser.add_argument("--check", action="store_true", help="Report drift without fixing it.")
+
+    def handle(self, *args, seasons=None, check=False, **options):
+        drifted = league.rebuild(seasons, write=not check)
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("League table is in sync."))
+            return
+        sample = ", ".join(f"team {t}/{s}" for t, s in drifted[:20])
+        if check:
+            raise CommandError(f"{len(drifted)} row(s) drifted: {sample}")
+        self.stdout.write(self.style.SUCCESS(f"Repaired {len(drifted)} table row(s): {sample}"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from main_app import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index for teams and matches from the current rows."
+
+    def handle(self, *args, **options):
+        if not search.backend():
+            self.stdout.write("No full-text index on this database; search uses icontains.")
+            return
+        search.rebuild()
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt."))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main_app import scoring
+
+
+class Command(BaseCommand):
+    help = "Rescore every prediction and rebuild the leaderboard (Standing) table from scratch."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check", action="store_true",
+            help="Only compare a full recompute with the stored standings; write nothing.",
+        )
+        parser.add_argument("--batch-size", type=int, default=scoring.BATCH_SIZE)
+
+    def handle(self, *args, check=False, batch_size=scoring.BATCH_SIZE, **options):
+        if check:
+            mismatches = scoring.diff_standings(scoring.compute_standings(batch_size=batch_size))
+            for user_id, have, want in mismatches[:20]:
+                self.stderr.write(f"user {user_id}: stored={have} recomputed={want}")
+            if mismatches:
+                raise CommandError(f"{len(mismatches)} standing(s) differ from a full recompute.")
+            self.stdout.write(self.style.SUCCESS("Standings match a full recompute."))
+            return
+
+        totals = scoring.compute_standings(write=True, batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt standings for {len(totals)} user(s)."))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main_app import consensus
+
+
+class Command(BaseCommand):
+    help = "Recompute per-match prediction consensus with one GROUP BY and repair any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true", help="Report drift without fixing it.")
+
+    def handle(self, *args, check=False, **options):
+        drifted = consensus.reconcile(write=not check)
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("Consensus is in sync."))
+            return
+        sample = ", ".join(str(m) for m in drifted[:20])
+        if check:
+            raise CommandError(f"{len(drifted)} match(es) drifted: {sample}")
+        self.stdout.write(self.style.SUCCESS(f"Repaired consensus for {len(drifted)} match(es): {sample}"))
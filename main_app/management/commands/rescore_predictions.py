@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_date
+
+from main_app import batch_scoring, caching
+from main_app.models import Prediction
+from main_app.pagination import day_bounds
+
+
+class Command(BaseCommand):
+    help = "Rescore predictions in bulk (vectorized) and apply the differences to the leaderboard."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--match", type=int, action="append", dest="matches", help="Only this match id (repeatable).")
+        parser.add_argument("--since", help="Only matches kicking off on/after this date (YYYY-MM-DD).")
+        parser.add_argument("--until", help="Only matches kicking off on/before this date (YYYY-MM-DD).")
+        parser.add_argument("--chunk-size", type=int, default=batch_scoring.CHUNK_SIZE)
+        parser.add_argument("--calibration", action="store_true", help="Print a calibration table.")
+        parser.add_argument("--dry-run", action="store_true", help="Score and report, but write nothing.")
+
+    def handle(self, *args, **options):
+        qs = Prediction.objects.all()
+        if options["matches"]:
+            qs = qs.filter(match_id__in=options["matches"])
+        lower, upper = day_bounds(
+            parse_date(options["since"]) if options["since"] else None,
+            parse_date(options["until"]) if options["until"] else None,
+        )
+        if lower:
+            qs = qs.filter(match__kickoff_at__gte=lower)
+        if upper:
+            qs = qs.filter(match__kickoff_at__lte=upper)
+
+        calibration = batch_scoring.Calibration() if options["calibration"] else None
+        started = time.perf_counter()
+        seen = changed = 0
+        for rows, updated in batch_scoring.rescore(
+            qs, chunk_size=options["chunk_size"], calibration=calibration, write=not options["dry_run"],
+            match_ids=options["matches"] or None,
+        ):
+            seen += rows
+            changed += updated
+            if options["verbosity"] > 1:
+                self.stdout.write(f"  {seen} scanned, {changed} changed")
+
+        if changed and not options["dry_run"]:
+            caching.bump("prediction")
+        elapsed = time.perf_counter() - started
+        verb = "would change" if options["dry_run"] else "changed"
+        self.stdout.write(self.style.SUCCESS(f"Rescored {seen} prediction(s), {verb} {changed}, in {elapsed:.2f}s."))
+
+        if calibration is not None:
+            self.stdout.write("bin          count   predicted  observed")
+            for lo, hi, n, predicted, observed in calibration.table():
+                self.stdout.write(f"{lo:.1f}-{hi:.1f}  {n:>10}  {predicted:>9.3f}  {observed:>8.3f}")
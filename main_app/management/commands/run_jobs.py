@@ -0,0 +1,60 @@
+import os
+import socket
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from main_app import jobs
+
+
+class Command(BaseCommand):
+    help = "Run background jobs (result settlement, ...) from the database queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Drain the queue once and exit.")
+        parser.add_argument("--batch-size", type=int, default=jobs.BATCH_SIZE, help="Jobs claimed per round.")
+        parser.add_argument("--threads", type=int, default=1, help="Worker threads (keep 1 on SQLite).")
+        parser.add_argument("--sleep", type=float, default=2.0, help="Seconds to wait when the queue is empty.")
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.stop = threading.Event()
+        self.totals = {"done": 0, "failed": 0}
+        self.lock = threading.Lock()
+        prefix = f"{socket.gethostname()}-{os.getpid()}"
+        threads = [
+            threading.Thread(target=self.work, args=(f"{prefix}-{i}",), daemon=True)
+            for i in range(max(1, options["threads"]))
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+        self.stdout.write(self.style.SUCCESS(
+            f"Ran {self.totals['done']} job(s), {self.totals['failed']} failed."
+        ))
+
+    def work(self, worker):
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                done, failed = jobs.run_pending(self.options["batch_size"], worker=worker)
+                with self.lock:
+                    self.totals["done"] += done
+                    self.totals["failed"] += failed
+                if done or failed:
+                    if self.options["verbosity"] > 1:
+                        self.stdout.write(f"  [{worker}] {done} done, {failed} failed")
+                    continue
+                if self.options["once"]:
+                    return
+                self.stop.wait(self.options["sleep"])
+        finally:
+            connection.close()
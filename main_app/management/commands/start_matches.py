@@ -0,0 +1,38 @@
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from main_app import kickoffs
+
+
+class Command(BaseCommand):
+    help = "Start matches at kickoff: flip every due SCHEDULED match to LIVE, once or as a long-running scheduler."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Run one tick and exit.")
+        parser.add_argument("--interval", type=float, default=30.0, help="Most seconds between ticks.")
+
+    def handle(self, *args, once=False, interval=30.0, **options):
+        stop = threading.Event()
+        total = 0
+        try:
+            while True:
+                close_old_connections()
+                started = kickoffs.start_due()
+                total += len(started)
+                if started and options["verbosity"] > 1:
+                    self.stdout.write(f"  started {len(started)} match(es): {', '.join(map(str, started))}")
+                if once:
+                    break
+                # wake at the next kickoff rather than polling; the interval catches edits made meanwhile
+                now = timezone.now()
+                upcoming = kickoffs.next_kickoff(now)
+                wait = interval if upcoming is None else min(interval, (upcoming - now).total_seconds())
+                stop.wait(max(wait, 0.05))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            connection.close()
+        self.stdout.write(self.style.SUCCESS(f"Started {total} match(es)."))
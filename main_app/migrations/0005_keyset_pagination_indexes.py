@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0004_remove_prediction_result_points'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='match',
+            name='main_app_ma_kickoff_287336_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='match',
+            name='main_app_ma_status_34e37e_idx',
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['kickoff_at', 'id'], name='main_app_ma_kickoff_5fa76c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['status', 'kickoff_at', 'id'], name='main_app_ma_status_e415e0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['created_at', 'id'], name='main_app_pr_created_dcbb73_idx'),
+        ),
+    ]
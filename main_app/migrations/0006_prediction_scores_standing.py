@@ -0,0 +1,101 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:02
+
+import math
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+OUTCOMES = ("HOME", "DRAW", "AWAY")
+
+
+def _score(pick, probs, outcome):
+    # points / Brier / log-loss as scoring.score() defines them today
+    points = 3 if pick == outcome else 0
+    if all(p is None for p in probs):
+        return points, None, None
+    probs = [p or 0.0 for p in probs]
+    actual = OUTCOMES.index(outcome)
+    brier = sum((p - (i == actual)) ** 2 for i, p in enumerate(probs))
+    return points, brier, -math.log(min(max(probs[actual], 1e-15), 1.0))
+
+
+def backfill(apps, schema_editor):
+    """Score the predictions of finished matches and sum them into Standing, as compute_standings(write=True)."""
+    Match = apps.get_model("main_app", "Match")
+    Prediction = apps.get_model("main_app", "Prediction")
+    Standing = apps.get_model("main_app", "Standing")
+    outcomes = {
+        pk: "HOME" if home > away else "AWAY" if home < away else "DRAW"
+        for pk, home, away in Match.objects.filter(
+            status="FT", home_score__isnull=False, away_score__isnull=False
+        ).values_list("pk", "home_score", "away_score")
+    }
+    totals = defaultdict(lambda: dict(points=0, scored=0, correct=0, probability_count=0, brier_total=0.0, log_loss_total=0.0))
+    pending = []
+    predictions = Prediction.objects.filter(match_id__in=list(outcomes)).only(
+        "id", "match_id", "user_id", "pick", "p_home", "p_draw", "p_away"
+    )
+    for p in predictions.iterator(chunk_size=2000):
+        p.points, p.brier, p.log_loss = _score(p.pick, (p.p_home, p.p_draw, p.p_away), outcomes[p.match_id])
+        pending.append(p)
+        if p.user_id is not None:
+            row = totals[p.user_id]
+            row["points"] += p.points
+            row["scored"] += 1
+            row["correct"] += p.points > 0
+            if p.brier is not None:
+                row["probability_count"] += 1
+                row["brier_total"] += p.brier
+                row["log_loss_total"] += p.log_loss
+        if len(pending) >= 1000:
+            Prediction.objects.bulk_update(pending, ["points", "brier", "log_loss"])
+            pending = []
+    Prediction.objects.bulk_update(pending, ["points", "brier", "log_loss"])
+    Standing.objects.bulk_create([Standing(user_id=u, **row) for u, row in totals.items()], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0005_keyset_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prediction',
+            name='brier',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='prediction',
+            name='log_loss',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='prediction',
+            name='points',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='Standing',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('points', models.IntegerField(default=0)),
+                ('scored', models.PositiveIntegerField(default=0)),
+                ('correct', models.PositiveIntegerField(default=0)),
+                ('probability_count', models.PositiveIntegerField(default=0)),
+                ('brier_total', models.FloatField(default=0)),
+                ('log_loss_total', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='standing', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-points', '-correct', 'user_id'],
+                'indexes': [models.Index(fields=['-points', '-correct', 'user'], name='main_app_st_points_ed135e_idx')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
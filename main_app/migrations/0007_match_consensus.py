@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill(apps, schema_editor):
+    """One GROUP BY over the existing predictions, as consensus.recompute() does."""
+    Prediction = apps.get_model("main_app", "Prediction")
+    MatchConsensus = apps.get_model("main_app", "MatchConsensus")
+    rows = Prediction.objects.order_by().values("match_id").annotate(
+        total=Count("id"),
+        home=Count("id", filter=Q(pick="HOME")),
+        draw=Count("id", filter=Q(pick="DRAW")),
+        away=Count("id", filter=Q(pick="AWAY")),
+        p_home_sum=Sum("p_home"), p_home_n=Count("p_home"),
+        p_draw_sum=Sum("p_draw"), p_draw_n=Count("p_draw"),
+        p_away_sum=Sum("p_away"), p_away_n=Count("p_away"),
+    )
+    MatchConsensus.objects.bulk_create(
+        (MatchConsensus(**{f: v or 0 for f, v in row.items()}) for row in rows.iterator()), batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0006_prediction_scores_standing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatchConsensus',
+            fields=[
+                ('match', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='consensus', serialize=False, to='main_app.match')),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('home', models.PositiveIntegerField(default=0)),
+                ('draw', models.PositiveIntegerField(default=0)),
+                ('away', models.PositiveIntegerField(default=0)),
+                ('p_home_sum', models.FloatField(default=0)),
+                ('p_home_n', models.PositiveIntegerField(default=0)),
+                ('p_draw_sum', models.FloatField(default=0)),
+                ('p_draw_n', models.PositiveIntegerField(default=0)),
+                ('p_away_sum', models.FloatField(default=0)),
+                ('p_away_n', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:33
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+FIELDS = ["played", "won", "drawn", "lost", "goals_for", "goals_against", "goal_difference", "points"]
+
+
+def _season(when):
+    # July-June seasons named by start year, as models.season_of()
+    local = timezone.localtime(when) if timezone.is_aware(when) else when
+    return local.year if local.month >= 7 else local.year - 1
+
+
+def backfill(apps, schema_editor):
+    """The table rows and last-five form of every finished match so far, as league.recompute() builds them."""
+    Match = apps.get_model("main_app", "Match")
+    TeamStanding = apps.get_model("main_app", "TeamStanding")
+    table = defaultdict(lambda: dict.fromkeys(FIELDS, 0))
+    form = defaultdict(str)
+    rows = (
+        Match.objects.filter(status="FT", home_score__isnull=False, away_score__isnull=False)
+        .order_by("kickoff_at", "id")
+        .values_list("home_team_id", "away_team_id", "kickoff_at", "home_score", "away_score")
+    )
+    for home, away, kickoff, home_score, away_score in rows.iterator(chunk_size=2000):
+        season = _season(kickoff)
+        for team, scored, conceded in ((home, home_score, away_score), (away, away_score, home_score)):
+            letter = "W" if scored > conceded else "D" if scored == conceded else "L"
+            row = table[team, season]
+            row["played"] += 1
+            row[{"W": "won", "D": "drawn", "L": "lost"}[letter]] += 1
+            row["goals_for"] += scored
+            row["goals_against"] += conceded
+            row["goal_difference"] += scored - conceded
+            row["points"] += {"W": 3, "D": 1, "L": 0}[letter]
+            form[team, season] = (form[team, season] + letter)[-5:]
+    TeamStanding.objects.bulk_create(
+        [TeamStanding(team_id=t, season=s, form=form[t, s], **row) for (t, s), row in table.items()], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0009_team_logo_thumbs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeamStanding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('season', models.PositiveSmallIntegerField()),
+                ('played', models.PositiveIntegerField(default=0)),
+                ('won', models.PositiveIntegerField(default=0)),
+                ('drawn', models.PositiveIntegerField(default=0)),
+                ('lost', models.PositiveIntegerField(default=0)),
+                ('goals_for', models.PositiveIntegerField(default=0)),
+                ('goals_against', models.PositiveIntegerField(default=0)),
+                ('goal_difference', models.IntegerField(default=0)),
+                ('points', models.IntegerField(default=0)),
+                ('form', models.CharField(blank=True, max_length=5)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='season_standings', to='main_app.team')),
+            ],
+            options={
+                'ordering': ['season', '-points', '-goal_difference', '-goals_for', 'team_id'],
+                'indexes': [models.Index(fields=['season', '-points', '-goal_difference', '-goals_for', 'team'], name='main_app_te_season_aba1b3_idx')],
+                'constraints': [models.UniqueConstraint(fields=('team', 'season'), name='unique_team_season')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
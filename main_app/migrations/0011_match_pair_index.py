@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:36
+
+import django.db.models.functions.comparison
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0010_team_standing'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='pair_high',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Greatest('home_team', 'away_team'), output_field=models.BigIntegerField()),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='pair_low',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Least('home_team', 'away_team'), output_field=models.BigIntegerField()),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['pair_low', 'pair_high', '-kickoff_at'], name='main_app_ma_pair_lo_a268e5_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+from django.db import migrations
+
+# Kept in sync by main_app/search.py. SQLite gets FTS5 tables (rowid = object id) with
+# 1-4 character prefix indexes; PostgreSQL gets a generated tsvector under a GIN index.
+TABLES = ["main_app_match_search", "main_app_team_search"]
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table in TABLES:
+        if vendor == "sqlite":
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE {table} USING fts5("
+                f"body, tokenize = 'unicode61 remove_diacritics 2', prefix = '1 2 3 4')"
+            )
+        elif vendor == "postgresql":
+            schema_editor.execute(
+                f"CREATE TABLE {table} (id bigint PRIMARY KEY, body text NOT NULL, "
+                f"document tsvector GENERATED ALWAYS AS (to_tsvector('simple', body)) STORED)"
+            )
+            schema_editor.execute(f"CREATE INDEX {table}_document ON {table} USING gin (document)")
+        else:
+            return
+    documents = [
+        ("main_app_team_search", "SELECT t.id, t.name || ' ' || t.short_code FROM main_app_team t"),
+        ("main_app_match_search",
+         "SELECT m.id, h.name || ' ' || h.short_code || ' ' || a.name || ' ' || a.short_code || ' ' || m.venue "
+         "FROM main_app_match m JOIN main_app_team h ON h.id = m.home_team_id JOIN main_app_team a ON a.id = m.away_team_id"),
+    ]
+    key = "rowid" if vendor == "sqlite" else "id"
+    for table, select in documents:
+        schema_editor.execute(f"INSERT INTO {table} ({key}, body) {select}")
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ("sqlite", "postgresql"):
+        for table in TABLES:
+            schema_editor.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main_app", "0012_team_fixture_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0013_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=30, unique=True)),
+                ('k_factor', models.FloatField(default=20)),
+                ('home_advantage', models.FloatField(default=60)),
+                ('draw_weight', models.FloatField(default=0.6)),
+                ('matches', models.PositiveIntegerField(default=0)),
+                ('rated_through_kickoff', models.DateTimeField(blank=True, null=True)),
+                ('rated_through_id', models.BigIntegerField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TeamRating',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rating', models.FloatField()),
+                ('played', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='team_ratings', to='main_app.ratingmodel')),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ratings', to='main_app.team')),
+            ],
+            options={
+                'ordering': ['-rating'],
+                'constraints': [models.UniqueConstraint(fields=('model', 'team'), name='unique_team_rating')],
+            },
+        ),
+    ]
@@ -0,0 +1,158 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:59
+
+from datetime import datetime
+
+import django.db.models.deletion
+import main_app.models
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max, Min
+from django.utils import timezone
+
+
+def _season(when):
+    # July-June seasons named by start year, in local time
+    local = timezone.localtime(when) if timezone.is_aware(when) else when
+    return local.year if local.month >= 7 else local.year - 1
+
+
+def fill_seasons(apps, schema_editor):
+    """Existing matches get the season of their kickoff (one UPDATE per season) and a Season row."""
+    Match = apps.get_model("main_app", "Match")
+    Season = apps.get_model("main_app", "Season")
+    span = Match.objects.aggregate(first=Min("kickoff_at"), last=Max("kickoff_at"))
+    if span["first"] is None:
+        return
+    years = []
+    tz = timezone.get_current_timezone()
+    for year in range(_season(span["first"]), _season(span["last"]) + 1):
+        lower, upper = timezone.make_aware(datetime(year, 7, 1), tz), timezone.make_aware(datetime(year + 1, 7, 1), tz)
+        if Match.objects.filter(kickoff_at__gte=lower, kickoff_at__lt=upper).update(season=year):
+            years.append(year)
+    Season.objects.bulk_create([Season(year=year) for year in years])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0014_rating_model'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedMatch',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('season', models.PositiveSmallIntegerField()),
+                ('gameweek', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('kickoff_at', models.DateTimeField()),
+                ('pair_low', models.BigIntegerField()),
+                ('pair_high', models.BigIntegerField()),
+                ('venue', models.CharField(blank=True, max_length=120)),
+                ('status', models.CharField(choices=[('SCHEDULED', 'Scheduled'), ('LIVE', 'Live'), ('FT', 'Full Time'), ('POSTPONED', 'Postponed'), ('CANCELLED', 'Cancelled')], max_length=12)),
+                ('home_score', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('away_score', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('home_picks', models.PositiveIntegerField(default=0)),
+                ('draw_picks', models.PositiveIntegerField(default=0)),
+                ('away_picks', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['kickoff_at', 'id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedPrediction',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('pick', models.PositiveSmallIntegerField(choices=[(0, 'Home'), (1, 'Draw'), (2, 'Away')])),
+                ('p_home', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('p_draw', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('p_away', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('points', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('brier', models.FloatField(blank=True, null=True)),
+                ('log_loss', models.FloatField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Season',
+            fields=[
+                ('year', models.PositiveSmallIntegerField(primary_key=True, serialize=False)),
+                ('archived_at', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('archived_matches', models.PositiveIntegerField(default=0, editable=False)),
+                ('archived_predictions', models.PositiveIntegerField(default=0, editable=False)),
+            ],
+            options={
+                'ordering': ['-year'],
+            },
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='gameweek',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='season',
+            field=main_app.models.SeasonField(default=0, editable=False),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_seasons, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['season', 'kickoff_at', 'id'], name='main_app_ma_season_f61b67_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['season', 'status', 'kickoff_at', 'id'], name='main_app_ma_season_f8fe09_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['season', 'gameweek', 'kickoff_at'], name='main_app_ma_season_507b3a_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedmatch',
+            name='away_team',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='archived_away_matches', to='main_app.team'),
+        ),
+        migrations.AddField(
+            model_name='archivedmatch',
+            name='home_team',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='archived_home_matches', to='main_app.team'),
+        ),
+        migrations.AddField(
+            model_name='archivedprediction',
+            name='match',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='predictions', to='main_app.archivedmatch'),
+        ),
+        migrations.AddField(
+            model_name='archivedprediction',
+            name='user',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='archived_predictions', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='archivedmatch',
+            index=models.Index(fields=['season', 'kickoff_at', 'id'], name='main_app_ar_season_d1e820_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedmatch',
+            index=models.Index(fields=['home_team', 'kickoff_at'], name='main_app_ar_home_te_56c0c5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedmatch',
+            index=models.Index(fields=['away_team', 'kickoff_at'], name='main_app_ar_away_te_885a2d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedmatch',
+            index=models.Index(fields=['pair_low', 'pair_high', '-kickoff_at'], name='main_app_ar_pair_lo_9263d1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedprediction',
+            index=models.Index(fields=['match', 'user'], name='main_app_ar_match_i_6ca086_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedprediction',
+            index=models.Index(fields=['user', 'match'], name='main_app_ar_user_id_d1db97_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:20
+
+import main_app.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """First of three steps from text/float predictions to small integers: add the new columns (nullable, so no table rewrite)."""
+
+    dependencies = [
+        ('main_app', '0015_season_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prediction',
+            name='pick_code',
+            field=main_app.models.PickField(null=True),
+        ),
+        migrations.AddField(
+            model_name='prediction',
+            name='p_home_units',
+            field=main_app.models.ProbabilityField(null=True),
+        ),
+        migrations.AddField(
+            model_name='prediction',
+            name='p_draw_units',
+            field=main_app.models.ProbabilityField(null=True),
+        ),
+        migrations.AddField(
+            model_name='prediction',
+            name='p_away_units',
+            field=main_app.models.ProbabilityField(null=True),
+        ),
+    ]
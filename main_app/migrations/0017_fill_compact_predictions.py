@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:20
+
+from django.db import migrations, transaction
+
+BATCH_SIZE = 50000
+PROBABILITIES = ("p_home", "p_draw", "p_away")
+# the encoding as of this migration (PickField.CODES, ProbabilityField.SCALE), frozen here:
+# historical models carry no class attributes, and later edits to the fields must not
+# change what this step writes
+CODES = {"HOME": 0, "DRAW": 1, "AWAY": 2}
+SCALE = 10000
+
+
+def _batches(schema_editor, Prediction, sql):
+    """Run `sql` (with %s, %s for an id range) over the table in BATCH_SIZE id ranges, one transaction each."""
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT MIN(id), MAX(id) FROM {connection.ops.quote_name(Prediction._meta.db_table)}")
+        first, last = cursor.fetchone()
+    if first is None:
+        return
+    for start in range(first, last + 1, BATCH_SIZE):
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(sql, [start, start + BATCH_SIZE])
+
+
+def check_picks(Prediction):
+    """
+    Fail before writing anything if a pick has no code: its pick_code would stay NULL and
+    0018 would then fail half way, making pick_code NOT NULL after dropping the old column.
+    """
+    unknown = Prediction.objects.exclude(pick__in=CODES).order_by("id")
+    count = unknown.count()
+    if count:
+        sample = ", ".join(f"{pk}: {pick!r}" for pk, pick in unknown.values_list("id", "pick")[:10])
+        raise ValueError(
+            f"{count} prediction(s) have a pick other than {', '.join(CODES)} (id: pick, first 10: {sample}). "
+            "Fix or delete them, then migrate again."
+        )
+
+
+def encode(apps, schema_editor):
+    """Copy each pick to its 0/1/2 code and each probability to 1/10000 units; rows already done are skipped."""
+    Prediction = apps.get_model("main_app", "Prediction")
+    check_picks(Prediction)
+    qn = schema_editor.connection.ops.quote_name
+    pick = "CASE pick " + " ".join(f"WHEN '{label}' THEN {code}" for label, code in CODES.items()) + " END"
+    units = ", ".join(f"{p}_units = CAST(ROUND({p} * {SCALE}) AS INTEGER)" for p in PROBABILITIES)
+    _batches(schema_editor, Prediction, (
+        f"UPDATE {qn(Prediction._meta.db_table)} SET pick_code = {pick}, {units} "
+        f"WHERE id >= %s AND id < %s AND pick_code IS NULL"
+    ))
+
+
+def decode(apps, schema_editor):
+    Prediction = apps.get_model("main_app", "Prediction")
+    qn = schema_editor.connection.ops.quote_name
+    pick = "CASE pick_code " + " ".join(f"WHEN {code} THEN '{label}'" for label, code in CODES.items()) + " END"
+    values = ", ".join(f"{p} = {p}_units / {SCALE}.0" for p in PROBABILITIES)
+    _batches(schema_editor, Prediction, (
+        f"UPDATE {qn(Prediction._meta.db_table)} SET pick = {pick}, {values} WHERE id >= %s AND id < %s"
+    ))
+
+
+class Migration(migrations.Migration):
+    """Second step: fill the new columns in batches. Not atomic, so every batch commits and an interrupted run resumes."""
+
+    atomic = False
+
+    dependencies = [
+        ('main_app', '0016_prediction_compact_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(encode, decode),
+    ]
@@ -0,0 +1,137 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:20
+
+import django.db.models.deletion
+import main_app.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Last step: drop the text/float columns, take over their names, and swap (match, user) for the covering indexes."""
+
+    dependencies = [
+        ('main_app', '0017_fill_compact_predictions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='prediction',
+            name='main_app_pr_match_i_931156_idx',
+        ),
+        migrations.RemoveField(
+            model_name='prediction',
+            name='pick',
+        ),
+        migrations.RemoveField(
+            model_name='prediction',
+            name='p_home',
+        ),
+        migrations.RemoveField(
+            model_name='prediction',
+            name='p_draw',
+        ),
+        migrations.RemoveField(
+            model_name='prediction',
+            name='p_away',
+        ),
+        migrations.RenameField(
+            model_name='prediction',
+            old_name='pick_code',
+            new_name='pick',
+        ),
+        migrations.RenameField(
+            model_name='prediction',
+            old_name='p_home_units',
+            new_name='p_home',
+        ),
+        migrations.RenameField(
+            model_name='prediction',
+            old_name='p_draw_units',
+            new_name='p_draw',
+        ),
+        migrations.RenameField(
+            model_name='prediction',
+            old_name='p_away_units',
+            new_name='p_away',
+        ),
+        migrations.AlterField(
+            model_name='prediction',
+            name='pick',
+            field=main_app.models.PickField(choices=[('HOME', 'Home win'), ('DRAW', 'Draw'), ('AWAY', 'Away win')]),
+        ),
+        migrations.AlterField(
+            model_name='prediction',
+            name='p_home',
+            field=main_app.models.ProbabilityField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='prediction',
+            name='p_draw',
+            field=main_app.models.ProbabilityField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='prediction',
+            name='p_away',
+            field=main_app.models.ProbabilityField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['match', 'pick'], name='main_app_pr_match_i_953c15_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='main_app_pr_user_id_a9e4f4_idx'),
+        ),
+        # the foreign keys' own single-column indexes are prefixes of the composites; dropped by name
+        # rather than through AlterField, which would rebuild the table on SQLite
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='prediction',
+                    name='match',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='predictions', to='main_app.match'),
+                ),
+                migrations.AlterField(
+                    model_name='prediction',
+                    name='user',
+                    field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    'DROP INDEX "main_app_prediction_match_id_3555bf5e"',
+                    'CREATE INDEX "main_app_prediction_match_id_3555bf5e" ON "main_app_prediction" ("match_id")',
+                ),
+                migrations.RunSQL(
+                    'DROP INDEX "main_app_prediction_user_id_072c662d"',
+                    'CREATE INDEX "main_app_prediction_user_id_072c662d" ON "main_app_prediction" ("user_id")',
+                ),
+            ],
+        ),
+        # the archive columns already hold the same small integers; only the Python side changes
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='archivedprediction',
+                    name='pick',
+                    field=main_app.models.PickField(choices=[('HOME', 'Home win'), ('DRAW', 'Draw'), ('AWAY', 'Away win')]),
+                ),
+                migrations.AlterField(
+                    model_name='archivedprediction',
+                    name='p_home',
+                    field=main_app.models.ProbabilityField(blank=True, null=True),
+                ),
+                migrations.AlterField(
+                    model_name='archivedprediction',
+                    name='p_draw',
+                    field=main_app.models.ProbabilityField(blank=True, null=True),
+                ),
+                migrations.AlterField(
+                    model_name='archivedprediction',
+                    name='p_away',
+                    field=main_app.models.ProbabilityField(blank=True, null=True),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0018_compact_predictions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='team',
+            name='logo',
+            field=models.ImageField(blank=True, null=True, upload_to='uploads/teams/'),
+        ),
+    ]
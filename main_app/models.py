@@ -1,4 +1,8 @@
+from django import forms
+from django.core import exceptions
 from django.db import models
+from django.db.models.functions import Greatest, Least
+from django.utils import timezone
 from django.urls import reverse
 from django.contrib.auth.models import User
 # Create your models here.
@@ -6,7 +10,10 @@ class Team(models.Model):
     name = models.CharField(max_length=120, unique=True)
     short_code = models.CharField(max_length=10, blank=True)
     founded_year = models.PositiveIntegerField(null=True, blank=True)
-    logo = models.ImageField(upload_to="images/teams/", blank=True, null=True)
+    # raw uploads; logos.py replaces them with hashed files under images/teams/
+    logo = models.ImageField(upload_to="uploads/teams/", blank=True, null=True)
+    # storage names of the resized copies built by logos.py, keyed by THUMB_SIZES
+    logo_thumbs = models.JSONField(default=dict, blank=True, editable=False)
     created_by = models.ForeignKey(
         User, null=True, blank=True, on_delete=models.SET_NULL, related_name="teams_created"
     )
@@ -14,10 +21,163 @@ class Team(models.Model):
     def __str__(self):
         return self.name
 
+    def fixtures(self):
+        return Match.objects.filter(models.Q(home_team=self) | models.Q(away_team=self))
+
+    def fixture_count(self):
+        """Matches that reference (and so PROTECT) this team: two index-only counts."""
+        return self.home_matches.count() + self.away_matches.count()
+
+    def archived_fixture_count(self):
+        """Matches of archived seasons, which PROTECT the team as well: one count over both team indexes."""
+        return ArchivedMatch.objects.filter(models.Q(home_team=self) | models.Q(away_team=self)).count()
+
+    @classmethod
+    def logo_url_for(cls, logo, thumbs, size):
+        """URL of one logo size from the stored column values (values() rows have no FieldFile)."""
+        name = (thumbs or {}).get(size) or logo
+        return cls._meta.get_field("logo").storage.url(name) if name else ""
+
+    def _logo_url(self, size):
+        return self.logo_url_for(self.logo.name, self.logo_thumbs, size)
+
+    @property
+    def card_logo_url(self):
+        return self._logo_url("card")
+
+    @property
+    def detail_logo_url(self):
+        return self._logo_url("detail")
+
     def get_absolute_url(self):
         return reverse('team-detail', kwargs={'pk': self.id})
 
 
+def season_of(when):
+    """Start year of the July-June season `when` falls in (local time)."""
+    local = timezone.localtime(when) if timezone.is_aware(when) else when
+    return local.year if local.month >= 7 else local.year - 1
+
+
+class SeasonField(models.PositiveSmallIntegerField):
+    """The season of the row's kickoff_at; filled in by save() and bulk_create() alike."""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("editable", False)
+        super().__init__(*args, **kwargs)
+
+    def pre_save(self, model_instance, add):
+        kickoff = model_instance.kickoff_at
+        value = season_of(kickoff) if kickoff else None
+        setattr(model_instance, self.attname, value)
+        return value
+
+
+class PickField(models.Field):
+    """A HOME/DRAW/AWAY pick stored as a 0/1/2 smallint; Python code, forms and the API see the labels."""
+    CODES = {"HOME": 0, "DRAW": 1, "AWAY": 2}
+    LABELS = {code: label for label, code in CODES.items()}
+
+    def get_internal_type(self):
+        return "PositiveSmallIntegerField"
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else self.LABELS[value]
+
+    def to_python(self, value):
+        return self.LABELS.get(value, value) if isinstance(value, int) else value
+
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        if value is None or isinstance(value, int):
+            return value
+        try:
+            return self.CODES[value]
+        except KeyError:
+            raise ValueError(f"Field '{self.name}' expected one of {', '.join(self.CODES)} but got {value!r}.") from None
+
+
+class ProbabilityField(models.Field):
+    """A 0-1 probability stored as a smallint count of 1/SCALE units; Python code sees floats on that grid."""
+    SCALE = 10000
+
+    def get_internal_type(self):
+        return "PositiveSmallIntegerField"
+
+    @classmethod
+    def quantize(cls, value):
+        return None if value is None else round(float(value) * cls.SCALE) / cls.SCALE
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else value / self.SCALE
+
+    def to_python(self, value):
+        if value is None or value == "":
+            return None
+        try:
+            return self.quantize(value)
+        except (TypeError, ValueError):
+            raise exceptions.ValidationError(f"“{value}” is not a probability.", code="invalid")
+
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        return None if value is None else round(float(value) * self.SCALE)
+
+    def pre_save(self, model_instance, add):
+        # keep the instance on the stored grid, so scores and consensus computed from it match a reload
+        value = self.quantize(getattr(model_instance, self.attname))
+        setattr(model_instance, self.attname, value)
+        return value
+
+    def formfield(self, **kwargs):
+        return super().formfield(**{"form_class": forms.FloatField, **kwargs})
+
+
+class Season(models.Model):
+    """A July-June season, keyed by its start year. Closed seasons are moved to the archive tables by archive.py."""
+    year = models.PositiveSmallIntegerField(primary_key=True)
+    archived_at = models.DateTimeField(null=True, blank=True, editable=False)
+    archived_matches = models.PositiveIntegerField(default=0, editable=False)
+    archived_predictions = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        ordering = ["-year"]
+
+    def __str__(self):
+        return self.label
+
+    @property
+    def label(self):
+        return f"{self.year}-{str(self.year + 1)[-2:]}"
+
+    @property
+    def is_archived(self):
+        return self.archived_at is not None
+
+    @staticmethod
+    def current_year():
+        return season_of(timezone.now())
+
+    @classmethod
+    def ensure(cls, years):
+        cls.objects.bulk_create([cls(year=year) for year in set(years)], ignore_conflicts=True)
+
+    def get_absolute_url(self):
+        return reverse('season-detail', kwargs={'year': self.year})
+
+
+class MatchQuerySet(models.QuerySet):
+    def open_for(self, user, include=None):
+        """Matches `user` can still predict: scheduled, not kicked off, not already predicted."""
+        already = Prediction.objects.filter(user=user, match=models.OuterRef("pk"))
+        still_open = models.Q(status="SCHEDULED", kickoff_at__gt=timezone.now())
+        choices = still_open & ~models.Exists(already)
+        if include is not None:
+            # keep the match an existing prediction is already on (editing), while it is open
+            choices |= still_open & models.Q(pk=include)
+        return self.filter(choices).select_related("home_team", "away_team").order_by("kickoff_at", "id")
+
+
 class Match(models.Model):
     STATUS = [
         ("SCHEDULED", "Scheduled"),
@@ -26,8 +186,9 @@ class Match(models.Model):
         ("POSTPONED", "Postponed"),
         ("CANCELLED", "Cancelled"),
     ]
-    home_team = models.ForeignKey(Team, on_delete=models.PROTECT, related_name="home_matches")
-    away_team = models.ForeignKey(Team, on_delete=models.PROTECT, related_name="away_matches")
+    # indexed through the (team, kickoff_at) composites below
+    home_team = models.ForeignKey(Team, on_delete=models.PROTECT, related_name="home_matches", db_index=False)
+    away_team = models.ForeignKey(Team, on_delete=models.PROTECT, related_name="away_matches", db_index=False)
     kickoff_at = models.DateTimeField()
     venue = models.CharField(max_length=120, blank=True)
     status = models.CharField(max_length=12, choices=STATUS, default="SCHEDULED")
@@ -36,6 +197,18 @@ class Match(models.Model):
     created_by = models.ForeignKey(
         User, null=True, blank=True, on_delete=models.SET_NULL, related_name="matches_created"
     )
+    # unordered team pair, computed by the database so bulk writes keep it right too
+    pair_low = models.GeneratedField(
+        expression=Least("home_team", "away_team"), output_field=models.BigIntegerField(), db_persist=True
+    )
+    pair_high = models.GeneratedField(
+        expression=Greatest("home_team", "away_team"), output_field=models.BigIntegerField(), db_persist=True
+    )
+    # start year of the July-June season, kept in step with kickoff_at; leads the list indexes
+    season = SeasonField()
+    gameweek = models.PositiveSmallIntegerField(null=True, blank=True)
+
+    objects = MatchQuerySet.as_manager()
 
     class Meta:
         constraints = [
@@ -43,8 +216,18 @@ class Match(models.Model):
         ]
         unique_together = [("home_team", "away_team", "kickoff_at")]
         indexes = [
-            models.Index(fields=["kickoff_at"]),
-            models.Index(fields=["status"]),
+            # keyset pagination keys: (kickoff_at, id) within a season, optionally narrowed by status
+            models.Index(fields=["season", "kickoff_at", "id"]),
+            models.Index(fields=["season", "status", "kickoff_at", "id"]),
+            models.Index(fields=["season", "gameweek", "kickoff_at"]),
+            # the same walks across seasons (API, "all seasons") and open fixtures (open_for)
+            models.Index(fields=["kickoff_at", "id"]),
+            models.Index(fields=["status", "kickoff_at", "id"]),
+            # a team's fixtures by date (dependency counts, blocking-match pages, team filters)
+            models.Index(fields=["home_team", "kickoff_at"]),
+            models.Index(fields=["away_team", "kickoff_at"]),
+            # head-to-head history for either home/away order (league.head_to_head)
+            models.Index(fields=["pair_low", "pair_high", "-kickoff_at"]),
         ]
 
     def __str__(self):
@@ -53,6 +236,34 @@ class Match(models.Model):
     def get_absolute_url(self):
         return reverse('match-detail', kwargs={'pk': self.pk})
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "kickoff_at" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "season"}
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remember the result as loaded so saves can tell whether scoring needs to rerun
+        instance._loaded_result = instance.result_key
+        # ...and the fixture itself, so the league table can take back the old contribution
+        instance._loaded_fixture = instance.fixture_key
+        return instance
+
+    @property
+    def fixture_key(self):
+        d = self.__dict__
+        return (d.get("home_team_id"), d.get("away_team_id"), d.get("kickoff_at"))
+
+    @property
+    def result_key(self):
+        return (self.__dict__.get("status"), self.__dict__.get("home_score"), self.__dict__.get("away_score"))
+
+    @property
+    def result_changed(self):
+        return getattr(self, "_loaded_result", None) != self.result_key
+
     @property
     def outcome(self):
         if self.home_score is None or self.away_score is None:
@@ -67,25 +278,273 @@ class Match(models.Model):
 class Prediction(models.Model):
     PICK = [("HOME", "Home win"), ("DRAW", "Draw"), ("AWAY", "Away win")]
 
-    match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name="predictions")
-    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    # indexed through the composites below (and the (user, match) unique index)
+    match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name="predictions", db_index=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, db_index=False)
 
-    # user-friendly fields (no stake, no model_key)
-    pick = models.CharField(max_length=5, choices=PICK)
+    # user-friendly fields (no stake, no model_key); stored as small integers (PickField, ProbabilityField)
+    pick = PickField(choices=PICK)
 
-    # optional probabilities (0–1). If provided, should ~sum to 1.0
-    p_home = models.FloatField(null=True, blank=True)
-    p_draw = models.FloatField(null=True, blank=True)
-    p_away = models.FloatField(null=True, blank=True)
+    # optional probabilities (0–1, to 1/10000). If provided, should ~sum to 1.0
+    p_home = ProbabilityField(null=True, blank=True)
+    p_draw = ProbabilityField(null=True, blank=True)
+    p_away = ProbabilityField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # filled in by scoring.py once the match is FT (null = not scored)
+    points = models.PositiveSmallIntegerField(null=True, blank=True, editable=False)
+    brier = models.FloatField(null=True, blank=True, editable=False)
+    log_loss = models.FloatField(null=True, blank=True, editable=False)
+
     class Meta:
         unique_together = [("user", "match")]     # one pick per user per match
-        indexes = [models.Index(fields=["match", "user"])]
+        indexes = [
+            # a match's predictions; pick counts (consensus) are read from the index alone
+            models.Index(fields=["match", "pick"]),
+            # "my predictions", newest first
+            models.Index(fields=["user", "created_at", "id"]),
+            # latest predictions across users (API)
+            models.Index(fields=["created_at", "id"]),
+        ]
 
     def __str__(self):
         who = self.user.username if self.user else "Anonymous"
         return f"{who}: {self.pick} on {self.match}"
 
     def get_absolute_url(self):
-        return reverse('prediction-detail', kwargs={'pk': self.pk})
\ No newline at end of file
+        return reverse('prediction-detail', kwargs={'pk': self.pk})
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # what this row currently contributes to its match's consensus (see consensus.py)
+        instance._loaded_vote = instance.vote_key
+        return instance
+
+    @property
+    def vote_key(self):
+        d = self.__dict__
+        return (d.get("match_id"), d.get("pick"), d.get("p_home"), d.get("p_draw"), d.get("p_away"))
+
+class TeamStanding(models.Model):
+    """One team's league-table row for one season (July-June, by start year), kept by league.py."""
+    team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name="season_standings")
+    season = models.PositiveSmallIntegerField()
+    played = models.PositiveIntegerField(default=0)
+    won = models.PositiveIntegerField(default=0)
+    drawn = models.PositiveIntegerField(default=0)
+    lost = models.PositiveIntegerField(default=0)
+    goals_for = models.PositiveIntegerField(default=0)
+    goals_against = models.PositiveIntegerField(default=0)
+    goal_difference = models.IntegerField(default=0)
+    points = models.IntegerField(default=0)
+    # last five results, oldest first, e.g. "WDLWW"
+    form = models.CharField(max_length=5, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["season", "-points", "-goal_difference", "-goals_for", "team_id"]
+        constraints = [models.UniqueConstraint(fields=["team", "season"], name="unique_team_season")]
+        indexes = [models.Index(fields=["season", "-points", "-goal_difference", "-goals_for", "team"])]
+
+    def __str__(self):
+        return f"{self.team} {self.season}: {self.points} pts"
+
+
+class Standing(models.Model):
+    """Denormalized per-user leaderboard row, kept in sync by scoring.py."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="standing")
+    points = models.IntegerField(default=0)
+    scored = models.PositiveIntegerField(default=0)
+    correct = models.PositiveIntegerField(default=0)
+    # Brier / log-loss are summed over predictions that carried probabilities
+    probability_count = models.PositiveIntegerField(default=0)
+    brier_total = models.FloatField(default=0)
+    log_loss_total = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-points", "-correct", "user_id"]
+        indexes = [models.Index(fields=["-points", "-correct", "user"])]
+
+    def __str__(self):
+        return f"{self.user}: {self.points} pts"
+
+    @property
+    def brier_avg(self):
+        return self.brier_total / self.probability_count if self.probability_count else None
+
+    @property
+    def log_loss_avg(self):
+        return self.log_loss_total / self.probability_count if self.probability_count else None
+
+
+class MatchConsensus(models.Model):
+    """Running crowd totals for one match, kept in sync by consensus.py."""
+    match = models.OneToOneField(Match, on_delete=models.CASCADE, primary_key=True, related_name="consensus")
+    total = models.PositiveIntegerField(default=0)
+    home = models.PositiveIntegerField(default=0)
+    draw = models.PositiveIntegerField(default=0)
+    away = models.PositiveIntegerField(default=0)
+    # sums and counts of the optional probabilities, so averages can be maintained incrementally
+    p_home_sum = models.FloatField(default=0)
+    p_home_n = models.PositiveIntegerField(default=0)
+    p_draw_sum = models.FloatField(default=0)
+    p_draw_n = models.PositiveIntegerField(default=0)
+    p_away_sum = models.FloatField(default=0)
+    p_away_n = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Consensus for match {self.match_id}: {self.home}/{self.draw}/{self.away}"
+
+    def _share(self, count):
+        return count / self.total if self.total else None
+
+    @property
+    def home_share(self):
+        return self._share(self.home)
+
+    @property
+    def draw_share(self):
+        return self._share(self.draw)
+
+    @property
+    def away_share(self):
+        return self._share(self.away)
+
+    @property
+    def p_home(self):
+        return self.p_home_sum / self.p_home_n if self.p_home_n else None
+
+    @property
+    def p_draw(self):
+        return self.p_draw_sum / self.p_draw_n if self.p_draw_n else None
+
+    @property
+    def p_away(self):
+        return self.p_away_sum / self.p_away_n if self.p_away_n else None
+
+
+class Job(models.Model):
+    """A unit of background work, claimed and run by the run_jobs worker (see jobs.py)."""
+    STATUS = [
+        ("PENDING", "Pending"),
+        ("RUNNING", "Running"),
+        ("DONE", "Done"),
+        ("FAILED", "Failed"),
+    ]
+    kind = models.CharField(max_length=50)
+    # idempotency key: enqueueing the same key twice is a no-op
+    key = models.CharField(max_length=200, unique=True)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS, default="PENDING")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=64, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["run_after", "id"]
+        indexes = [models.Index(fields=["status", "run_after", "id"])]
+
+    def __str__(self):
+        return f"{self.kind} [{self.key}] {self.status}"
+
+
+class RatingModel(models.Model):
+    """Fitted parameters and training watermark of a rating engine (see ratings.py)."""
+    name = models.CharField(max_length=30, unique=True)
+    k_factor = models.FloatField(default=20)
+    # in rating points, and the Davidson draw weight; both refitted from history by fit()
+    home_advantage = models.FloatField(default=60)
+    draw_weight = models.FloatField(default=0.6)
+    matches = models.PositiveIntegerField(default=0)
+    # (kickoff_at, id) of the last result folded in; later results are applied incrementally
+    rated_through_kickoff = models.DateTimeField(null=True, blank=True)
+    rated_through_id = models.BigIntegerField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.matches} results)"
+
+
+class TeamRating(models.Model):
+    model = models.ForeignKey(RatingModel, on_delete=models.CASCADE, related_name="team_ratings")
+    team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name="ratings")
+    rating = models.FloatField()
+    played = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["model", "team"], name="unique_team_rating")]
+        ordering = ["-rating"]
+
+    def __str__(self):
+        return f"{self.team}: {self.rating:.0f}"
+
+
+class ArchivedMatch(models.Model):
+    """A match of an archived season, moved out of Match by archive.py with its final crowd split. Read-only."""
+    id = models.BigIntegerField(primary_key=True)
+    season = models.PositiveSmallIntegerField()
+    gameweek = models.PositiveSmallIntegerField(null=True, blank=True)
+    kickoff_at = models.DateTimeField()
+    home_team = models.ForeignKey(Team, on_delete=models.PROTECT, related_name="archived_home_matches", db_index=False)
+    away_team = models.ForeignKey(Team, on_delete=models.PROTECT, related_name="archived_away_matches", db_index=False)
+    pair_low = models.BigIntegerField()
+    pair_high = models.BigIntegerField()
+    venue = models.CharField(max_length=120, blank=True)
+    status = models.CharField(max_length=12, choices=Match.STATUS)
+    home_score = models.PositiveSmallIntegerField(null=True, blank=True)
+    away_score = models.PositiveSmallIntegerField(null=True, blank=True)
+    home_picks = models.PositiveIntegerField(default=0)
+    draw_picks = models.PositiveIntegerField(default=0)
+    away_picks = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["kickoff_at", "id"]
+        indexes = [
+            models.Index(fields=["season", "kickoff_at", "id"]),
+            models.Index(fields=["home_team", "kickoff_at"]),
+            models.Index(fields=["away_team", "kickoff_at"]),
+            models.Index(fields=["pair_low", "pair_high", "-kickoff_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.home_team} vs {self.away_team} @ {self.kickoff_at:%Y-%m-%d %H:%M}"
+
+    @property
+    def picks(self):
+        return self.home_picks + self.draw_picks + self.away_picks
+
+
+class ArchivedPrediction(models.Model):
+    """A prediction on an archived match, with its final score; stored as compactly as Prediction."""
+    id = models.BigIntegerField(primary_key=True)
+    match = models.ForeignKey(ArchivedMatch, on_delete=models.CASCADE, related_name="predictions", db_index=False)
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, null=True, blank=True, related_name="archived_predictions", db_index=False
+    )
+    pick = PickField(choices=Prediction.PICK)
+    p_home = ProbabilityField(null=True, blank=True)
+    p_draw = ProbabilityField(null=True, blank=True)
+    p_away = ProbabilityField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    points = models.PositiveSmallIntegerField(null=True, blank=True)
+    brier = models.FloatField(null=True, blank=True)
+    log_loss = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["match", "user"]),
+            models.Index(fields=["user", "match"]),
+        ]
+
+    def __str__(self):
+        who = self.user.username if self.user else "Anonymous"
+        return f"{who}: {self.get_pick_display()} on {self.match}"
@@ -0,0 +1,245 @@
+import base64
+from datetime import datetime, time
+
+from django.db.models import Q
+from django.http import Http404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import search
+from .forms import ListFilterForm
+from .models import Season
+
+
+def encode_cursor(value, pk):
+    raw = f"{value.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Turn a cursor token back into (datetime, id). Raises ValueError on garbage."""
+    padded = token + "=" * (-len(token) % 4)
+    try:
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        value, pk = raw.rsplit("|", 1)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("bad cursor")
+    when = parse_datetime(value)
+    if when is None:
+        raise ValueError("bad cursor")
+    return when, int(pk)
+
+
+def day_bounds(start=None, end=None):
+    """Aware datetimes for an inclusive [start, end] date window (either side optional)."""
+    tz = timezone.get_current_timezone()
+    lower = timezone.make_aware(datetime.combine(start, time.min), tz) if start else None
+    upper = timezone.make_aware(datetime.combine(end, time.max), tz) if end else None
+    return lower, upper
+
+
+class KeysetPage:
+    def __init__(self, object_list, has_next, has_previous, cursor_field):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = self.previous_cursor = None
+        if object_list:
+            first, last = object_list[0], object_list[-1]
+            if has_next:
+                self.next_cursor = encode_cursor(getattr(last, cursor_field), last.pk)
+            if has_previous:
+                self.previous_cursor = encode_cursor(getattr(first, cursor_field), first.pk)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def keyset_page(queryset, field, page_size, after=None, before=None, descending=True):
+    """
+    One KeysetPage of `queryset` ordered by (field, pk), newest-first unless descending=False,
+    starting after the `after` cursor or ending before the `before` one. A single range scan
+    of page_size + 1 rows; raises Http404 for a malformed cursor.
+    """
+    try:
+        cursor = decode_cursor(after or before) if (after or before) else None
+    except ValueError:
+        raise Http404("Invalid page cursor.")
+    forward = [f"-{field}", "-pk"] if descending else [field, "pk"]
+    backward = [field, "pk"] if descending else [f"-{field}", "-pk"]
+
+    def beyond(value, pk, ahead):
+        op = "lt" if descending == ahead else "gt"
+        return Q(**{f"{field}__{op}": value}) | Q(**{field: value, f"pk__{op}": pk})
+
+    if cursor and before and not after:
+        # walk backwards, then flip the slice back into page order
+        rows = list(queryset.filter(beyond(*cursor, ahead=False)).order_by(*backward)[:page_size + 1])
+        has_previous = len(rows) > page_size
+        return KeysetPage(rows[:page_size][::-1], True, has_previous, field)
+    queryset = queryset.order_by(*forward)
+    if cursor:
+        queryset = queryset.filter(beyond(*cursor, ahead=True))
+    rows = list(queryset[:page_size + 1])
+    return KeysetPage(rows[:page_size], len(rows) > page_size, cursor is not None, field)
+
+
+class KeysetPaginationMixin:
+    """
+    ListView mixin that pages newest-first on (cursor_field, id) using ?after=/?before=
+    cursors instead of OFFSET, so every page is one index range scan of page_size + 1 rows.
+    Also applies the ListFilterForm filters (season, text search, status, team, date window);
+    lists are scoped to the current season unless ?season= says otherwise.
+    """
+    cursor_field = None
+    season_field = "season"
+    status_field = "status"
+    team_fields = ("home_team", "away_team")
+    match_prefix = ""  # path from the listed model to its match, for the text search
+    paginate_by = 24
+
+    def get_filter_form(self):
+        if not hasattr(self, "_filter_form"):
+            self._filter_form = ListFilterForm(self.request.GET or None)
+        return self._filter_form
+
+    def get_season(self):
+        """Season start year to list, or None for every live season ("all")."""
+        form = self.get_filter_form()
+        value = form.cleaned_data.get("season") if form.is_bound and form.is_valid() else ""
+        if value == "all":
+            return None
+        return int(value) if value else Season.current_year()
+
+    def filter_season(self, queryset, season):
+        # leads the (season, [status,] kickoff_at, id) indexes
+        return queryset.filter(**{self.season_field: season})
+
+    def filter_queryset(self, queryset):
+        season = self.get_season()
+        if season is not None:
+            queryset = self.filter_season(queryset, season)
+        form = self.get_filter_form()
+        if not form.is_bound or not form.is_valid():
+            return queryset
+        data = form.cleaned_data
+        if data.get("q"):
+            queryset = search.filter_matches(queryset, data["q"], self.match_prefix)
+        if data.get("status"):
+            queryset = queryset.filter(**{self.status_field: data["status"]})
+        if data.get("team"):
+            team_q = Q()
+            for field in self.team_fields:
+                team_q |= Q(**{field: data["team"]})
+            queryset = queryset.filter(team_q)
+        lower, upper = day_bounds(data.get("date_from"), data.get("date_to"))
+        if lower:
+            queryset = queryset.filter(**{f"{self.cursor_field}__gte": lower})
+        if upper:
+            queryset = queryset.filter(**{f"{self.cursor_field}__lte": upper})
+        return queryset
+
+    def get_queryset(self):
+        return self.filter_queryset(super().get_queryset())
+
+    def paginate_queryset(self, queryset, page_size):
+        page = keyset_page(
+            queryset, self.cursor_field, page_size, self.request.GET.get("after"), self.request.GET.get("before")
+        )
+        return None, page, page.object_list, page.has_next or page.has_previous
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["filter_form"] = self.get_filter_form()
+        return context
+
+
+class RankPage:
+    """A leaderboard page; `start_index` is the 1-based rank of its first row."""
+    def __init__(self, object_list, has_next, has_previous, start_index, encode):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.start_index = start_index
+        self.next_cursor = self.previous_cursor = None
+        if object_list:
+            if has_next:
+                self.next_cursor = encode(object_list[-1], start_index + len(object_list) - 1)
+            if has_previous:
+                self.previous_cursor = encode(object_list[0], start_index)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class RankPaginationMixin:
+    """
+    ListView mixin for rankings ordered by descending rank_fields then ascending tiebreak
+    (e.g. -points, -correct, user_id). Pages with ?after=/?before= cursors over that index
+    instead of OFFSET + COUNT; each cursor also carries its row's rank so pages can number rows.
+    """
+    rank_fields = ()
+    tiebreak = "pk"
+    paginate_by = 50
+
+    def _values(self, obj):
+        return [getattr(obj, f) for f in self.rank_fields] + [getattr(obj, self.tiebreak)]
+
+    def encode_cursor(self, obj, rank):
+        raw = "|".join(str(v) for v in self._values(obj) + [rank])
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, token):
+        padded = token + "=" * (-len(token) % 4)
+        try:
+            values = [int(v) for v in base64.urlsafe_b64decode(padded.encode()).decode().split("|")]
+        except (ValueError, UnicodeDecodeError):
+            raise ValueError("bad cursor")
+        if len(values) != len(self.rank_fields) + 2 or values[-1] < 1:
+            raise ValueError("bad cursor")
+        return values[:-1], values[-1]
+
+    def _beyond(self, values, forward):
+        """Rows after `values` in ranking order (forward) or before it (not forward)."""
+        fields = list(self.rank_fields) + [self.tiebreak]
+        condition = Q()
+        for i, field in enumerate(fields):
+            descending = field != self.tiebreak
+            op = "lt" if descending == forward else "gt"
+            condition |= Q(**dict(zip(fields[:i], values[:i])), **{f"{field}__{op}": values[i]})
+        return condition
+
+    def paginate_queryset(self, queryset, page_size):
+        after = self.request.GET.get("after")
+        before = self.request.GET.get("before")
+        try:
+            cursor = self.decode_cursor(after or before) if (after or before) else None
+        except ValueError:
+            raise Http404("Invalid page cursor.")
+        ranking = [f"-{f}" for f in self.rank_fields] + [self.tiebreak]
+
+        if cursor and before and not after:
+            values, rank = cursor
+            reverse = [f[1:] if f.startswith("-") else f"-{f}" for f in ranking]
+            rows = list(queryset.filter(self._beyond(values, False)).order_by(*reverse)[:page_size + 1])
+            has_previous = len(rows) > page_size
+            rows = rows[:page_size][::-1]
+            page = RankPage(rows, True, has_previous, rank - len(rows), self.encode_cursor)
+        else:
+            queryset = queryset.order_by(*ranking)
+            start = 1
+            if cursor:
+                values, rank = cursor
+                queryset = queryset.filter(self._beyond(values, True))
+                start = rank + 1
+            rows = list(queryset[:page_size + 1])
+            has_next = len(rows) > page_size
+            page = RankPage(rows[:page_size], has_next, cursor is not None, start, self.encode_cursor)
+
+        return None, page, page.object_list, page.has_next or page.has_previous
@@ -0,0 +1,196 @@
+"""
+Per-request profiling: SQL query count and time, template render time, duplicated SQL.
+
+ProfilingMiddleware wraps every request in a QueryRecorder (a connection execute_wrapper),
+adds a Server-Timing header (visible in the browser's network panel), folds the numbers into
+per-view totals served by the profiling-stats endpoint, and logs requests that repeat the
+same SQL statement (the usual N+1 signature) or go over their QUERY_BUDGETS entry.
+
+query_budget() is the test-side half: wrap a client call in `with query_budget(n):` and it
+fails with the offending SQL listed once more than n queries run.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+TOP_DUPLICATES = 5
+
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryRecorder:
+    """execute_wrapper that records (sql, seconds) for every query on the wrapped connections."""
+
+    def __init__(self):
+        self.queries = []
+        self.template_seconds = 0.0
+        self._stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for alias in connections:
+            self._stack.enter_context(connections[alias].execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc):
+        self._stack.close()
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def db_seconds(self):
+        return sum(seconds for _, seconds in self.queries)
+
+    def duplicates(self, top=TOP_DUPLICATES):
+        """[(sql, times run)] for statements run more than once, most repeated first."""
+        counts = Counter(sql for sql, _ in self.queries)
+        return [(sql, n) for sql, n in counts.most_common(top) if n > 1]
+
+
+class query_budget:
+    """
+    Fail when the wrapped block runs more than `limit` queries. Usable as a context manager
+    or a decorator:
+
+        with query_budget(6):
+            self.client.get(reverse("match-detail", args=[match.pk]))
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.recorder = QueryRecorder()
+
+    def __enter__(self):
+        self.recorder.__enter__()
+        return self.recorder
+
+    def __exit__(self, exc_type, *exc):
+        self.recorder.__exit__(exc_type, *exc)
+        if exc_type is None and self.recorder.count > self.limit:
+            listing = "\n".join(f"  {i}. {sql}" for i, (sql, _) in enumerate(self.recorder.queries, 1))
+            raise QueryBudgetExceeded(f"{self.recorder.count} queries run, budget is {self.limit}:\n{listing}")
+
+    def __call__(self, func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with query_budget(self.limit):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+def _record(view, total, recorder):
+    with _stats_lock:
+        entry = _stats.setdefault(view, {
+            "requests": 0, "total_ms": 0.0, "db_ms": 0.0, "template_ms": 0.0,
+            "queries": 0, "max_queries": 0, "duplicated": Counter(),
+        })
+        entry["requests"] += 1
+        entry["total_ms"] += total * 1000
+        entry["db_ms"] += recorder.db_seconds * 1000
+        entry["template_ms"] += recorder.template_seconds * 1000
+        entry["queries"] += recorder.count
+        entry["max_queries"] = max(entry["max_queries"], recorder.count)
+        for sql, n in recorder.duplicates():
+            entry["duplicated"][sql] += n
+
+
+def stats():
+    """Per-view averages, slowest views first."""
+    with _stats_lock:
+        rows = []
+        for view, e in _stats.items():
+            n = e["requests"]
+            rows.append({
+                "view": view,
+                "requests": n,
+                "avg_ms": round(e["total_ms"] / n, 2),
+                "avg_db_ms": round(e["db_ms"] / n, 2),
+                "avg_template_ms": round(e["template_ms"] / n, 2),
+                "avg_queries": round(e["queries"] / n, 2),
+                "max_queries": e["max_queries"],
+                "budget": getattr(settings, "QUERY_BUDGETS", {}).get(view),
+                "top_duplicated": [{"sql": sql, "count": c} for sql, c in e["duplicated"].most_common(TOP_DUPLICATES)],
+            })
+    return sorted(rows, key=lambda r: r["avg_ms"], reverse=True)
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+class ProfilingMiddleware:
+    """Put first in MIDDLEWARE so session/auth queries are counted too."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, "PROFILE_REQUESTS", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        request._profile = recorder
+        started = time.perf_counter()
+        with recorder:
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+
+        match = getattr(request, "resolver_match", None)
+        view = (match.view_name or match._func_path) if match else "unresolved"
+        _record(view, total, recorder)
+        response["Server-Timing"] = ", ".join([
+            f'db;dur={recorder.db_seconds * 1000:.1f};desc="{recorder.count} queries"',
+            f"tpl;dur={recorder.template_seconds * 1000:.1f}",
+            f"total;dur={total * 1000:.1f}",
+        ])
+        self._check(request, view, recorder)
+        return response
+
+    def process_template_response(self, request, response):
+        # TemplateResponses render after the view returns; time just that step
+        recorder, render = request._profile, response.render
+
+        def timed_render():
+            started = time.perf_counter()
+            try:
+                return render()
+            finally:
+                recorder.template_seconds += time.perf_counter() - started
+        response.render = timed_render
+        return response
+
+    def _check(self, request, view, recorder):
+        threshold = getattr(settings, "PROFILE_DUPLICATE_THRESHOLD", 5)
+        for sql, n in recorder.duplicates(top=1):
+            if n >= threshold:
+                logger.warning("%s ran the same query %d times (possible N+1): %s", request.path, n, sql)
+        # budgets describe page views; writes legitimately run a varying number of queries
+        budget = getattr(settings, "QUERY_BUDGETS", {}).get(view) if request.method in ("GET", "HEAD") else None
+        if budget is not None and recorder.count > budget:
+            message = f"{view} ran {recorder.count} queries, budget is {budget} ({request.path})"
+            if getattr(settings, "QUERY_BUDGETS_STRICT", False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
@@ -0,0 +1,252 @@
+"""
+Baseline outcome model: Elo ratings with a Davidson draw term.
+
+With g = 10^((R_home + H - R_away) / 800), P(home) : P(draw) : P(away) = g : nu : 1/g.
+A result moves the two ratings by +/- K * (S - E), where S is 1 / 0.5 / 0 and
+E = P(home) + P(draw) / 2.
+
+fit() replays every finished match (archived seasons first) with NumPy. Kickoff-ordered
+results are cut into runs in which no team appears twice, and each run is applied as one
+array update, which gives the same ratings as going match by match. H and nu are solved in closed form from the
+home/draw/away rates. update() folds in only the results after the stored (kickoff_at, id)
+watermark the same way. A result that lands behind the watermark (late, or a correction)
+triggers a refit instead, since Elo depends on the order of results.
+
+predict_upcoming() writes the probabilities for every open fixture as predictions of the
+BASELINE_USERNAME account, in bulk; consensus is updated with consensus.apply_changes(). The
+account is reserved (signup refuses the name, and it is inactive with no password), and
+system_user() refuses to take over a real account that already has the name. Its picks count
+like anyone's: one vote in each match's consensus and a row on the leaderboard, so players can
+see whether they beat the model.
+"""
+import math
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ArchivedMatch, Match, Prediction, ProbabilityField, RatingModel, Team, TeamRating
+from . import caching, consensus
+
+MODEL_NAME = "elo"
+INITIAL_RATING = 1500.0
+OUTCOMES = np.array(["HOME", "DRAW", "AWAY"])
+BATCH_SIZE = 1000
+PICK_FIELDS = ("pick", "p_home", "p_draw", "p_away")
+
+
+def get_model():
+    return RatingModel.objects.get_or_create(name=MODEL_NAME)[0]
+
+
+def system_user():
+    username = settings.BASELINE_USERNAME
+    user, created = User.objects.get_or_create(username=username, defaults={"is_active": False})
+    if created:
+        user.set_unusable_password()
+        user.save(update_fields=["password"])
+    elif user.is_active or user.has_usable_password():
+        # a person registered the name before it was reserved; never write predictions as them
+        raise ImproperlyConfigured(f"User {username!r} is a real account; set BASELINE_USERNAME to an unused name.")
+    return user
+
+
+def probabilities(diff, draw_weight):
+    """(p_home, p_draw, p_away) arrays for rating differences that already include H."""
+    g = np.power(10.0, np.asarray(diff, dtype=float) / 800)
+    total = g + 1 / g + draw_weight
+    return g / total, draw_weight / total, (1 / g) / total
+
+
+def fit_parameters(scores):
+    """Home advantage and draw weight matching the observed home/draw/away rates (add-one smoothed)."""
+    home, draw, away = (np.count_nonzero(scores == s) + 1 for s in (1.0, 0.5, 0.0))
+    g = math.sqrt(home / away)
+    return 800 * math.log10(g), g * draw / home
+
+
+def _runs(home, away):
+    """Boundaries of consecutive runs in which no team plays twice."""
+    bounds, seen = [0], set()
+    for i, (h, a) in enumerate(zip(home.tolist(), away.tolist())):
+        if h in seen or a in seen:
+            bounds.append(i)
+            seen = set()
+        seen.update((h, a))
+    return bounds + [len(home)]
+
+
+def replay(ratings, played, home, away, scores, k_factor, home_advantage, draw_weight):
+    """Apply results (team index arrays, scores) in order to `ratings` / `played` in place."""
+    bounds = _runs(home, away)
+    for start, end in zip(bounds, bounds[1:]):
+        h, a = home[start:end], away[start:end]
+        p_home, p_draw, _ = probabilities(ratings[h] + home_advantage - ratings[a], draw_weight)
+        delta = k_factor * (scores[start:end] - (p_home + 0.5 * p_draw))
+        # no team repeats inside a run, so plain fancy-index updates cannot collide
+        ratings[h] += delta
+        ratings[a] -= delta
+    np.add.at(played, home, 1)
+    np.add.at(played, away, 1)
+
+
+def _results(model, after=None):
+    qs = model.objects.filter(status="FT", home_score__isnull=False, away_score__isnull=False)
+    if after:
+        kickoff, pk = after
+        qs = qs.filter(Q(kickoff_at__gt=kickoff) | Q(kickoff_at=kickoff, pk__gt=pk))
+    return list(
+        qs.order_by("kickoff_at", "id")
+        .values_list("home_team_id", "away_team_id", "home_score", "away_score", "kickoff_at", "id")
+    )
+
+
+def load_results(index, after=None):
+    """
+    Finished matches after the (kickoff_at, id) `after` as arrays, plus the last row's
+    (kickoff_at, id). A full load starts with the archived seasons, which all come first.
+    """
+    rows = _results(Match, after) if after else _results(ArchivedMatch) + _results(Match)
+    if not rows:
+        return np.zeros(0, int), np.zeros(0, int), np.zeros(0), None
+    home_ids, away_ids, home_goals, away_goals, _, _ = zip(*rows)
+    home = np.array([index[t] for t in home_ids])
+    away = np.array([index[t] for t in away_ids])
+    goal_diff = np.array(home_goals) - np.array(away_goals)
+    scores = np.where(goal_diff > 0, 1.0, np.where(goal_diff == 0, 0.5, 0.0))
+    return home, away, scores, rows[-1][4:]
+
+
+def _save(model, team_ids, ratings, played, teams_touched, matches, last):
+    if last is not None:
+        model.rated_through_kickoff, model.rated_through_id = last
+    model.matches = matches
+    model.save()
+    TeamRating.objects.bulk_create(
+        [
+            TeamRating(model=model, team_id=team_ids[i], rating=float(ratings[i]), played=int(played[i]))
+            for i in teams_touched
+        ],
+        batch_size=BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=["model", "team"],
+        update_fields=["rating", "played", "updated_at"],
+    )
+
+
+def fit(write=True):
+    """Refit H and nu and replay all history from INITIAL_RATING. Returns (model, {team_id: rating})."""
+    with transaction.atomic():
+        model = RatingModel.objects.select_for_update().get(pk=get_model().pk)
+        team_ids = list(Team.objects.order_by("pk").values_list("pk", flat=True))
+        index = {t: i for i, t in enumerate(team_ids)}
+        home, away, scores, last = load_results(index)
+        if len(scores):
+            model.home_advantage, model.draw_weight = fit_parameters(scores)
+        ratings = np.full(len(team_ids), INITIAL_RATING)
+        played = np.zeros(len(team_ids), dtype=int)
+        replay(ratings, played, home, away, scores, model.k_factor, model.home_advantage, model.draw_weight)
+        if write:
+            model.rated_through_kickoff = model.rated_through_id = None
+            _save(model, team_ids, ratings, played, range(len(team_ids)), len(scores), last)
+    return model, dict(zip(team_ids, ratings.tolist()))
+
+
+def _behind(match_ids, model):
+    """True if any of the matches is at or behind the watermark, or has been deleted."""
+    watermark = (model.rated_through_kickoff, model.rated_through_id)
+    rows = list(Match.objects.filter(pk__in=match_ids).values_list("kickoff_at", "pk"))
+    return len(rows) < len(set(match_ids)) or any(row <= watermark for row in rows)
+
+
+def update(match_ids=()):
+    """
+    Fold results after the watermark into the stored ratings. Refits when nothing has been
+    fitted yet or when one of `match_ids` is at or behind the watermark (or gone). Returns
+    the number of results applied.
+    """
+    model = get_model()
+    if model.rated_through_id is None or (match_ids and _behind(match_ids, model)):
+        return fit()[0].matches
+    with transaction.atomic():
+        model = RatingModel.objects.select_for_update().get(pk=model.pk)
+        team_ids = list(Team.objects.order_by("pk").values_list("pk", flat=True))
+        index = {t: i for i, t in enumerate(team_ids)}
+        home, away, scores, last = load_results(index, after=(model.rated_through_kickoff, model.rated_through_id))
+        if not len(scores):
+            return 0
+        stored = {r[0]: r[1:] for r in TeamRating.objects.filter(model=model).values_list("team_id", "rating", "played")}
+        ratings = np.array([stored.get(t, (INITIAL_RATING, 0))[0] for t in team_ids], dtype=float)
+        played = np.array([stored.get(t, (INITIAL_RATING, 0))[1] for t in team_ids], dtype=int)
+        replay(ratings, played, home, away, scores, model.k_factor, model.home_advantage, model.draw_weight)
+        touched = np.unique(np.concatenate([home, away])).tolist()
+        _save(model, team_ids, ratings, played, touched, model.matches + len(scores), last)
+    return len(scores)
+
+
+def write_picks(rows):
+    """Store (pick, p_home, p_draw, p_away, id) tuples on Prediction with a single executemany."""
+    qn = connection.ops.quote_name
+    assignments = ", ".join(f"{qn(f)} = %s" for f in PICK_FIELDS)
+    sql = f"UPDATE {qn(Prediction._meta.db_table)} SET {assignments} WHERE {qn('id')} = %s"
+    fields = [Prediction._meta.get_field(f) for f in PICK_FIELDS]
+    params = [[f.get_prep_value(v) for f, v in zip(fields, row)] + [row[-1]] for row in rows]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def predict_upcoming(now=None):
+    """Write the baseline's prediction for every open fixture; returns how many rows were written."""
+    model = get_model()
+    now = now or timezone.now()
+    fixtures = list(
+        Match.objects.filter(status="SCHEDULED", kickoff_at__gt=now)
+        .order_by("kickoff_at", "id")
+        .values_list("id", "home_team_id", "away_team_id")
+    )
+    if not fixtures:
+        return 0
+    match_ids, home_ids, away_ids = zip(*fixtures)
+    stored = dict(TeamRating.objects.filter(model=model).values_list("team_id", "rating"))
+    home = np.array([stored.get(t, INITIAL_RATING) for t in home_ids])
+    away = np.array([stored.get(t, INITIAL_RATING) for t in away_ids])
+    probs = np.column_stack(probabilities(home + model.home_advantage - away, model.draw_weight))
+    # on the stored grid, so an unchanged prediction compares equal to its reloaded row
+    probs = np.round(probs * ProbabilityField.SCALE) / ProbabilityField.SCALE
+    picks = OUTCOMES[probs.argmax(axis=1)]
+
+    user = system_user()
+    existing = {
+        p.match_id: p
+        for p in Prediction.objects.filter(user=user, match__status="SCHEDULED", match__kickoff_at__gt=now)
+    }
+    to_create, to_update, votes = [], [], []
+    for match_id, pick, (p_home, p_draw, p_away) in zip(match_ids, picks.tolist(), probs.tolist()):
+        prediction = existing.get(match_id)
+        if prediction is None:
+            prediction = Prediction(match_id=match_id, user=user, pick=pick, p_home=p_home, p_draw=p_draw, p_away=p_away)
+            to_create.append(prediction)
+            votes.append((None, prediction.vote_key))
+        elif (prediction.pick, prediction.p_home, prediction.p_draw, prediction.p_away) != (pick, p_home, p_draw, p_away):
+            old_vote = prediction.vote_key
+            prediction.pick, prediction.p_home, prediction.p_draw, prediction.p_away = pick, p_home, p_draw, p_away
+            to_update.append((pick, p_home, p_draw, p_away, prediction.pk))
+            votes.append((old_vote, prediction.vote_key))
+    if votes:
+        # bulk writes skip the prediction signals: move the consensus counters here
+        with transaction.atomic():
+            Prediction.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+            write_picks(to_update)
+            consensus.apply_changes(votes)
+        caching.bump("prediction")
+    return len(votes)
+
+
+def results_changed(match_ids):
+    """New or corrected results: bring the ratings up to date, then refresh the baseline's picks."""
+    update(match_ids)
+    return predict_upcoming()
@@ -0,0 +1,210 @@
+"""
+Prediction scoring and the materialized leaderboard (Standing).
+
+Each Prediction stores its own points / Brier / log-loss once its match is FT, and every
+Standing row is the running sum of those values for one user. Whenever a score changes we
+apply only the difference between the old and new values, so a correction to one match
+touches that match's predictions and their users' Standing rows and nothing else.
+rebuild_standings() recomputes everything from scratch to check (or repair) the incremental path;
+predictions of archived seasons count with the scores they were archived with.
+"""
+import math
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import ArchivedPrediction, Match, Prediction, Standing
+
+POINTS_CORRECT = 3
+EPS = 1e-15
+OUTCOMES = ("HOME", "DRAW", "AWAY")
+BATCH_SIZE = 1000
+
+SCORE_FIELDS = ["points", "brier", "log_loss"]
+STANDING_FIELDS = ["points", "scored", "correct", "probability_count", "brier_total", "log_loss_total"]
+_SCORING_ONLY = ["id", "match_id", "user_id", "pick", "p_home", "p_draw", "p_away"] + SCORE_FIELDS
+
+
+def outcome_for(status, home_score, away_score):
+    if status != "FT" or home_score is None or away_score is None:
+        return None
+    if home_score > away_score:
+        return "HOME"
+    if home_score < away_score:
+        return "AWAY"
+    return "DRAW"
+
+
+def score(pick, p_home, p_draw, p_away, outcome):
+    """Return (points, brier, log_loss) for one prediction; all None while the match is unsettled."""
+    if outcome is None:
+        return None, None, None
+    points = POINTS_CORRECT if pick == outcome else 0
+    if p_home is None and p_draw is None and p_away is None:
+        return points, None, None
+    probs = (p_home or 0.0, p_draw or 0.0, p_away or 0.0)
+    actual = OUTCOMES.index(outcome)
+    brier = sum((p - (i == actual)) ** 2 for i, p in enumerate(probs))
+    log_loss = -math.log(min(max(probs[actual], EPS), 1.0))
+    return points, brier, log_loss
+
+
+def contribution(points, brier, log_loss):
+    """What one scored prediction adds to its user's Standing, in STANDING_FIELDS order."""
+    if points is None:
+        return (0, 0, 0, 0, 0.0, 0.0)
+    has_probs = brier is not None
+    return (points, 1, int(points > 0), int(has_probs), brier or 0.0, log_loss or 0.0)
+
+
+def _add(totals, user_id, values, sign=1):
+    if user_id is None:
+        return
+    row = totals[user_id]
+    for i, v in enumerate(values):
+        row[i] += sign * v
+
+
+def _new_totals():
+    return defaultdict(lambda: [0, 0, 0, 0, 0.0, 0.0])
+
+
+def rescore(predictions, outcome):
+    """
+    Rescore Prediction instances in memory against `outcome`.
+    Returns (changed predictions, per-user Standing deltas).
+    """
+    changed, deltas = [], _new_totals()
+    for p in predictions:
+        old = (p.points, p.brier, p.log_loss)
+        new = score(p.pick, p.p_home, p.p_draw, p.p_away, outcome)
+        if new == old:
+            continue
+        _add(deltas, p.user_id, contribution(*old), -1)
+        _add(deltas, p.user_id, contribution(*new))
+        p.points, p.brier, p.log_loss = new
+        changed.append(p)
+    return changed, deltas
+
+
+def apply_deltas(deltas, create=True):
+    """Add per-user deltas onto Standing, creating missing rows. Call inside a transaction."""
+    deltas = {user_id: d for user_id, d in deltas.items() if any(d)}
+    if not deltas:
+        return
+    if create:
+        Standing.objects.bulk_create(
+            [Standing(user_id=u) for u in deltas], ignore_conflicts=True, batch_size=BATCH_SIZE
+        )
+    # relative "col = col + delta" updates: no read-modify-write race, one statement per user
+    qn = connection.ops.quote_name
+    assignments = ", ".join(f"{qn(f)} = {qn(f)} + %s" for f in STANDING_FIELDS)
+    sql = f"UPDATE {qn(Standing._meta.db_table)} SET {assignments}, {qn('updated_at')} = %s WHERE {qn('user_id')} = %s"
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [(*d, now, user_id) for user_id, d in deltas.items()])
+
+
+def write_scores(rows):
+    """Store (points, brier, log_loss, id) tuples on Prediction with a single executemany."""
+    qn = connection.ops.quote_name
+    assignments = ", ".join(f"{qn(f)} = %s" for f in SCORE_FIELDS)
+    sql = f"UPDATE {qn(Prediction._meta.db_table)} SET {assignments} WHERE {qn('id')} = %s"
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def settle_match(match):
+    """(Re)score every prediction on `match` and push the differences into Standing."""
+    outcome = outcome_for(match.status, match.home_score, match.away_score)
+    predictions = Prediction.objects.filter(match_id=match.pk).only(*_SCORING_ONLY)
+    if outcome is None:
+        # nothing to score; only clear predictions that were scored before (e.g. FT reverted)
+        predictions = predictions.filter(points__isnull=False)
+    with transaction.atomic():
+        changed, deltas = rescore(predictions.iterator(chunk_size=BATCH_SIZE), outcome)
+        write_scores([(p.points, p.brier, p.log_loss, p.pk) for p in changed])
+        apply_deltas(deltas)
+    return len(changed)
+
+
+def settle_prediction(prediction):
+    """Rescore a single prediction after it was created or edited."""
+    match = prediction.match
+    outcome = outcome_for(match.status, match.home_score, match.away_score)
+    with transaction.atomic():
+        changed, deltas = rescore([prediction], outcome)
+        if changed:
+            Prediction.objects.filter(pk=prediction.pk).update(
+                points=prediction.points, brier=prediction.brier, log_loss=prediction.log_loss
+            )
+            apply_deltas(deltas)
+
+
+def unsettle_prediction(prediction):
+    """Take a deleted prediction's score back out of its user's Standing."""
+    if prediction.points is None or prediction.user_id is None:
+        return
+    deltas = _new_totals()
+    _add(deltas, prediction.user_id, contribution(prediction.points, prediction.brier, prediction.log_loss), -1)
+    with transaction.atomic():
+        # no row creation: the user may be getting deleted in the same cascade
+        apply_deltas(deltas, create=False)
+
+
+def compute_standings(write=False, batch_size=BATCH_SIZE):
+    """
+    Score every prediction from scratch and return {user_id: totals}.
+    With write=True, also store the fresh per-prediction scores and replace the Standing table.
+    """
+    results = {
+        pk: outcome_for(status, home, away)
+        for pk, status, home, away in Match.objects.values_list("pk", "status", "home_score", "away_score")
+    }
+    totals = _new_totals()
+    with transaction.atomic():
+        pending = []
+        for p in Prediction.objects.only(*_SCORING_ONLY).iterator(chunk_size=batch_size):
+            new = score(p.pick, p.p_home, p.p_draw, p.p_away, results.get(p.match_id))
+            _add(totals, p.user_id, contribution(*new))
+            if write and new != (p.points, p.brier, p.log_loss):
+                pending.append((*new, p.pk))
+                if len(pending) >= batch_size:
+                    write_scores(pending)
+                    pending = []
+        # archived seasons (archive.py) keep their final scores: fold them in as stored
+        archived = (
+            ArchivedPrediction.objects.filter(points__isnull=False).values("user_id")
+            .annotate(
+                points_sum=Sum("points"), scored=Count("id"), correct=Count("id", filter=Q(points__gt=0)),
+                probability_count=Count("brier"), brier_total=Sum("brier", default=0.0),
+                log_loss_total=Sum("log_loss", default=0.0),
+            )
+            .values_list("user_id", "points_sum", "scored", "correct", "probability_count", "brier_total", "log_loss_total")
+        )
+        for user_id, *values in archived:
+            _add(totals, user_id, values)
+        if write:
+            write_scores(pending)
+            Standing.objects.all().delete()
+            Standing.objects.bulk_create(
+                [Standing(user_id=u, **dict(zip(STANDING_FIELDS, t))) for u, t in totals.items() if t[1]],
+                batch_size=batch_size,
+            )
+    return {u: t for u, t in totals.items() if t[1]}
+
+
+def diff_standings(expected):
+    """Compare fresh totals from compute_standings() with the stored Standing rows."""
+    stored = {
+        row[0]: list(row[1:])
+        for row in Standing.objects.filter(scored__gt=0).values_list("user_id", *STANDING_FIELDS)
+    }
+    mismatches = []
+    for user_id in sorted(set(stored) | set(expected)):
+        have, want = stored.get(user_id), expected.get(user_id)
+        if have is None or want is None or not all(math.isclose(a, b, abs_tol=1e-9) for a, b in zip(have, want)):
+            mismatches.append((user_id, have, want))
+    return mismatches
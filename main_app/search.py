@@ -0,0 +1,164 @@
+"""
+Full-text search over teams and matches.
+
+Two index tables hold one text document per row: a team's name and short code, and a
+match's label (both teams' names and codes) plus venue. On SQLite they are FTS5 tables
+(rowid = object id, with prefix indexes). On PostgreSQL they are plain tables with a
+generated tsvector column under a GIN index. Migration 0013 creates whichever applies.
+Any other database falls back to icontains.
+
+Documents are built in SQL from the live rows, so one statement re-indexes one match, all
+of a team's matches, or everything (rebuild()). The save/delete signals keep the index
+current; bulk writers call rebuild().
+
+filter_matches()/filter_teams() add the text query to an ORM queryset as `pk IN (index
+lookup)`. The list views combine it with their status/team/date filters and keyset
+pagination in a single statement.
+
+Target: p95 under 20 ms per prefix lookup at 100k matches (benchmark match_search, "search"
+scale). On SQLite, single letters, team names, suffixes shared by a fifth of the teams and
+queries with no hits all stay under 16 ms. The exception is a term found in (nearly) every
+document, such as a word every venue shares: about 30 ms, because SQLite collects the whole
+hit list before walking the list's index.
+"""
+import re
+
+from django.db import connection, transaction
+from django.db.models import BigIntegerField, F, Func, Q
+from django.db.models.expressions import RawSQL
+from django.db.models.lookups import In
+
+MATCH_INDEX = "main_app_match_search"
+TEAM_INDEX = "main_app_team_search"
+MAX_TERMS = 8
+
+# per vendor: index key column, the lookup (`{table}` is filled in), the query syntax and
+# how the filtered column is written on the outer side of `IN (lookup)`
+BACKENDS = {
+    "sqlite": {
+        "key": "rowid",
+        "lookup": "SELECT rowid FROM {table} WHERE {table} MATCH %s",
+        "query": lambda terms: " ".join(f'"{t}"*' for t in terms),
+        # unary plus: SQLite then probes the hits while walking the list's own
+        # (kickoff_at, id) index for ORDER BY ... LIMIT, instead of fetching and sorting
+        # every hit (a common prefix can match most of the table)
+        "outer": "+%(expressions)s",
+    },
+    "postgresql": {
+        "key": "id",
+        "lookup": "SELECT id FROM {table} WHERE document @@ to_tsquery('simple', %s)",
+        "query": lambda terms: " & ".join(f"{t}:*" for t in terms),
+        "outer": "%(expressions)s",
+    },
+}
+
+# (ids, documents) of the rows to index; callers append a WHERE clause
+MATCH_SOURCE = (
+    "SELECT m.id FROM main_app_match m",
+    "SELECT m.id, h.name || ' ' || h.short_code || ' ' || a.name || ' ' || a.short_code || ' ' || m.venue "
+    "FROM main_app_match m "
+    "JOIN main_app_team h ON h.id = m.home_team_id "
+    "JOIN main_app_team a ON a.id = m.away_team_id",
+)
+TEAM_SOURCE = (
+    "SELECT t.id FROM main_app_team t",
+    "SELECT t.id, t.name || ' ' || t.short_code FROM main_app_team t",
+)
+
+
+def backend():
+    return BACKENDS.get(connection.vendor)
+
+
+def terms(text):
+    """Lower-cased word tokens; each one is matched as a prefix and all must match."""
+    return re.findall(r"[^\W_]+", (text or "").lower())[:MAX_TERMS]
+
+
+def _lookup(table, words):
+    b = backend()
+    return RawSQL(b["lookup"].format(table=connection.ops.quote_name(table)), [b["query"](words)])
+
+
+def filter_matches(queryset, text, prefix=""):
+    """Narrow `queryset` to matches whose label/venue match `text`; `prefix` reaches the match (e.g. "match__")."""
+    words = terms(text)
+    if not words:
+        return queryset
+    b = backend()
+    if b:
+        key = Func(F(f"{prefix}pk"), template=b["outer"], output_field=BigIntegerField())
+        return queryset.filter(In(key, _lookup(MATCH_INDEX, words)))
+    for word in words:
+        queryset = queryset.filter(
+            Q(**{f"{prefix}home_team__name__icontains": word}) | Q(**{f"{prefix}home_team__short_code__icontains": word})
+            | Q(**{f"{prefix}away_team__name__icontains": word}) | Q(**{f"{prefix}away_team__short_code__icontains": word})
+            | Q(**{f"{prefix}venue__icontains": word})
+        )
+    return queryset
+
+
+def filter_teams(queryset, text):
+    words = terms(text)
+    if not words:
+        return queryset
+    if backend():
+        return queryset.filter(pk__in=_lookup(TEAM_INDEX, words))
+    for word in words:
+        queryset = queryset.filter(Q(name__icontains=word) | Q(short_code__icontains=word))
+    return queryset
+
+
+def _reindex(table, source, where="", params=()):
+    b = backend()
+    if not b:
+        return
+    ids, documents = source
+    target, key = connection.ops.quote_name(table), b["key"]
+    with transaction.atomic(), connection.cursor() as cursor:
+        if where:
+            cursor.execute(f"DELETE FROM {target} WHERE {key} IN ({ids} {where})", params)
+        else:
+            cursor.execute(f"DELETE FROM {target}")
+        cursor.execute(f"INSERT INTO {target} ({key}, body) {documents} {where}", params)
+
+
+def _remove(table, pk):
+    b = backend()
+    if b:
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {connection.ops.quote_name(table)} WHERE {b['key']} = %s", [pk])
+
+
+def index_match(pk):
+    _reindex(MATCH_INDEX, MATCH_SOURCE, "WHERE m.id = %s", [pk])
+
+
+def index_team(pk):
+    """The team's own document and those of all its matches (names appear in both)."""
+    _reindex(TEAM_INDEX, TEAM_SOURCE, "WHERE t.id = %s", [pk])
+    _reindex(MATCH_INDEX, MATCH_SOURCE, "WHERE m.home_team_id = %s OR m.away_team_id = %s", [pk, pk])
+
+
+def remove_match(pk):
+    _remove(MATCH_INDEX, pk)
+
+
+def remove_team(pk):
+    _remove(TEAM_INDEX, pk)
+
+
+def remove_matches(pks):
+    b = backend()
+    if b and pks:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {connection.ops.quote_name(MATCH_INDEX)} WHERE {b['key']} IN ({', '.join(['%s'] * len(pks))})",
+                list(pks),
+            )
+
+
+def rebuild():
+    """Re-index every team and match from scratch."""
+    _reindex(TEAM_INDEX, TEAM_SOURCE)
+    _reindex(MATCH_INDEX, MATCH_SOURCE)
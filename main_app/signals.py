@@ -0,0 +1,109 @@
+import logging
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Match, Prediction, Season, Team
+from . import caching, consensus, database, jobs, league, live, ratings, scoring, search
+
+logger = logging.getLogger(__name__)
+
+
+def _background():
+    return getattr(settings, "SETTLE_IN_BACKGROUND", False)
+
+
+def _rate(match):
+    """Fold a result change into the ratings and baseline picks, in the worker or right here."""
+    if _background():
+        jobs.enqueue_rating(match)
+        return
+    try:
+        ratings.results_changed([match.pk])
+    except ImproperlyConfigured:
+        # the ratings are updated by then; only the baseline's picks are skipped, and the
+        # result being saved must not fail over the baseline account's configuration
+        logger.exception("Baseline predictions not refreshed after match %s changed", match.pk)
+
+
+@receiver(post_save, sender=Match)
+def match_saved(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    search.index_match(instance.pk)
+    if created or getattr(instance, "_loaded_fixture", (None, None, None))[2] != instance.kickoff_at:
+        Season.ensure([instance.season])
+    league.match_changed(instance)
+    if not instance.result_changed:
+        return
+    live.match_changed(instance)
+    if not created or instance.status == "FT":
+        if _background():
+            jobs.enqueue_settlement(instance)  # scored by the run_jobs worker
+        else:
+            scoring.settle_match(instance)
+    loaded_status = (getattr(instance, "_loaded_result", None) or (None,))[0]
+    if "FT" in (instance.status, loaded_status):
+        # a result arrived, changed or was withdrawn: the ratings and baseline picks follow
+        _rate(instance)
+    instance._loaded_result = instance.result_key
+
+
+@receiver(post_delete, sender=Match)
+def match_deleted(sender, instance, **kwargs):
+    search.remove_match(instance.pk)
+    league.match_changed(instance, deleted=True)
+    if (getattr(instance, "_loaded_result", None) or (None,))[0] == "FT":
+        _rate(instance)
+
+
+@receiver(post_save, sender=Prediction)
+def prediction_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        scoring.settle_prediction(instance)
+        consensus.prediction_saved(instance)
+
+
+@receiver(post_delete, sender=Prediction)
+def prediction_deleted(sender, instance, **kwargs):
+    scoring.unsettle_prediction(instance)
+    consensus.prediction_deleted(instance)
+
+
+@receiver(post_save, sender=Team)
+def team_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # names and codes are in the team's and its matches' search documents
+    search.index_team(instance.pk)
+    # a new upload has no thumbnails yet; build them off the request thread
+    if instance.logo and not instance.logo_thumbs:
+        jobs.enqueue_logo(instance)
+
+
+@receiver(post_delete, sender=Team)
+def team_deleted(sender, instance, **kwargs):
+    search.remove_team(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Team)
+@receiver([post_save, post_delete], sender=Match)
+@receiver([post_save, post_delete], sender=Prediction)
+def bump_fragment_version(sender, **kwargs):
+    caching.bump(sender._meta.model_name)
+
+
+@receiver([post_save, post_delete], sender=User)
+def bump_user_version(sender, update_fields=None, **kwargs):
+    # usernames show on cards and in the API; a login only writes last_login
+    if update_fields is None or "username" in update_fields:
+        caching.bump("user")
+
+
+@receiver(connection_created)
+def tune_connection(sender, connection, **kwargs):
+    database.configure(connection)
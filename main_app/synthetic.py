@@ -0,0 +1,148 @@
+"""
+Deterministic synthetic league data for benchmarks and local load testing.
+
+generate() builds N teams, M seasons of double round-robin fixtures, K users and their
+predictions, all through bulk_create. The same arguments and seed always produce the same
+rows (kickoffs are laid out relative to `today`, so the last season, the one models.season_of()
+puts `today` in, straddles it: earlier fixtures are finished, later ones still open; in July,
+before the season's first kickoff, all of it is still open). Bulk inserts skip signals, so scores,
+standings, consensus, the league table and the search index are rebuilt once at the end,
+the same way import_fixtures does.
+"""
+import random
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Match, Prediction, Season, Team, season_of
+from . import batch_scoring, caching, consensus, league, ratings, search
+
+BATCH_SIZE = 2000
+USERNAME_PREFIX = "synthetic"
+PASSWORD = "synthetic-pass"
+
+CITIES = [
+    "Ashford", "Bramley", "Carlow", "Dunmore", "Eastleigh", "Fairport", "Glenbrook", "Hartwell",
+    "Ironbridge", "Kingsmere", "Lakeside", "Millbrook", "Northam", "Oakridge", "Portsea",
+    "Queensbury", "Redcliffe", "Stonebridge", "Thornbury", "Westfield",
+]
+SUFFIXES = ["United", "City", "Rovers", "Athletic", "Town", "Wanderers", "Albion", "County"]
+# rough league-wide outcome mix, used for both results and picks
+PICK_WEIGHTS = {"HOME": 45, "DRAW": 25, "AWAY": 30}
+GOALS = [0, 1, 2, 3, 4, 5]
+GOAL_WEIGHTS = [26, 34, 22, 11, 5, 2]
+
+
+def team_names(count):
+    names = []
+    for i in range(count):
+        city, suffix = CITIES[i % len(CITIES)], SUFFIXES[(i // len(CITIES)) % len(SUFFIXES)]
+        lap = i // (len(CITIES) * len(SUFFIXES))
+        names.append(f"{city} {suffix}" + (f" {lap + 1}" if lap else ""))
+    return names
+
+
+def round_robin(team_ids):
+    """Double round-robin (circle method): a list of rounds, each a list of (home, away)."""
+    ids = list(team_ids) + ([None] if len(team_ids) % 2 else [])
+    half = len(ids) // 2
+    rounds = []
+    for r in range(len(ids) - 1):
+        pairs = [(ids[i], ids[-1 - i]) for i in range(half)]
+        rounds.append([(a, b) if r % 2 else (b, a) for a, b in pairs if a is not None and b is not None])
+        ids = [ids[0], ids[-1]] + ids[1:-1]
+    return rounds + [[(away, home) for home, away in rnd] for rnd in rounds]
+
+
+def season_start(year):
+    return timezone.make_aware(datetime.combine(datetime(year, 8, 10), time(15)))
+
+
+def _probabilities(rng, pick):
+    weights = {o: rng.uniform(0.5, 1.5) for o in PICK_WEIGHTS}
+    weights[pick] += 1.5
+    total = sum(weights.values())
+    home, draw = round(weights["HOME"] / total, 2), round(weights["DRAW"] / total, 2)
+    return home, draw, round(1 - home - draw, 2)
+
+
+def generate(teams=20, seasons=1, users=100, coverage=0.3, seed=0, today=None, batch_size=BATCH_SIZE, log=None):
+    """Insert a synthetic league; returns row counts. Use an empty database (team names must be free)."""
+    rng = random.Random(seed)
+    today = today or timezone.now()
+    log = log or (lambda message: None)
+    counts = {}
+
+    with transaction.atomic():
+        team_rows = Team.objects.bulk_create([
+            Team(name=name, short_code=name[:3].upper(), founded_year=rng.randint(1870, 1990))
+            for name in team_names(teams)
+        ])
+        team_ids = [t.pk for t in team_rows]
+        counts["teams"] = len(team_ids)
+
+        password = make_password(PASSWORD)
+        user_rows = User.objects.bulk_create(
+            [User(username=f"{USERNAME_PREFIX}{i:05d}", password=password) for i in range(users)],
+            batch_size=batch_size,
+        )
+        user_ids = [u.pk for u in user_rows]
+        counts["users"] = len(user_ids)
+
+        # the last season is the one `today` falls in (in July, before its first kickoff)
+        last_year = season_of(today)
+        venues = {pk: f"{name.split()[0]} Park" for pk, name in zip(team_ids, team_names(teams))}
+        fixtures = []
+        for year in range(last_year - seasons + 1, last_year + 1):
+            start = season_start(year)
+            for number, rnd in enumerate(round_robin(team_ids)):
+                for slot, (home, away) in enumerate(rnd):
+                    kickoff = start + timedelta(days=7 * number + slot % 2, hours=2 * (slot // 2 % 3))
+                    match = Match(
+                        home_team_id=home, away_team_id=away, kickoff_at=kickoff, venue=venues[home], gameweek=number + 1,
+                    )
+                    if kickoff < today - timedelta(hours=2):
+                        match.status = "FT"
+                        match.home_score = rng.choices(GOALS, GOAL_WEIGHTS)[0]
+                        match.away_score = rng.choices(GOALS, GOAL_WEIGHTS)[0]
+                    fixtures.append(match)
+        match_rows = Match.objects.bulk_create(fixtures, batch_size=batch_size)
+        Season.ensure(m.season for m in match_rows)
+        counts["matches"] = len(match_rows)
+        log(f"{counts['teams']} teams, {counts['users']} users, {counts['matches']} matches")
+
+        per_match = min(len(user_ids), round(coverage * len(user_ids)))
+        picks, weights = list(PICK_WEIGHTS), list(PICK_WEIGHTS.values())
+        batch, total = [], 0
+        for match in match_rows:
+            for user_id in rng.sample(user_ids, per_match):
+                pick = rng.choices(picks, weights)[0]
+                p_home = p_draw = p_away = None
+                if rng.random() < 0.5:
+                    p_home, p_draw, p_away = _probabilities(rng, pick)
+                batch.append(Prediction(
+                    match_id=match.pk, user_id=user_id, pick=pick,
+                    p_home=p_home, p_draw=p_draw, p_away=p_away,
+                ))
+            if len(batch) >= batch_size:
+                Prediction.objects.bulk_create(batch, batch_size=batch_size)
+                total += len(batch)
+                batch = []
+                log(f"  {total} predictions")
+        Prediction.objects.bulk_create(batch, batch_size=batch_size)
+        counts["predictions"] = total + len(batch)
+
+    # bulk_create skipped the signals: score, build standings and consensus in bulk
+    counts["scored"] = sum(changed for _, changed in batch_scoring.rescore())
+    consensus.reconcile(write=True)
+    league.rebuild()
+    search.rebuild()
+    ratings.fit()
+    counts["baseline_predictions"] = ratings.predict_upcoming()
+    for model in caching.TRACKED_MODELS:
+        caching.bump(model)
+    return counts
+
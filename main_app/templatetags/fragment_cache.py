@@ -0,0 +1,49 @@
+from django import template
+
+from main_app import caching
+
+register = template.Library()
+
+
+class CachedFragmentNode(template.Node):
+    def __init__(self, nodelist, name, depends_on, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.depends_on = depends_on
+        self.vary_on = vary_on
+
+    def render(self, context):
+        models = tuple(self.depends_on.resolve(context).split())
+        # look the model versions up once per template render, not once per card
+        versions_cache = context.render_context.setdefault(self, {})
+        if models not in versions_cache:
+            versions_cache[models] = caching.get_versions(models)
+        key = caching.fragment_key(
+            self.name.resolve(context), versions_cache[models], [v.resolve(context) for v in self.vary_on]
+        )
+        value = caching.get_fragment(key)
+        if value is None:
+            value = self.nodelist.render(context)
+            caching.set_fragment(key, value)
+        return value
+
+
+@register.tag("cachedfragment")
+def do_cachedfragment(parser, token):
+    """
+    {% cachedfragment "name" "match team" obj.pk ... %} ... {% endcachedfragment %}
+
+    Caches the enclosed block under a key built from the name, the current versions of the
+    listed models and any extra vary-on values.
+    """
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' needs a name and a list of models.")
+    nodelist = parser.parse(("endcachedfragment",))
+    parser.delete_first_token()
+    return CachedFragmentNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        parser.compile_filter(bits[2]),
+        [parser.compile_filter(b) for b in bits[3:]],
+    )
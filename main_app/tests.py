@@ -1,3 +1,1018 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+import numpy as np
+from PIL import Image
+
+from . import (
+    archive, batch_scoring, caching, consensus, exports, jobs, kickoffs, league, live, logos, profiling, ratings, scoring, search, views,
+)
+from .forms import TeamForm
+from .models import (
+    ArchivedMatch, ArchivedPrediction, Job, Match, MatchConsensus, Prediction, ProbabilityField, Season, Standing, Team,
+    TeamRating, TeamStanding,
+)
+
+
+class LeagueTestCase(TestCase):
+    """Four teams, one match a day from 23 hours ago on, and a logged-in user."""
+    matches = 6
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("alice")
+        self.client.force_login(self.user)
+        self.teams = [Team.objects.create(name=name, short_code=name[:3].upper()) for name in ("Arsenal", "Brentford", "Chelsea", "Everton")]
+        start = timezone.now() - timedelta(hours=23)
+        self.fixtures = [
+            Match.objects.create(
+                home_team=self.teams[i % 4], away_team=self.teams[(i + 1) % 4], kickoff_at=start + timedelta(days=i)
+            )
+            for i in range(self.matches)
+        ]
+
+    def predict(self, match, users, picks=("HOME", "DRAW", "AWAY")):
+        return [
+            Prediction.objects.create(match=match, user=user, pick=picks[i % len(picks)], p_home=0.5, p_draw=0.3, p_away=0.2)
+            for i, user in enumerate(users)
+        ]
+
+    def finish(self, match, home_score, away_score):
+        match.status, match.home_score, match.away_score = "FT", home_score, away_score
+        match.save()
+        jobs.run_pending()
+
+
+class KeysetPaginationTests(LeagueTestCase):
+    matches = 30
+
+    def walk(self, url, extra):
+        pages, params = [], dict(extra)
+        while True:
+            page = self.client.get(url, params).context["page_obj"]
+            pages.append(page)
+            if not page.has_next:
+                return pages
+            params = dict(extra, after=page.next_cursor)
+
+    def test_match_list_walks_every_match_once_in_both_directions(self):
+        url = reverse("match-index")
+        pages = self.walk(url, {"season": "all"})
+        expected = list(Match.objects.order_by("-kickoff_at", "-id").values_list("pk", flat=True))
+        self.assertEqual([m.pk for page in pages for m in page], expected)
+        self.assertGreater(len(pages), 1)
+        previous = self.client.get(url, {"season": "all", "before": pages[-1].previous_cursor}).context["page_obj"]
+        self.assertEqual([m.pk for m in previous], [m.pk for m in pages[-2]])
+
+    def test_filters_apply_across_pages(self):
+        team = self.teams[0]
+        pages = self.walk(reverse("match-index"), {"season": "all", "team": team.pk})
+        seen = [m for page in pages for m in page]
+        self.assertEqual(len(seen), Match.objects.filter(home_team=team).count() + Match.objects.filter(away_team=team).count())
+        self.assertTrue(all(team.pk in (m.home_team_id, m.away_team_id) for m in seen))
+
+    def test_bad_cursor_is_404(self):
+        self.assertEqual(self.client.get(reverse("match-index"), {"after": "not-a-cursor"}).status_code, 404)
+        self.assertEqual(self.client.get(reverse("prediction-index"), {"before": "Zm9v"}).status_code, 404)
+
+
+class QueryBudgetTests(LeagueTestCase):
+    """Pages stay within settings.QUERY_BUDGETS however many predictions there are."""
+
+    def setUp(self):
+        super().setUp()
+        crowd = [User.objects.create_user(f"fan{i:02d}") for i in range(25)]
+        for match in self.fixtures:
+            self.predict(match, crowd)
+        self.mine = Prediction.objects.create(match=self.fixtures[-1], user=self.user, pick="HOME")
+        self.finish(self.fixtures[0], 2, 1)
+
+    def assertWithinBudget(self, name, url):
+        cache.clear()
+        with profiling.query_budget(settings.QUERY_BUDGETS[name]):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+
+    def test_list_views(self):
+        team = self.teams[0].pk
+        self.assertWithinBudget("team-index", reverse("team-index"))
+        self.assertWithinBudget("match-index", reverse("match-index"))
+        self.assertWithinBudget("match-index", f"{reverse('match-index')}?status=FT&team={team}")
+        self.assertWithinBudget("prediction-index", reverse("prediction-index"))
+        self.assertWithinBudget("prediction-index", f"{reverse('prediction-index')}?season=all&team={team}")
+        self.assertWithinBudget("leaderboard", reverse("leaderboard"))
+        self.assertWithinBudget("league-table", reverse("league-table"))
+        self.assertWithinBudget("api-list", reverse("api-list", args=["predictions"]))
+
+    def test_detail_views(self):
+        self.assertWithinBudget("team-detail", reverse("team-detail", args=[self.teams[0].pk]))
+        self.assertWithinBudget("match-detail", reverse("match-detail", args=[self.fixtures[0].pk]))
+        self.assertWithinBudget("prediction-detail", reverse("prediction-detail", args=[self.mine.pk]))
+        self.assertWithinBudget("prediction-update", reverse("prediction-update", args=[self.mine.pk]))
+        self.assertWithinBudget("api-detail", reverse("api-detail", args=["matches", self.fixtures[0].pk]))
+
+    @override_settings(PROFILE_REQUESTS=True, QUERY_BUDGETS_STRICT=True, QUERY_BUDGETS={"match-index": 1})
+    def test_strict_budget_raises(self):
+        with self.assertRaises(profiling.QueryBudgetExceeded):
+            self.client.get(reverse("match-index"))
+
+
+@override_settings(SETTLE_IN_BACKGROUND=False)
+class ScoringTests(LeagueTestCase):
+    def setUp(self):
+        super().setUp()
+        self.crowd = [User.objects.create_user(f"fan{i}") for i in range(3)]
+        self.match = self.fixtures[0]
+        self.predictions = self.predict(self.match, self.crowd)
+
+    def assertStandingsInSync(self):
+        self.assertEqual(scoring.diff_standings(scoring.compute_standings()), [])
+
+    def test_result_scores_predictions_and_standings(self):
+        self.finish(self.match, 1, 0)
+        scored = {p.user_id: p for p in Prediction.objects.all()}
+        self.assertEqual([scored[u.pk].points for u in self.crowd], [3, 0, 0])
+        self.assertAlmostEqual(scored[self.crowd[0].pk].brier, 0.25 + 0.09 + 0.04)
+        self.assertEqual(Standing.objects.get(user=self.crowd[0]).points, 3)
+        self.assertStandingsInSync()
+
+    def test_corrections_and_deletes_move_the_deltas(self):
+        self.finish(self.match, 1, 0)
+        self.finish(self.match, 1, 1)
+        self.assertEqual(Standing.objects.get(user=self.crowd[1]).points, 3)
+        self.assertEqual(Standing.objects.get(user=self.crowd[0]).points, 0)
+        Prediction.objects.get(pk=self.predictions[1].pk).delete()
+        self.assertEqual(Standing.objects.get(user=self.crowd[1]).points, 0)
+        self.match.status, self.match.home_score, self.match.away_score = "LIVE", None, None
+        self.match.save()
+        self.assertFalse(Prediction.objects.filter(points__isnull=False).exists())
+        self.assertStandingsInSync()
+
+
+class BatchRescoreTests(LeagueTestCase):
+    def setUp(self):
+        super().setUp()
+        crowd = [User.objects.create_user(f"fan{i}") for i in range(7)]
+        for n, match in enumerate(self.fixtures):
+            for i, user in enumerate(crowd):
+                x = (i + 1) / 10
+                Prediction.objects.create(
+                    match=match, user=user, pick=("HOME", "DRAW", "AWAY")[(i + n) % 3],
+                    **({} if i % 3 == 0 else {"p_home": x, "p_draw": 0.9 - x, "p_away": 0.1}),
+                )
+        # results written behind the signals' back, as a bulk import would
+        for n, match in enumerate(self.fixtures[:4]):
+            Match.objects.filter(pk=match.pk).update(status="FT", home_score=n % 3, away_score=1)
+
+    def test_matches_the_row_by_row_scorer(self):
+        for _ in batch_scoring.rescore(chunk_size=5):
+            pass
+        outcomes = {m.pk: scoring.outcome_for(m.status, m.home_score, m.away_score) for m in Match.objects.all()}
+        for p in Prediction.objects.all():
+            want = scoring.score(p.pick, p.p_home, p.p_draw, p.p_away, outcomes[p.match_id])
+            self.assertEqual(p.points, want[0])
+            for have, expected in zip((p.brier, p.log_loss), want[1:]):
+                if expected is None:
+                    self.assertIsNone(have)
+                else:
+                    self.assertAlmostEqual(have, expected, places=6)
+        self.assertEqual(scoring.diff_standings(scoring.compute_standings()), [])
+
+    def test_match_ids_limit_the_work(self):
+        first = self.fixtures[0].pk
+        list(batch_scoring.rescore(Prediction.objects.filter(match_id=first), match_ids=[first]))
+        self.assertFalse(Prediction.objects.exclude(match_id=first).filter(points__isnull=False).exists())
+        self.assertEqual(Prediction.objects.filter(match_id=first, points__isnull=True).count(), 0)
+
+
+@override_settings(SETTLE_IN_BACKGROUND=True)
+class JobTests(LeagueTestCase):
+    def test_saves_coalesce_into_one_idempotent_job(self):
+        self.predict(self.fixtures[0], [self.user])
+        match = self.fixtures[0]
+        match.status, match.home_score, match.away_score = "FT", 1, 0
+        match.save()
+        match.home_score = 2
+        match.save()
+        self.assertEqual(Job.objects.filter(kind="settle_match", status="PENDING").count(), 1)
+        mine = Prediction.objects.filter(user=self.user)
+        self.assertIsNone(mine.get().points)
+        jobs.run_pending()
+        self.assertEqual(mine.get().points, 3)
+        # running the same work again changes nothing
+        jobs.enqueue_settlement(match)
+        jobs.run_pending()
+        self.assertEqual(Standing.objects.get(user=self.user).points, 3)
+
+    def test_failures_back_off_then_fail(self):
+        calls = []
+
+        def broken(payloads):
+            calls.append(payloads)
+            raise RuntimeError("broken")
+        jobs.handler("broken")(broken)
+        self.addCleanup(jobs.HANDLERS.pop, "broken")
+
+        self.assertTrue(jobs.enqueue("broken", "broken:1", {"n": 1}))
+        self.assertFalse(jobs.enqueue("broken", "broken:1", {"n": 1}))
+        with self.assertLogs("main_app.jobs", "ERROR"):
+            jobs.run_pending()
+        job = Job.objects.get(key="broken:1")
+        self.assertEqual((job.status, job.attempts), ("PENDING", 1))
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertEqual(jobs.run_pending(), (0, 0))  # not due yet
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now(), max_attempts=2)
+        with self.assertLogs("main_app.jobs", "ERROR"):
+            jobs.run_pending()
+        self.assertEqual(Job.objects.get(pk=job.pk).status, "FAILED")
+        self.assertEqual(len(calls), 2)
+
+    def test_expired_locks_count_as_attempts(self):
+        # a job whose worker dies every time it runs is retried, then given up on
+        jobs.enqueue("crashes", "crashes:1")
+        job = Job.objects.filter(key="crashes:1")
+        job.update(max_attempts=2)
+        expired = timezone.now() - jobs.LOCK_TIMEOUT * 2
+        self.assertEqual(len(jobs.claim(worker="first")), 1)
+        job.update(locked_at=expired)
+        self.assertEqual(len(jobs.claim(worker="second")), 1)
+        self.assertEqual(job.get().attempts, 1)
+        job.update(locked_at=expired)
+        self.assertEqual(jobs.claim(worker="third"), [])
+        self.assertEqual(job.values_list("status", "attempts").get(), ("FAILED", 2))
+
+    def test_match_views_commit_the_job_with_the_save(self):
+        match = self.fixtures[0]
+        Match.objects.filter(pk=match.pk).update(created_by=self.user)
+        form = {"home_team": self.teams[0].pk, "away_team": self.teams[1].pk,
+                "kickoff_at": match.kickoff_at.strftime("%Y-%m-%dT%H:%M"), "status": "FT"}
+        with mock.patch.object(jobs, "enqueue_rating", side_effect=RuntimeError("queue down")):
+            with self.assertRaises(RuntimeError):
+                self.client.post(reverse("match-update", args=[match.pk]), form)
+        self.assertEqual(Match.objects.get(pk=match.pk).status, "SCHEDULED")
+        self.assertFalse(Job.objects.exists())
+
+
+class LogoUploadTests(TestCase):
+    def upload(self, name, data):
+        form = TeamForm({"name": "Fulham", "short_code": "FUL"}, {"logo": SimpleUploadedFile(name, data)})
+        return form, form.is_valid()
+
+    def test_svg_is_sanitized(self):
+        svg = (
+            b'<svg xmlns="http://www.w3.org/2000/svg"><script>alert(1)</script>'
+            b'<style>rect { fill: url(https://evil.example/x) }</style>'
+            b'<a href="#crest" onclick="alert(1)"><set attributeName="href" to="javascript:alert(1)"/>'
+            b'<animate attributeName="href" values="javascript:alert(1)"/>'
+            b'<rect width="10" height="10" fill="red" data-x="java script:alert(1)"/></a></svg>'
+        )
+        form, valid = self.upload("crest.svg", svg)
+        self.assertTrue(valid, form.errors)
+        stored = form.cleaned_data["logo"].read().decode()
+        for banned in ("script", "style", "onclick", "<set", "animate", "data-x"):
+            self.assertNotIn(banned, stored)
+        self.assertIn('href="#crest"', stored)
+        self.assertIn('fill="red"', stored)
+
+    def test_rasters_must_decode(self):
+        png = BytesIO()
+        Image.new("RGB", (4, 4), "red").save(png, "PNG")
+        self.assertTrue(self.upload("crest.png", png.getvalue())[1])
+        for name, data in (("crest.png", b"<html><script>alert(1)</script></html>"),
+                           ("crest.png", png.getvalue()[:40]),
+                           ("crest.svg", png.getvalue())):
+            form, valid = self.upload(name, data)
+            self.assertFalse(valid, name)
+            self.assertIn("logo", form.errors)
+        with self.assertRaises(logos.LogoError):
+            logos.sanitize_svg(b'<!DOCTYPE svg [<!ENTITY x "y">]><svg xmlns="http://www.w3.org/2000/svg"/>')
+
+
+class MatchDetailQueryTests(LeagueTestCase):
+    def queries_for(self, match):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("match-detail", args=[match.pk]))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_predictions(self):
+        quiet, busy = self.fixtures[2], self.fixtures[3]
+        self.predict(quiet, [User.objects.create_user("solo")])
+        self.predict(busy, [User.objects.create_user(f"fan{i}") for i in range(60)])
+        self.assertEqual(self.queries_for(quiet), self.queries_for(busy))
+
+
+class ConsensusTests(LeagueTestCase):
+    def test_counters_follow_every_write(self):
+        crowd = [User.objects.create_user(f"fan{i}") for i in range(6)]
+        match, other = self.fixtures[2], self.fixtures[3]
+        predictions = self.predict(match, crowd)
+        summary = MatchConsensus.objects.get(match=match)
+        self.assertEqual((summary.total, summary.home, summary.draw, summary.away), (6, 2, 2, 2))
+
+        predictions[0].pick, predictions[0].p_home = "AWAY", None
+        predictions[0].save()
+        predictions[1].match = other
+        predictions[1].save()
+        predictions[2].delete()
+        crowd[3].delete()
+        summary.refresh_from_db()
+        self.assertEqual((summary.total, summary.home, summary.draw, summary.away), (3, 0, 1, 2))
+        self.assertEqual(consensus.reconcile(write=False), [])
+
+    def test_reconcile_repairs_drift(self):
+        self.predict(self.fixtures[2], [self.user])
+        MatchConsensus.objects.filter(match=self.fixtures[2]).update(total=99)
+        self.assertEqual(consensus.reconcile(), [self.fixtures[2].pk])
+        self.assertEqual(consensus.reconcile(write=False), [])
+
+    def test_detail_pages_do_not_trust_the_counter(self):
+        match = self.fixtures[2]
+        self.predict(match, [User.objects.create_user(f"fan{i}") for i in range(5)])
+        url = reverse("match-detail", args=[match.pk])
+        for drifted in (1, 40):
+            MatchConsensus.objects.filter(match=match).update(total=drifted)
+            seen, params = [], {}
+            with mock.patch.object(views.MatchDetail, "predictions_per_page", 2):
+                while True:
+                    page = self.client.get(url, params).context["predictions_page"]
+                    seen += [p.pk for p in page]
+                    if not page.has_next:
+                        break
+                    params = {"after": page.next_cursor}
+            self.assertEqual(seen, list(match.predictions.order_by("created_at", "id").values_list("pk", flat=True)))
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        viewer = User.objects.create_user("viewer")
+        self.client.force_login(viewer)
+        # 7 users on equal points and correct picks, so user id alone orders them
+        rows = [(9, 3)] * 7 + [(12, 4), (6, 2), (6, 1), (0, 0)]
+        for i, (points, correct) in enumerate(rows):
+            user = User.objects.create_user(f"player{i:02d}")
+            Standing.objects.create(user=user, points=points, correct=correct, scored=4)
+        self.expected = list(
+            Standing.objects.order_by("-points", "-correct", "user_id").values_list("user_id", flat=True)
+        )
+
+    def test_pages_follow_the_ranking_and_number_rows(self):
+        url = reverse("leaderboard")
+        pages, params = [], {}
+        with mock.patch.object(views.Leaderboard, "paginate_by", 4):
+            while True:
+                page = self.client.get(url, params).context["page_obj"]
+                pages.append(page)
+                if not page.has_next:
+                    break
+                params = {"after": page.next_cursor}
+            back = self.client.get(url, {"before": pages[-1].previous_cursor}).context["page_obj"]
+        self.assertEqual([s.user_id for page in pages for s in page], self.expected)
+        self.assertEqual([page.start_index for page in pages], [1 + 4 * i for i in range(len(pages))])
+        self.assertEqual([s.user_id for s in back], [s.user_id for s in pages[-2]])
+        self.assertEqual(back.start_index, pages[-2].start_index)
+        self.assertEqual(self.client.get(url, {"after": "bm9wZQ"}).status_code, 404)
+
+
+class LeagueTableTests(LeagueTestCase):
+    def row(self, team, match):
+        return TeamStanding.objects.get(team=team, season=match.season)
+
+    def test_results_corrections_and_deletes_move_the_table(self):
+        arsenal, brentford, chelsea, everton = self.teams
+        first, second, fourth = self.fixtures[0], self.fixtures[1], self.fixtures[3]
+        self.finish(first, 2, 1)
+        self.finish(second, 1, 1)
+        self.finish(fourth, 0, 2)
+        row = self.row(arsenal, first)
+        self.assertEqual((row.played, row.won, row.goals_for, row.goals_against, row.points, row.form), (2, 2, 4, 1, 6, "WW"))
+
+        self.finish(first, 0, 3)
+        row = self.row(arsenal, first)
+        self.assertEqual((row.won, row.lost, row.goal_difference, row.points, row.form), (1, 1, -1, 3, "LW"))
+        self.assertEqual((self.row(brentford, first).points, self.row(brentford, first).form), (4, "WD"))
+
+        Match.objects.get(pk=fourth.pk).delete()
+        row = self.row(arsenal, first)
+        self.assertEqual((row.played, row.points, row.form), (1, 0, "L"))
+        self.assertEqual(self.row(everton, fourth).played, 0)
+        call_command("rebuild_league_table", "--check", stdout=StringIO())
+
+        response = self.client.get(reverse("league-table"), {"season": first.season})
+        self.assertEqual([r.team for r in response.context["object_list"]], [brentford, chelsea, everton, arsenal])
+
+    def test_rebuild_repairs_drift(self):
+        self.finish(self.fixtures[0], 2, 1)
+        TeamStanding.objects.filter(team=self.teams[0]).update(points=99, form="")
+        with self.assertRaises(CommandError):
+            call_command("rebuild_league_table", "--check", stdout=StringIO())
+        call_command("rebuild_league_table", stdout=StringIO())
+        row = self.row(self.teams[0], self.fixtures[0])
+        self.assertEqual((row.points, row.form), (3, "W"))
+        call_command("rebuild_league_table", "--check", stdout=StringIO())
+
+
+class HeadToHeadTests(LeagueTestCase):
+    def test_summary_spans_both_orders_and_the_archive(self):
+        arsenal, brentford = self.teams[:2]
+        now = timezone.now()
+        self.finish(self.fixtures[0], 2, 1)
+        away_leg = Match.objects.create(home_team=brentford, away_team=arsenal, kickoff_at=now - timedelta(days=7),
+                                        status="FT", home_score=3, away_score=0)
+        ArchivedMatch.objects.create(
+            id=10_000, season=2019, kickoff_at=now - timedelta(days=2000), home_team=arsenal, away_team=brentford,
+            pair_low=min(arsenal.pk, brentford.pk), pair_high=max(arsenal.pk, brentford.pk), status="FT", home_score=1, away_score=1,
+        )
+        self.finish(self.fixtures[4], 5, 0)  # Arsenal v Brentford again
+        self.finish(self.fixtures[3], 4, 4)  # Everton v Arsenal: not a meeting
+
+        h2h = league.head_to_head(arsenal.pk, brentford.pk)
+        self.assertEqual(
+            {k: h2h[k] for k in ("played", "wins", "draws", "losses", "goals_for", "goals_against")},
+            {"played": 4, "wins": 2, "draws": 1, "losses": 1, "goals_for": 8, "goals_against": 5},
+        )
+        self.assertEqual([m["id"] for m in h2h["recent"]], [self.fixtures[4].pk, self.fixtures[0].pk, away_leg.pk, 10_000])
+        reverse_side = league.head_to_head(brentford.pk, arsenal.pk)
+        self.assertEqual((reverse_side["wins"], reverse_side["losses"], reverse_side["goals_for"]), (1, 2, 5))
+
+        with self.assertNumQueries(0):
+            league.head_to_head(arsenal.pk, brentford.pk)
+        self.finish(away_leg, 0, 0)
+        self.assertEqual(league.head_to_head(arsenal.pk, brentford.pk)["draws"], 2)
+
+        response = self.client.get(reverse("match-detail", args=[away_leg.pk]))
+        recent = response.context["h2h"]["recent"]
+        self.assertEqual((recent[0]["home_name"], recent[0]["away_name"]), ("Arsenal", "Brentford"))
+        self.assertEqual((recent[2]["home_name"], recent[2]["away_name"]), ("Brentford", "Arsenal"))
+
+
+class TeamDeleteTests(LeagueTestCase):
+    def setUp(self):
+        super().setUp()
+        self.fulham = Team.objects.create(name="Fulham", created_by=self.user)
+        self.url = reverse("team-delete", args=[self.fulham.pk])
+
+    def test_blocking_matches_are_counted_and_paginated(self):
+        start = timezone.now()
+        Match.objects.bulk_create([
+            Match(home_team=self.fulham, away_team=self.teams[i % 4], kickoff_at=start + timedelta(days=i)) for i in range(30)
+        ])
+        response = self.client.get(self.url)
+        self.assertTemplateUsed(response, "main_app/team_cannot_delete.html")
+        page = response.context["blocking_matches"]
+        self.assertEqual((response.context["blocking_count"], page.paginator.num_pages, len(page)), (30, 2, 25))
+        self.assertEqual(len(self.client.get(self.url, {"page": 2}).context["blocking_matches"]), 5)
+
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["blocking_count"], 30)
+        self.assertTrue(Team.objects.filter(pk=self.fulham.pk).exists())
+
+    def test_archived_matches_block_too(self):
+        ArchivedMatch.objects.create(
+            id=10_000, season=2019, kickoff_at=timezone.now() - timedelta(days=2000), home_team=self.fulham,
+            away_team=self.teams[0], pair_low=self.teams[0].pk, pair_high=self.fulham.pk, status="FT", home_score=1, away_score=0,
+        )
+        response = self.client.post(self.url)
+        self.assertEqual((response.context["blocking_count"], response.context["archived_count"]), (0, 1))
+        self.assertTrue(Team.objects.filter(pk=self.fulham.pk).exists())
+
+    def test_unblocked_team_is_deleted(self):
+        self.assertTemplateUsed(self.client.get(self.url), "main_app/team_confirm_delete.html")
+        self.assertRedirects(self.client.post(self.url), "/teams/", fetch_redirect_response=False)
+        self.assertFalse(Team.objects.filter(pk=self.fulham.pk).exists())
+        # only the team's creator may delete it
+        self.assertEqual(self.client.post(reverse("team-delete", args=[self.teams[0].pk])).status_code, 404)
+
+
+class SearchIndexTests(LeagueTestCase):
+    def found(self, text):
+        return set(search.filter_matches(Match.objects.all(), text).values_list("pk", flat=True))
+
+    def test_saves_and_deletes_keep_the_index_current(self):
+        arsenal, brentford = self.teams[:2]
+        first = self.fixtures[0]  # Arsenal v Brentford, as is fixtures[4]
+        self.assertEqual(self.found("arsenal brent"), {first.pk, self.fixtures[4].pk})
+        self.assertEqual(set(search.filter_teams(Team.objects.all(), "ars")), {arsenal})
+
+        # a rename reaches the team's own document and all of its matches'
+        arsenal.name = "Woolwich Arsenal"
+        arsenal.save()
+        self.assertEqual(len(self.found("woolwich")), 3)
+        self.assertEqual(set(search.filter_teams(Team.objects.all(), "wool")), {arsenal})
+
+        first.venue = "Highbury"
+        first.save()
+        self.assertEqual(self.found("highbury"), {first.pk})
+        first.away_team = self.teams[2]
+        first.save()
+        self.assertEqual(self.found("highbury chelsea"), {first.pk})
+        self.assertEqual(self.found("highbury brentford"), set())
+
+        Match.objects.get(pk=first.pk).delete()
+        self.assertEqual(self.found("highbury"), set())
+        Team.objects.create(name="Fulham")
+        self.assertEqual(search.filter_teams(Team.objects.all(), "fulham").count(), 1)
+
+    def test_rebuild_matches_the_signal_maintained_index(self):
+        queries = ("ars", "brentford che", "EVE", "zzz")
+        before = {q: self.found(q) for q in queries}
+        call_command("rebuild_search_index", stdout=StringIO())
+        self.assertEqual({q: self.found(q) for q in queries}, before)
+        self.assertEqual(before["EVE"], {m.pk for m in self.fixtures if self.teams[3].pk in (m.home_team_id, m.away_team_id)})
+
+    def test_list_combines_text_and_facets(self):
+        self.finish(self.fixtures[0], 1, 0)
+        response = self.client.get(reverse("match-index"), {"q": "arsenal", "status": "FT"})
+        self.assertEqual([m.pk for m in response.context["object_list"]], [self.fixtures[0].pk])
+
+
+class BaselineAccountTests(TestCase):
+    def test_signup_cannot_take_the_name(self):
+        self.client.post(reverse("signup"), {"username": settings.BASELINE_USERNAME.title(), "password1": "k3!vQz9pLw", "password2": "k3!vQz9pLw"})
+        self.assertFalse(User.objects.filter(username__iexact=settings.BASELINE_USERNAME).exists())
+
+    def test_never_adopts_a_real_account(self):
+        User.objects.create_user(settings.BASELINE_USERNAME, password="k3!vQz9pLw")
+        with self.assertRaises(ImproperlyConfigured):
+            ratings.system_user()
+
+    def test_reuses_its_own_account(self):
+        user = ratings.system_user()
+        self.assertFalse(user.is_active or user.has_usable_password())
+        self.assertEqual(ratings.system_user(), user)
+
+
+def replay_one_by_one(results, k_factor, home_advantage, draw_weight, start=None):
+    """Textbook Elo, one match at a time: what the batched replay must reproduce."""
+    table = dict(start or {})
+    for home, away, score in results:
+        rh, ra = table.get(home, ratings.INITIAL_RATING), table.get(away, ratings.INITIAL_RATING)
+        p_home, p_draw, _ = ratings.probabilities(rh + home_advantage - ra, draw_weight)
+        delta = k_factor * (score - (float(p_home) + 0.5 * float(p_draw)))
+        table[home], table[away] = rh + delta, ra - delta
+    return table
+
+
+@override_settings(SETTLE_IN_BACKGROUND=False)
+class RatingTests(LeagueTestCase):
+    def stored(self):
+        return dict(TeamRating.objects.values_list("team_id", "rating"))
+
+    def results(self):
+        return [
+            (m.home_team_id, m.away_team_id, 1.0 if m.home_score > m.away_score else 0.5 if m.home_score == m.away_score else 0.0)
+            for m in Match.objects.filter(status="FT").order_by("kickoff_at", "id")
+        ]
+
+    def assertRatingsEqual(self, have, want):
+        self.assertLessEqual(set(want), set(have))
+        for team, rating in want.items():
+            self.assertAlmostEqual(have[team], rating, places=9)
+
+    def test_batched_replay_matches_one_by_one(self):
+        rng = random.Random(7)
+        results = [(h, a, rng.choice((1.0, 0.5, 0.0))) for h, a in (rng.sample(range(6), 2) for _ in range(300))]
+        home, away, scores = (np.array(column) for column in zip(*results))
+        table, played = np.full(6, ratings.INITIAL_RATING), np.zeros(6, dtype=int)
+        ratings.replay(table, played, home, away, scores, 20.0, 60.0, 0.8)
+        self.assertRatingsEqual(dict(enumerate(table.tolist())), replay_one_by_one(results, 20.0, 60.0, 0.8))
+        self.assertEqual(played.sum(), 600)
+
+    def test_incremental_updates_equal_a_replay(self):
+        self.finish(self.fixtures[0], 2, 0)  # nothing fitted yet: a fit
+        for match, score in zip(self.fixtures[1:4], ((1, 1), (0, 3), (2, 1))):
+            self.finish(match, *score)  # after the watermark: folded in
+        model = ratings.get_model()
+        self.assertEqual(model.matches, 4)
+        want = replay_one_by_one(self.results(), model.k_factor, model.home_advantage, model.draw_weight)
+        self.assertRatingsEqual(self.stored(), want)
+
+        # a correction behind the watermark refits from scratch, as does a delete
+        self.finish(self.fixtures[1], 0, 1)
+        self.assertRatingsEqual(self.stored(), ratings.fit(write=False)[1])
+        Match.objects.get(pk=self.fixtures[2].pk).delete()
+        self.assertEqual(ratings.get_model().matches, 3)
+        self.assertRatingsEqual(self.stored(), ratings.fit(write=False)[1])
+        self.assertFalse(Job.objects.exists())
+
+    def test_taken_baseline_name_does_not_fail_the_save(self):
+        User.objects.create_user(settings.BASELINE_USERNAME, password="k3!vQz9pLw")
+        with self.assertLogs("main_app.signals", "ERROR"):
+            self.finish(self.fixtures[0], 1, 0)
+        self.assertEqual(Match.objects.get(pk=self.fixtures[0].pk).status, "FT")
+        self.assertEqual(ratings.get_model().matches, 1)
+        self.assertFalse(Prediction.objects.filter(user__username=settings.BASELINE_USERNAME).exists())
+
+
+@override_settings(SETTLE_IN_BACKGROUND=False)
+class ArchiveSeasonTests(LeagueTestCase):
+    def setUp(self):
+        super().setUp()
+        self.year = Season.current_year() - 2
+        start = timezone.make_aware(datetime(self.year, 8, 20, 15))
+        crowd = [self.user] + [User.objects.create_user(f"fan{i}") for i in range(3)]
+        self.old = [
+            Match.objects.create(home_team=self.teams[i % 4], away_team=self.teams[(i + 2) % 4], kickoff_at=start + timedelta(days=7 * i))
+            for i in range(4)
+        ]
+        for i, match in enumerate(self.old):
+            self.predict(match, crowd)
+            self.finish(match, i % 3, 1)
+        for i, match in enumerate(self.fixtures[:2]):
+            self.predict(match, crowd)
+            self.finish(match, 1, i)
+
+    def snapshot(self):
+        return {
+            "standings": sorted(Standing.objects.values_list("user_id", "points", "scored", "correct", "probability_count")),
+            "table": sorted(TeamStanding.objects.values_list("team_id", "season", "played", "points", "goal_difference", "form")),
+            "ratings": {t: round(r, 9) for t, r in TeamRating.objects.values_list("team_id", "rating")},
+            "refit": {t: round(r, 9) for t, r in ratings.fit(write=False)[1].items()},
+        }
+
+    def test_archiving_changes_no_derived_numbers(self):
+        before = self.snapshot()
+        predictions = Prediction.objects.filter(match__season=self.year).count()
+        call_command("archive_season", season=[self.year], stdout=StringIO())
+
+        self.assertFalse(Match.objects.filter(season=self.year).exists())
+        self.assertEqual(ArchivedMatch.objects.filter(season=self.year).count(), 4)
+        self.assertEqual(ArchivedPrediction.objects.count(), predictions)
+        self.assertEqual(self.snapshot(), before)
+        # full rebuilds fold the archive back in and agree with the kept rows
+        call_command("rebuild_standings", "--check", stdout=StringIO())
+        call_command("rebuild_league_table", "--check", stdout=StringIO())
+        ratings.fit()
+        self.assertEqual(self.snapshot()["ratings"], before["refit"])
+
+        # archived scores stay counted when live results change afterwards
+        self.finish(self.fixtures[0], 0, 3)
+        call_command("rebuild_standings", "--check", stdout=StringIO())
+
+    def test_open_and_current_seasons_are_refused(self):
+        Match.objects.create(home_team=self.teams[0], away_team=self.teams[1], kickoff_at=self.old[-1].kickoff_at + timedelta(days=7))
+        for year in (self.year, Season.current_year()):
+            with self.assertRaises(CommandError):
+                call_command("archive_season", season=[year], stdout=StringIO())
+        self.assertEqual(Match.objects.filter(season=self.year).count(), 5)
+
+
+class KickoffLockTests(LeagueTestCase):
+    def setUp(self):
+        super().setUp()
+        self.started, self.upcoming = self.fixtures[0], self.fixtures[2]
+        self.locked = Prediction.objects.create(match=self.started, user=self.user, pick="HOME")
+        self.open = Prediction.objects.create(match=self.upcoming, user=self.user, pick="HOME")
+
+    def test_predictions_close_at_kickoff(self):
+        self.assertTrue(kickoffs.is_locked(self.started.pk))
+        self.assertFalse(kickoffs.is_locked(self.upcoming.pk))
+        response = self.client.post(reverse("prediction-update", args=[self.locked.pk]), {"match": self.started.pk, "pick": "AWAY"})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.client.post(reverse("prediction-delete", args=[self.locked.pk])).status_code, 403)
+        self.assertEqual(Prediction.objects.get(pk=self.locked.pk).pick, "HOME")
+
+        response = self.client.post(reverse("prediction-update", args=[self.open.pk]), {"match": self.upcoming.pk, "pick": "AWAY"})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Prediction.objects.get(pk=self.open.pk).pick, "AWAY")
+
+    def test_start_due_flips_kicked_off_matches(self):
+        self.assertEqual(kickoffs.start_due(), [self.started.pk])
+        self.assertEqual(Match.objects.get(pk=self.started.pk).status, "LIVE")
+        self.assertEqual(kickoffs.start_due(), [])
+        self.assertEqual(kickoffs.start_due(now=self.upcoming.kickoff_at), [self.fixtures[1].pk, self.upcoming.pk])
+        self.assertTrue(kickoffs.is_locked(self.upcoming.pk))
+
+    def test_writes_that_skip_the_signals_are_seen(self):
+        self.assertFalse(kickoffs.is_locked(self.upcoming.pk))
+        # a kickoff moved into the past behind the signals' back, as a bulk import would
+        Match.objects.filter(pk=self.upcoming.pk).update(kickoff_at=timezone.now() - timedelta(minutes=1))
+        self.assertTrue(kickoffs.is_locked(self.upcoming.pk))
+        added = Match.objects.bulk_create([
+            Match(home_team=self.teams[0], away_team=self.teams[2], kickoff_at=timezone.now() + timedelta(days=30))
+        ])[0]
+        self.assertFalse(kickoffs.is_locked(added.pk))
+
+    def test_editing_offers_the_current_match_only_while_open(self):
+        self.assertIn(self.upcoming, Match.objects.open_for(self.user, include=self.upcoming.pk))
+        self.assertNotIn(self.started, Match.objects.open_for(self.user, include=self.started.pk))
+
+
+class CompactPredictionTests(LeagueTestCase):
+    def test_round_trip(self):
+        prediction = Prediction.objects.create(
+            match=self.fixtures[2], user=self.user, pick="DRAW", p_home=0.333333, p_draw=0.333333, p_away=0.333334
+        )
+        self.assertEqual(prediction.p_home, 0.3333)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pick, p_home, p_draw, p_away FROM main_app_prediction WHERE id = %s", [prediction.pk])
+            self.assertEqual(cursor.fetchone(), (1, 3333, 3333, 3333))
+        loaded = Prediction.objects.get(pk=prediction.pk)
+        self.assertEqual((loaded.pick, loaded.get_pick_display(), loaded.p_draw), ("DRAW", "Draw", 0.3333))
+        self.assertEqual(Prediction.objects.filter(pick="DRAW").count(), 1)
+        self.assertEqual(Prediction.objects.filter(pick__in=["HOME", "AWAY"]).count(), 0)
+
+    def test_quantize_and_unknown_picks(self):
+        self.assertEqual(ProbabilityField.quantize(0.45678), 0.4568)
+        self.assertIsNone(ProbabilityField.quantize(None))
+        with self.assertRaises(ValueError):
+            Prediction.objects.filter(pick="SIDEWAYS")
+
+
+class FragmentCacheTests(LeagueTestCase):
+    def test_writes_refresh_cached_cards(self):
+        url = reverse("match-index")
+        self.assertContains(self.client.get(url), "Arsenal")
+        team = self.teams[0]
+        team.name = "Woolwich Arsenal"
+        team.save()
+        self.assertContains(self.client.get(url), "Woolwich Arsenal")
+
+    def test_keys_are_scoped_to_the_database(self):
+        here = caching.fragment_key("match-card", {"match": 1}, [1])
+        with mock.patch.dict(connection.settings_dict, NAME="elsewhere.sqlite3"):
+            there = caching.fragment_key("match-card", {"match": 1}, [1])
+        self.assertNotEqual(here, there)
+
+
+@override_settings(SETTLE_IN_BACKGROUND=False)
+class ImportFixturesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for name in ("Arsenal", "Brentford", "Chelsea"):
+            Team.objects.create(name=name, short_code=name[:3].upper())
+
+    def run_import(self, suffix, content):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, "w") as fh:
+            fh.write(content)
+        self.addCleanup(os.remove, path)
+        out, err = StringIO(), StringIO()
+        call_command("import_fixtures", path, "--batch-size", "2", stdout=out, stderr=err)
+        return err.getvalue()
+
+    def test_upserts_and_settles(self):
+        rows = "home_team,away_team,kickoff_at,venue,home_score,away_score\n"
+        self.run_import(".csv", rows + "Arsenal,Brentford,2025-08-16T15:00:00+00:00,Emirates,,\n"
+                                      "CHE,Arsenal,2025-08-23T15:00:00+00:00,,,\n")
+        match = Match.objects.get(home_team__name="Arsenal")
+        self.assertEqual((match.status, match.venue), ("SCHEDULED", "Emirates"))
+        Prediction.objects.create(match=match, user=User.objects.create_user("alice"), pick="HOME")
+
+        self.run_import(".csv", rows + "Arsenal,Brentford,2025-08-16T15:00:00+00:00,Emirates,2,0\n")
+        match.refresh_from_db()
+        self.assertEqual((match.status, match.home_score, Match.objects.count()), ("FT", 2, 2))
+        self.assertEqual(Prediction.objects.get(user__username="alice").points, 3)
+        self.assertEqual(TeamStanding.objects.get(team__name="Arsenal", season=2025).points, 3)
+        self.assertEqual(scoring.diff_standings(scoring.compute_standings()), [])
+
+    def test_bad_rows_are_skipped_not_fatal(self):
+        err = self.run_import(".csv", (
+            "home_team,away_team,kickoff_at,home_score,away_score\n"
+            "Arsenal,Brentford,2025-02-30T15:00:00+00:00,,\n"  # no such day
+            "Arsenal,Chelsea,2025-03-01T15:00:00+00:00,-1,0\n"
+            "Arsenal,Fulham,2025-03-02T15:00:00+00:00,,\n"
+            "Arsenal,Arsenal,2025-03-03T15:00:00+00:00,,\n"
+            "Brentford,Chelsea,2025-03-04T15:00:00+00:00,1,1\n"
+        ))
+        self.assertEqual(err.count("Skipping row"), 4)
+        self.assertEqual(list(Match.objects.values_list("home_team__name", "status")), [("Brentford", "FT")])
+
+    def test_rows_only_update_the_fields_they_carry(self):
+        self.run_import(".json", json.dumps([
+            {"home_team": "Arsenal", "away_team": "Brentford", "kickoff_at": "2025-08-16T15:00:00+00:00", "venue": "Emirates"},
+        ]))
+        self.run_import(".json", json.dumps([
+            {"home_team": "Chelsea", "away_team": "Brentford", "kickoff_at": "2025-08-23T15:00:00+00:00", "venue": "Bridge"},
+            {"home_team": "Arsenal", "away_team": "Brentford", "kickoff_at": "2025-08-16T15:00:00+00:00", "home_score": 1, "away_score": 0},
+            {"home_team": "Arsenal", "away_team": "Brentford", "kickoff_at": "2025-08-16T15:00:00+00:00", "venue": "Highbury"},
+        ]))
+        match = Match.objects.get(home_team__name="Arsenal")
+        self.assertEqual((match.venue, match.status, match.home_score), ("Highbury", "FT", 1))
+        self.assertEqual(Match.objects.get(home_team__name="Chelsea").venue, "Bridge")
+
+
+class ExportTests(LeagueTestCase):
+    def setUp(self):
+        super().setUp()
+        self.predict(self.fixtures[2], [self.user, User.objects.create_user("bob")])
+        self.predict(self.fixtures[3], [self.user])
+
+    def test_streams_csv_and_ndjson(self):
+        response = self.client.get(reverse("export-predictions", args=["csv"]))
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(","), [name for name, _ in exports.PREDICTION_COLUMNS])
+        self.assertEqual(len(lines), 4)
+
+        response = self.client.get(reverse("export-predictions", args=["ndjson"]), {"user": "alice", "match": self.fixtures[2].pk})
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([(r["user"], r["match_id"], r["pick"]) for r in rows], [("alice", self.fixtures[2].pk, "HOME")])
+
+    def test_bad_format_or_filter_is_404(self):
+        self.assertEqual(self.client.get(reverse("export-predictions", args=["xml"])).status_code, 404)
+        self.assertEqual(self.client.get(reverse("export-predictions", args=["csv"]), {"match": "x"}).status_code, 404)
+
+
+class PredictionFormScopeTests(LeagueTestCase):
+    def test_search_offers_only_open_unpredicted_matches(self):
+        self.predict(self.fixtures[2], [self.user])
+        results = self.client.get(reverse("match-search"), {"q": ""}).json()["results"]
+        # fixtures[0] kicked off yesterday, fixtures[2] is already predicted
+        self.assertEqual([r["id"] for r in results], [m.pk for m in self.fixtures[1:] if m.pk != self.fixtures[2].pk])
+        results = self.client.get(reverse("match-search"), {"q": "Chel"}).json()["results"]
+        self.assertTrue(results)
+        self.assertTrue(all("Chelsea" in r["label"] for r in results))
+
+    def test_create_rejects_closed_and_predicted_matches(self):
+        self.predict(self.fixtures[2], [self.user])
+        url = reverse("prediction-create")
+        for match in (self.fixtures[0], self.fixtures[2]):
+            response = self.client.post(url, {"match": match.pk, "pick": "HOME"})
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("match", response.context["form"].errors)
+        self.assertEqual(self.client.post(url, {"match": self.fixtures[3].pk, "pick": "HOME"}).status_code, 302)
+        self.assertEqual(Prediction.objects.filter(user=self.user).count(), 2)
+
+
+class GameweekFormTests(LeagueTestCase):
+    def post(self, rows):
+        url = f"{reverse('prediction-gameweek')}?start={timezone.localdate()}&days=7"
+        data = {"form-TOTAL_FORMS": len(rows), "form-INITIAL_FORMS": 0}
+        for i, (match, pick, probs) in enumerate(rows):
+            data.update({f"form-{i}-match_id": match.pk, f"form-{i}-pick": pick})
+            data.update({f"form-{i}-p_{k}": v for k, v in zip(("home", "draw", "away"), probs)})
+        return self.client.post(url, data)
+
+    def test_one_post_creates_and_updates(self):
+        upcoming = self.fixtures[1:]
+        rows = [(m, "", ()) for m in upcoming]
+        rows[0] = (upcoming[0], "HOME", ("0.55555", "0.22222", "0.22223"))
+        rows[2] = (upcoming[2], "AWAY", ())
+        self.assertEqual(self.post(rows).status_code, 302)
+        mine = {p.match_id: p for p in Prediction.objects.filter(user=self.user)}
+        self.assertEqual(set(mine), {upcoming[0].pk, upcoming[2].pk})
+        self.assertEqual(mine[upcoming[0].pk].p_home, 0.5556)
+
+        rows[2] = (upcoming[2], "DRAW", ())
+        self.assertEqual(self.post(rows).status_code, 302)
+        self.assertEqual(Prediction.objects.get(user=self.user, match=upcoming[2]).pick, "DRAW")
+        self.assertEqual(Prediction.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(consensus.reconcile(write=False), [])
+
+    def test_probabilities_need_a_pick(self):
+        rows = [(m, "", ()) for m in self.fixtures[1:]]
+        rows[0] = (self.fixtures[1], "", ("0.5", "0.3", "0.2"))
+        self.assertEqual(self.post(rows).status_code, 200)
+        self.assertFalse(Prediction.objects.exists())
+
+
+class ApiTests(LeagueTestCase):
+    def test_etag_answers_304_until_the_data_changes(self):
+        url = reverse("api-list", args=["teams"])
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(2):  # session and user; no data query
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Team.objects.create(name="Fulham")
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_username_changes_refresh_predictions(self):
+        self.predict(self.fixtures[2], [self.user])
+        url = reverse("api-list", args=["predictions"])
+        etag = self.client.get(url)["ETag"]
+        self.client.force_login(self.user)  # writes last_login only
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.user.username = "alicia"
+        self.user.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["user"], "alicia")
+
+    def test_bad_filters_are_400(self):
+        for resource, query in (("matches", "home_team=abc"), ("matches", "away_team=abc"),
+                                ("predictions", "match=abc"), ("predictions", "pick=SIDEWAYS"),
+                                ("teams", "fields=secret"), ("matches", "after=garbage")):
+            response = self.client.get(f"{reverse('api-list', args=[resource])}?{query}")
+            self.assertEqual(response.status_code, 400, query)
+        self.assertEqual(self.client.get(f"{reverse('api-list', args=['predictions'])}?pick=HOME").status_code, 200)
+
+    def test_team_logos_are_urls(self):
+        team = self.teams[0]
+        Team.objects.filter(pk=team.pk).update(
+            logo="images/teams/abc.webp", logo_thumbs={"card": "images/teams/abc-180.webp", "detail": "images/teams/abc-280.webp"}
+        )
+        row = self.client.get(reverse("api-detail", args=["teams", team.pk])).json()
+        self.assertEqual(row["logo"], default_storage.url("images/teams/abc-180.webp"))
+        self.assertEqual(row["logo_detail"], default_storage.url("images/teams/abc-280.webp"))
+        rows = self.client.get(reverse("api-list", args=["teams"]), {"fields": "name,logo"}).json()["results"]
+        self.assertEqual({r["name"]: r["logo"] for r in rows}["Brentford"], "")
+
+    def test_pages_and_login(self):
+        url = reverse("api-list", args=["matches"])
+        first = self.client.get(url, {"limit": 4, "fields": "id"}).json()
+        second = self.client.get(url, {"limit": 4, "fields": "id", "after": first["next"]}).json()
+        ids = [r["id"] for r in first["results"] + second["results"]]
+        self.assertEqual(ids, list(Match.objects.order_by("-kickoff_at", "-id").values_list("pk", flat=True)))
+        self.client.logout()
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+
+class LiveUpdateTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("alice")
+        home, away = Team.objects.create(name="Arsenal"), Team.objects.create(name="Brentford")
+        self.match = Match.objects.create(home_team=home, away_team=away, kickoff_at=timezone.now() + timedelta(hours=1))
+
+    def test_in_process_writes_fan_out_to_every_stream(self):
+        match = self.match
+
+        def write():
+            m = Match.objects.get(pk=match.pk)
+            m.status, m.home_score, m.away_score = "LIVE", 1, 0
+            m.save()
+            Prediction.objects.create(match=m, user=self.user, pick="HOME")
+            m.status = "FT"
+            m.save()
+
+        async def run():
+            streams = [live.stream(match.pk) for _ in range(3)]
+            first = [await s.__anext__() for s in streams]
+            await asyncio.to_thread(write)
+            return first, [[message async for message in s] for s in streams]
+
+        first, rest = asyncio.run(run())
+        self.assertTrue(all('"SCHEDULED"' in message for message in first))
+        for messages in rest:
+            self.assertIn('"LIVE"', messages[0])
+            self.assertTrue(any('"total": 1' in m for m in messages))
+            self.assertIn('"FT"', messages[-1])
+        self.assertFalse(live.broker.watching(match.pk))
+
+    def test_writes_from_other_processes_arrive_by_polling(self):
+        match = self.match
+
+        async def run():
+            stream = live.stream(match.pk)
+            await stream.__anext__()
+            # a bulk write, as start_matches or another worker makes: no publish in this process
+            await asyncio.to_thread(lambda: Match.objects.filter(pk=match.pk).update(status="LIVE", home_score=2, away_score=0))
+            await live.broker.poll_once()
+            update = await stream.__anext__()
+            await live.broker.poll_once()  # unchanged: nothing more is queued
+            queued = live.broker._subscribers[match.pk]
+            pending = sum(q.qsize() for q in queued)
+            await stream.aclose()
+            return update, pending
+
+        update, pending = asyncio.run(run())
+        self.assertIn('"LIVE"', update)
+        self.assertIn('"home_score": 2', update)
+        self.assertEqual(pending, 0)
+
+    def test_a_read_never_overwrites_a_newer_update(self):
+        async def run():
+            queue = live.broker.subscribe(self.match.pk)
+            live.broker.publish(self.match.pk, {"status": "LIVE"})
+            live.broker.seed(self.match.pk, {"status": "SCHEDULED"})
+            await asyncio.sleep(0)  # the publish reaches queues through call_soon_threadsafe
+            latest = live.broker.latest(self.match.pk)
+            live.broker.unsubscribe(self.match.pk, queue)
+            return latest, queue.qsize()
+
+        self.assertEqual(asyncio.run(run()), ({"status": "LIVE"}, 1))
+
+    def test_only_served_over_asgi(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse("match-live", args=[self.match.pk])).status_code, 204)
+        self.assertNotContains(self.client.get(reverse("match-detail", args=[self.match.pk])), "EventSource(")
+
+        async def run():
+            await self.async_client.aforce_login(self.user)
+            page = await self.async_client.get(reverse("match-detail", args=[self.match.pk]))
+            missing = await self.async_client.get(reverse("match-live", args=[self.match.pk + 100]))
+            return page, missing
+
+        page, missing = asyncio.run(run())
+        self.assertContains(page, "EventSource(")
+        self.assertEqual(missing.status_code, 404)
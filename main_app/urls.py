@@ -1,11 +1,13 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     # Home / Auth
     path('', views.Home.as_view(), name='home'),
     path('about/', views.about, name='about'),
     path('accounts/signup/', views.signup, name='signup'),
+    path('cache/stats/', views.cache_stats, name='cache-stats'),
+    path('profiling/stats/', views.profiling_stats, name='profiling-stats'),
 
     # Teams
     path('teams/', views.TeamList.as_view(), name='team-index'),
@@ -17,6 +19,8 @@ urlpatterns = [
     # Matches
     path('matches/', views.MatchList.as_view(), name='match-index'),
     path('matches/<int:pk>/', views.MatchDetail.as_view(), name='match-detail'),
+    path('matches/search/', views.match_search, name='match-search'),
+    path('matches/<int:pk>/live/', views.match_live, name='match-live'),
     path('matches/create/', views.MatchCreate.as_view(), name='match-create'),
     path('matches/<int:pk>/update/', views.MatchUpdate.as_view(), name='match-update'),
     path('matches/<int:pk>/delete/', views.MatchDelete.as_view(), name='match-delete'),
@@ -25,6 +29,23 @@ urlpatterns = [
     path('predictions/', views.PredictionList.as_view(), name='prediction-index'),
     path('predictions/<int:pk>/', views.PredictionDetail.as_view(), name='prediction-detail'),
     path('predictions/create/', views.PredictionCreate.as_view(), name='prediction-create'),
+    path('predictions/gameweek/', views.GameweekPredictions.as_view(), name='prediction-gameweek'),
     path('predictions/<int:pk>/update/', views.PredictionUpdate.as_view(), name='prediction-update'),
     path('predictions/<int:pk>/delete/', views.PredictionDelete.as_view(), name='prediction-delete'),
+
+    # Leaderboard / league table
+    path('leaderboard/', views.Leaderboard.as_view(), name='leaderboard'),
+    path('table/', views.LeagueTable.as_view(), name='league-table'),
+
+    # Seasons (archived ones are read from the archive tables)
+    path('seasons/', views.SeasonList.as_view(), name='season-index'),
+    path('seasons/<int:year>/', views.SeasonDetail.as_view(), name='season-detail'),
+
+    # Exports (?season=2024-25&user=<username>&match=<id>)
+    path('exports/predictions.<str:fmt>', views.export_predictions, name='export-predictions'),
+    path('exports/standings.<str:fmt>', views.export_standings, name='export-standings'),
+
+    # Read-only JSON API (?fields=a,b&limit=&after=<cursor>, plus per-resource filters)
+    path('api/<str:resource>/', api.resource_list, name='api-list'),
+    path('api/<str:resource>/<int:pk>/', api.resource_detail, name='api-detail'),
 ]
@@ -1,18 +1,26 @@
 
 from django.shortcuts import render, redirect
-from django.views.generic import ListView, DetailView
+from django.urls import reverse
+from django.views.generic import ListView, DetailView, TemplateView
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.views import LoginView
 from django.contrib.auth import login
-from django.contrib.auth.forms import UserCreationForm
-from .forms import MatchForm, PredictionForm, TeamForm
-from django.db import IntegrityError
-from django.db.models import Q
+from .forms import GameweekFormSet, MatchForm, PredictionForm, SignupForm, TeamForm
+from django.db import IntegrityError, transaction
+from django.db.models import F, Func, IntegerField
 from django.db.models.deletion import ProtectedError
 from django.contrib import messages
+from django.core.paginator import Paginator
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import timedelta
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 
-from .models import Team, Match, Prediction
+from .models import ArchivedMatch, ArchivedPrediction, Team, Match, MatchConsensus, Prediction, Season, Standing, TeamStanding
+from .pagination import KeysetPaginationMixin, RankPaginationMixin, day_bounds, keyset_page
+from . import caching, consensus, exports, kickoffs, league, live, profiling, search
 # Create your views here.
 # Home / Auth
 class Home(LoginView):
@@ -21,14 +29,14 @@ class Home(LoginView):
 def signup(request):
     error_message = ''
     if request.method == 'POST':
-        form = UserCreationForm(request.POST)
+        form = SignupForm(request.POST)
         if form.is_valid():
             user = form.save()
             login(request, user)
             return redirect('match-index')
         else:
             error_message = 'Invalid sign up - try again'
-    form = UserCreationForm()
+    form = SignupForm()
     for field in form.fields.values():
         field.widget.attrs.update({'placeholder': field.label})
     return render(request, 'signup.html', {'form': form, 'error_message': error_message})
@@ -36,16 +44,37 @@ def signup(request):
 def about(request):
     return render(request, 'about.html')
 
+@user_passes_test(lambda u: u.is_staff)
+def cache_stats(request):
+    return JsonResponse(caching.stats())
+
+@user_passes_test(lambda u: u.is_staff)
+def profiling_stats(request):
+    if request.method == 'POST':
+        profiling.reset_stats()
+    return JsonResponse({'views': profiling.stats()})
+
 
 # Teams
 class TeamList(LoginRequiredMixin, ListView):
     model = Team
     template_name = "teams/index.html"
-    queryset = Team.objects.order_by('name')
+    # only evaluated when the cached "team-list" fragment is missing
+    queryset = Team.objects.select_related('created_by').order_by('name')
+
+    def get_queryset(self):
+        return search.filter_teams(super().get_queryset(), self.request.GET.get('q'))
 
 class TeamDetail(LoginRequiredMixin, DetailView):
     model = Team
     template_name = "teams/detail.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # precomputed table rows (league.py), newest season first
+        context['standings'] = self.object.season_standings.order_by('-season')[:5]
+        return context
+
 class TeamCreate(LoginRequiredMixin, CreateView):
     model = Team
     form_class = TeamForm 
@@ -65,48 +94,123 @@ class TeamUpdate(LoginRequiredMixin, UpdateView):
             if form.instance.logo:
                 form.instance.logo.delete(save=False)
             form.instance.logo = None
+            form.instance.logo_thumbs = {}
         return super().form_valid(form)
 
 class TeamDelete(LoginRequiredMixin, DeleteView):
     model = Team
     template_name = "main_app/team_confirm_delete.html"
     success_url = "/teams/"
+    blockers_per_page = 25
 
     def get_queryset(self):
         # only allow deleting teams you created
         return Team.objects.filter(created_by=self.request.user)
 
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        blocking = self.object.fixture_count()
+        archived = 0 if blocking else self.object.archived_fixture_count()
+        if blocking or archived:
+            return self.render_blocked(blocking, archived)
+        return self.render_to_response(self.get_context_data())
+
     def post(self, request, *args, **kwargs):
         """
-        Handle the POST explicitly and catch ProtectedError raised by model.delete().
-        This is more robust than relying on DeleteView.delete() in some setups.
+        Count the matches (live and archived) that PROTECT the team before deleting, so the blocked case never
+        runs the delete collector. ProtectedError still covers a match added in between.
         """
         self.object = self.get_object()
-        try:
-            self.object.delete()
-        except ProtectedError:
-            blocking_matches = (
-                Match.objects
-                .filter(Q(home_team=self.object) | Q(away_team=self.object))
-                .select_related("home_team", "away_team")
-            )
-            # Render a friendly page explaining what blocks the delete
-            return render(
-                request,
-                "main_app/team_cannot_delete.html",
-                {"team": self.object, "blocking_matches": blocking_matches},
-            )
-        return redirect(self.get_success_url())
+        blocking = self.object.fixture_count()
+        archived = 0 if blocking else self.object.archived_fixture_count()
+        if not blocking and not archived:
+            try:
+                self.object.delete()
+            except ProtectedError:
+                blocking = self.object.fixture_count()
+                archived = self.object.archived_fixture_count()
+            else:
+                return redirect(self.get_success_url())
+        return self.render_blocked(blocking, archived)
+
+    def render_blocked(self, blocking, archived=0):
+        matches = self.object.fixtures().select_related("home_team", "away_team").order_by("-kickoff_at", "-id")
+        paginator = Paginator(matches, self.blockers_per_page)
+        paginator.count = blocking
+        # Render a friendly page explaining what blocks the delete
+        return render(
+            self.request,
+            "main_app/team_cannot_delete.html",
+            {
+                "team": self.object, "blocking_count": blocking, "archived_count": archived,
+                "blocking_matches": paginator.get_page(self.request.GET.get("page")),
+            },
+        )
 
 # Matches
-class MatchList(LoginRequiredMixin, ListView):
+class MatchList(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Match
     template_name = "main_app/match_list.html"
-    queryset = Match.objects.select_related('home_team', 'away_team', 'created_by').order_by('-kickoff_at')
+    queryset = Match.objects.select_related('home_team', 'away_team', 'created_by', 'consensus').order_by('-kickoff_at', '-id')
+    cursor_field = 'kickoff_at'
 
 class MatchDetail(LoginRequiredMixin, DetailView):
     model = Match
     template_name = "main_app/match_detail.html"
+    queryset = Match.objects.select_related('home_team', 'away_team', 'created_by', 'consensus')
+    predictions_per_page = 50
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        predictions = self.object.predictions.select_related('user')
+        # precomputed crowd summary, then only one page of rows (with users joined); the page is
+        # cut by keyset so it never depends on the denormalized total being exact
+        try:
+            summary = self.object.consensus
+        except MatchConsensus.DoesNotExist:
+            summary = MatchConsensus(match=self.object)
+        context['summary'] = summary
+        context['predictions_page'] = keyset_page(
+            predictions, 'created_at', self.predictions_per_page,
+            self.request.GET.get('after'), self.request.GET.get('before'), descending=False,
+        )
+        context['h2h'] = self.head_to_head()
+        context['live_updates'] = live.available(self.request)
+        return context
+
+    def head_to_head(self):
+        match = self.object
+        h2h = league.head_to_head(match.home_team_id, match.away_team_id)
+        names = {match.home_team_id: match.home_team.name, match.away_team_id: match.away_team.name}
+        other = {match.home_team_id: match.away_team_id, match.away_team_id: match.home_team_id}
+        h2h['recent'] = [
+            {**m, 'home_name': names[m['home_team_id']], 'away_name': names[other[m['home_team_id']]]}
+            for m in h2h['recent']
+        ]
+        return h2h
+
+@login_required
+def match_search(request):
+    """JSON autocomplete for the prediction form: open matches for this user, by team name."""
+    matches = search.filter_matches(Match.objects.open_for(request.user), request.GET.get('q'))
+    results = [{'id': m.pk, 'label': str(m)} for m in matches[:20]]
+    return JsonResponse({'results': results})
+
+async def match_live(request, pk):
+    """Server-Sent Events stream of score/status/consensus changes (ASGI only, see live.py)."""
+    if not live.available(request):
+        # 204 tells EventSource to stop reconnecting
+        return HttpResponse(status=204)
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
+    if not live.broker.watching(pk) and not await Match.objects.filter(pk=pk).aexists():
+        raise Http404
+    # the stream subscribes before it reads the state, so nothing published in between is lost
+    response = StreamingHttpResponse(live.stream(pk), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 class MatchCreate(LoginRequiredMixin, CreateView):
     model = Match
@@ -114,7 +218,8 @@ class MatchCreate(LoginRequiredMixin, CreateView):
     template_name = "main_app/match_form.html"
     def form_valid(self, form):
         form.instance.created_by = self.request.user
-        return super().form_valid(form)
+        with transaction.atomic():
+            return super().form_valid(form)
 
 class MatchUpdate(LoginRequiredMixin, UpdateView):
     model = Match
@@ -122,6 +227,10 @@ class MatchUpdate(LoginRequiredMixin, UpdateView):
     template_name = "main_app/match_form.html"
     def get_queryset(self):
         return Match.objects.filter(created_by=self.request.user)
+    def form_valid(self, form):
+        # the save and the jobs its signals enqueue commit together
+        with transaction.atomic():
+            return super().form_valid(form)
 
 class MatchDelete(LoginRequiredMixin, DeleteView):
     model = Match
@@ -129,16 +238,51 @@ class MatchDelete(LoginRequiredMixin, DeleteView):
     template_name = "main_app/match_confirm_delete.html"
     def get_queryset(self):
         return Match.objects.filter(created_by=self.request.user)
+    def form_valid(self, form):
+        with transaction.atomic():
+            return super().form_valid(form)
 
 # Predictions
-class PredictionList(LoginRequiredMixin, ListView):
+class PredictionList(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Prediction
     template_name = "main_app/prediction_list.html"
-    queryset = Prediction.objects.select_related('match', 'user', 'match__home_team', 'match__away_team').order_by('-created_at')
+    queryset = Prediction.objects.select_related('match', 'user', 'match__home_team', 'match__away_team').order_by('-created_at', '-id')
+    cursor_field = 'created_at'
+    season_field = 'match__season'
+    status_field = 'match__status'
+    team_fields = ('match__home_team', 'match__away_team')
+    match_prefix = 'match__'
+
+    def filter_season(self, queryset, season):
+        # unary plus keeps the planner on the (created_at, id) index, checking each row's match,
+        # instead of collecting and sorting every prediction of the season
+        key = Func(F('match__season'), template='+%(expressions)s', output_field=IntegerField())
+        return queryset.alias(match_season=key).filter(match_season=season)
 
 class PredictionDetail(LoginRequiredMixin, DetailView):
     model = Prediction
     template_name = "main_app/prediction_detail.html"
+    queryset = Prediction.objects.select_related('match__home_team', 'match__away_team', 'user')
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["locked"] = kickoffs.has_started(self.object.match)
+        return context
+
+class PredictionLockMixin:
+    """
+    Edits and deletes close at kickoff. The check is one indexed probe by the prediction's
+    match_id (kickoffs.is_locked), made before a late request builds any form.
+    """
+    def dispatch(self, request, *args, **kwargs):
+        # runs after LoginRequiredMixin's check, so get_object() can filter on request.user
+        if kickoffs.is_locked(self.get_object().match_id):
+            return render(request, "main_app/prediction_locked.html", {"prediction": self.get_object()}, status=403)
+        return super().dispatch(request, *args, **kwargs)
+    def get_object(self, queryset=None):
+        # dispatch and get()/post() both ask for it
+        if not hasattr(self, "_prediction"):
+            self._prediction = super().get_object(queryset)
+        return self._prediction
 
 class PredictionCreate(LoginRequiredMixin, CreateView):
     model = Prediction
@@ -156,7 +300,104 @@ class PredictionCreate(LoginRequiredMixin, CreateView):
             form.add_error(None, "You already have a prediction for this match. Please edit the existing one.")
             return self.form_invalid(form)
 
-class PredictionUpdate(LoginRequiredMixin, UpdateView):
+class GameweekPredictions(LoginRequiredMixin, TemplateView):
+    """Predict every open match in a date window (?start=YYYY-MM-DD&days=7) or gameweek (?gameweek=N) in one POST."""
+    template_name = "main_app/gameweek_form.html"
+    window_days = 7
+    prediction_fields = ["pick", "p_home", "p_draw", "p_away"]
+
+    def get_window(self):
+        start = parse_date(self.request.GET.get("start", "")) or timezone.localdate()
+        try:
+            days = max(1, min(int(self.request.GET.get("days", self.window_days)), 31))
+        except ValueError:
+            days = self.window_days
+        return start, start + timedelta(days=days - 1)
+
+    def get_gameweek(self):
+        try:
+            return int(self.request.GET["gameweek"])
+        except (KeyError, ValueError):
+            return None
+
+    def get_matches(self):
+        gameweek = self.get_gameweek()
+        if gameweek is not None:
+            # one range of the (season, gameweek, kickoff_at) index
+            matches = Match.objects.filter(
+                season=Season.current_year(), gameweek=gameweek, status="SCHEDULED", kickoff_at__gt=timezone.now()
+            )
+        else:
+            lower, upper = day_bounds(*self.get_window())
+            matches = Match.objects.filter(status="SCHEDULED", kickoff_at__gt=max(lower, timezone.now()), kickoff_at__lte=upper)
+        return list(matches.select_related("home_team", "away_team").order_by("kickoff_at", "id"))
+
+    def get_existing(self, matches):
+        # one query for every prediction this user already has in the window
+        return {
+            p.match_id: p
+            for p in Prediction.objects.filter(user=self.request.user, match__in=[m.pk for m in matches])
+        }
+
+    def get(self, request, *args, **kwargs):
+        matches = self.get_matches()
+        existing = self.get_existing(matches)
+        initial = []
+        for m in matches:
+            row = {"match_id": m.pk}
+            if m.pk in existing:
+                row.update({f: getattr(existing[m.pk], f) for f in self.prediction_fields})
+            initial.append(row)
+        formset = GameweekFormSet(initial=initial, matches=matches)
+        return self.render_to_response(self.get_context_data(formset=formset))
+
+    def post(self, request, *args, **kwargs):
+        matches = self.get_matches()
+        formset = GameweekFormSet(request.POST, matches=matches)
+        error_message = ""
+        if formset.is_valid():
+            try:
+                self.save(formset, self.get_existing(matches))
+                return redirect("prediction-index")
+            except IntegrityError:
+                error_message = "Some of these predictions were saved elsewhere in the meantime. Please reload and try again."
+        return self.render_to_response(self.get_context_data(formset=formset, error_message=error_message))
+
+    def save(self, formset, existing):
+        to_create, to_update, votes = [], [], []
+        for form in formset:
+            data = form.cleaned_data
+            if not data.get("pick"):
+                continue
+            values = {f: data.get(f) for f in self.prediction_fields}
+            current = existing.get(form.match.pk)
+            if current is None:
+                prediction = Prediction(user=self.request.user, match=form.match, **values)
+                to_create.append(prediction)
+                votes.append((None, prediction.vote_key))
+                continue
+            old_vote = current.vote_key
+            for f, v in values.items():
+                setattr(current, f, v)
+            if current.vote_key != old_vote:
+                to_update.append(current)
+                votes.append((old_vote, current.vote_key))
+        if not votes:
+            return
+        # bulk writes skip the model signals, so keep consensus and fragment versions in step here
+        with transaction.atomic():
+            Prediction.objects.bulk_create(to_create)
+            Prediction.objects.bulk_update(to_update, self.prediction_fields)
+            consensus.apply_changes(votes)
+        caching.bump("prediction")
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        start, end = self.get_window()
+        context.update(window_start=start, window_end=end, gameweek=self.get_gameweek())
+        return context
+
+class PredictionUpdate(LoginRequiredMixin, PredictionLockMixin, UpdateView):
     model = Prediction
     form_class = PredictionForm
     template_name = "main_app/prediction_form.html"
@@ -167,10 +408,119 @@ class PredictionUpdate(LoginRequiredMixin, UpdateView):
         kwargs = super().get_form_kwargs()
         kwargs["user"] = self.request.user
         return kwargs
+    def form_valid(self, form):
+        try:
+            return super().form_valid(form)
+        except IntegrityError:
+            form.add_error(None, "You already have a prediction for this match. Please edit the existing one.")
+            return self.form_invalid(form)
 
-class PredictionDelete(LoginRequiredMixin, DeleteView):
+class PredictionDelete(LoginRequiredMixin, PredictionLockMixin, DeleteView):
     model = Prediction
     success_url = '/predictions/'
     template_name = "main_app/prediction_confirm_delete.html"
     def get_queryset(self):
         return Prediction.objects.filter(user=self.request.user)
+
+
+# Leaderboard
+class Leaderboard(LoginRequiredMixin, RankPaginationMixin, ListView):
+    model = Standing
+    template_name = "main_app/leaderboard.html"
+    # reads the materialized Standing rows only; pages walk its (-points, -correct, user) index
+    queryset = Standing.objects.select_related('user').filter(scored__gt=0)
+    rank_fields = ('points', 'correct')
+    tiebreak = 'user_id'
+
+class LeagueTable(LoginRequiredMixin, ListView):
+    model = TeamStanding
+    template_name = "main_app/league_table.html"
+
+    def get_season(self):
+        try:
+            return int(self.request.GET['season'])
+        except (KeyError, ValueError):
+            return league.season_for(timezone.now())
+
+    def get_queryset(self):
+        # one read over the (season, -points, -goal_difference, -goals_for, team) index
+        self.season = self.get_season()
+        return (
+            TeamStanding.objects.filter(season=self.season).select_related('team')
+            .order_by('-points', '-goal_difference', '-goals_for', 'team_id')
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['season'] = self.season
+        context['season_label'] = Season(year=self.season).label
+        return context
+
+
+# Seasons
+class SeasonList(LoginRequiredMixin, ListView):
+    model = Season
+    template_name = "main_app/season_list.html"
+
+class SeasonDetail(LoginRequiredMixin, DetailView):
+    """History page of an archived season, read from the archive tables; live seasons go to the match list."""
+    model = Season
+    template_name = "main_app/season_detail.html"
+    pk_url_kwarg = 'year'
+    matches_per_page = 50
+
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        if not self.object.is_archived:
+            return redirect(f"{reverse('match-index')}?season={self.object.year}")
+        return self.render_to_response(self.get_context_data())
+
+    def get_gameweek(self):
+        try:
+            return int(self.request.GET['gameweek'])
+        except (KeyError, ValueError):
+            return None
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        matches = ArchivedMatch.objects.filter(season=self.object.year).select_related('home_team', 'away_team')
+        gameweek = self.get_gameweek()
+        if gameweek is not None:
+            matches = matches.filter(gameweek=gameweek)
+        paginator = Paginator(matches.order_by('kickoff_at', 'id'), self.matches_per_page)
+        if gameweek is None:
+            paginator.count = self.object.archived_matches
+        page = paginator.get_page(self.request.GET.get('page'))
+        # this user's picks for the matches on the page, in one query
+        mine = ArchivedPrediction.objects.filter(user=self.request.user, match__in=[m.pk for m in page])
+        picks = {p.match_id: p for p in mine}
+        for m in page:
+            m.my_prediction = picks.get(m.pk)
+        context.update(matches_page=page, gameweek=gameweek)
+        return context
+
+
+# Exports
+def _export_response(fmt, filename, columns, rows):
+    if fmt not in exports.CONTENT_TYPES:
+        raise Http404("Unknown export format.")
+    response = StreamingHttpResponse(exports.render(fmt, columns, rows), content_type=exports.CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
+
+@login_required
+def export_predictions(request, fmt):
+    try:
+        qs = exports.filter_predictions(
+            Prediction.objects.all(),
+            season=request.GET.get('season'),
+            user=request.GET.get('user'),
+            match=request.GET.get('match'),
+        )
+    except ValueError:
+        raise Http404("Bad season or match filter.")
+    return _export_response(fmt, 'predictions', exports.PREDICTION_COLUMNS, exports.prediction_rows(qs))
+
+@login_required
+def export_standings(request, fmt):
+    return _export_response(fmt, 'standings', exports.STANDING_COLUMNS, exports.standing_rows())